@@ -0,0 +1,6 @@
+"""
+BitSwapTorrent - Python sunucuları için ortak yardımcı modüller
+
+python-server, working-server ve simple-server bu paketi kendi
+dizinlerinin bir üstünden import eder. Sadece Python standard library.
+"""
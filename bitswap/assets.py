@@ -0,0 +1,146 @@
+"""
+Önceden sıkıştırılmış, bellekte tutulan statik yanıtlar
+
+Ana sayfa ve web-ui/ dosyaları sunucu başlarken bir kez okunur,
+gzip (ve brotli paketi kuruluysa br) ile sıkıştırılır. Her istekte
+Accept-Encoding'e göre hazır gövdelerden biri seçilir; encode/sıkıştırma
+yapılmaz. Her gösterimin kendi güçlü ETag'i vardır ve If-None-Match
+eşleşirse 304 döner.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from bitswap.ranges import etag_matches
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# HTML her seferinde doğrulanır (304 ucuz); diğer dosyalar bir süre önbellekte kalır
+HTML_CACHE_CONTROL = 'no-cache'
+ASSET_CACHE_CONTROL = 'public, max-age=3600'
+
+# Eşit q değerinde küçük olan tercih edilir
+ENCODING_PREFERENCE = ('br', 'gzip')
+ENCODING_SUFFIX = {'br': 'br', 'gzip': 'gz'}
+
+
+def parse_accept_encoding(value):
+    """Accept-Encoding -> {kodlama: q}"""
+    weights = {}
+    for item in (value or '').split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    return weights
+
+
+class StaticAsset:
+    """Bir kez sıkıştırılıp her istekte olduğu gibi gönderilen gövde"""
+
+    def __init__(self, body, content_type, cache_control=ASSET_CACHE_CONTROL):
+        self.content_type = content_type
+        self.cache_control = cache_control
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        # kodlama (None = identity) -> (gövde, etag)
+        self.variants = {None: (body, f'"{digest}"')}
+        compressed = {'gzip': gzip.compress(body, 9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(body, quality=11)
+        for encoding, data in compressed.items():
+            # Küçültmüyorsa sıkıştırılmış hali tutma
+            if len(data) < len(body):
+                self.variants[encoding] = (data, f'"{digest}-{ENCODING_SUFFIX[encoding]}"')
+
+    @classmethod
+    def from_file(cls, path, cache_control=None):
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        if cache_control is None:
+            cache_control = HTML_CACHE_CONTROL if content_type.startswith('text/html') else ASSET_CACHE_CONTROL
+        with open(path, 'rb') as f:
+            return cls(f.read(), content_type, cache_control)
+
+    def negotiate(self, accept_encoding):
+        """Accept-Encoding'e göre (kodlama, gövde, etag)"""
+        weights = parse_accept_encoding(accept_encoding)
+        default = weights.get('*', 0.0)
+        best = None
+        best_q = 0.0
+        for encoding in ENCODING_PREFERENCE:
+            if encoding not in self.variants:
+                continue
+            q = weights.get(encoding, default)
+            if q > best_q:
+                best, best_q = encoding, q
+        body, etag = self.variants[best]
+        return best, body, etag
+
+    def headers(self, encoding, etag):
+        headers = [
+            ('Content-Type', self.content_type),
+            ('Cache-Control', self.cache_control),
+            ('ETag', etag),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        return headers
+
+
+def load_directory(directory, prefix='/'):
+    """Klasördeki dosyaları {url_yolu: StaticAsset} olarak yükle; index.html prefix'e de bağlanır"""
+    assets = {}
+    if not os.path.isdir(directory):
+        return assets
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.startswith('.') or not os.path.isfile(path):
+            continue
+        assets[prefix + name] = StaticAsset.from_file(path)
+    if prefix + 'index.html' in assets:
+        assets[prefix] = assets[prefix + 'index.html']
+    return assets
+
+
+def send_asset(handler, asset):
+    """BaseHTTPRequestHandler üzerinden gönder (304 / HEAD destekli)"""
+    encoding, body, etag = asset.negotiate(handler.headers.get('Accept-Encoding'))
+    headers = asset.headers(encoding, etag)
+    if etag_matches(handler.headers.get('If-None-Match'), etag):
+        handler.send_response(304)
+        for name, value in headers:
+            if name != 'Content-Type':
+                handler.send_header(name, value)
+        handler.end_headers()
+        return
+    handler.send_response(200)
+    for name, value in headers:
+        handler.send_header(name, value)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.end_headers()
+    if handler.command != 'HEAD':
+        handler.wfile.write(body)
+
+
+def asset_response(asset, headers):
+    """WSGI için (status, headers, body); headers istek başlıklarıdır"""
+    encoding, body, etag = asset.negotiate(headers.get('Accept-Encoding'))
+    response_headers = asset.headers(encoding, etag)
+    if etag_matches(headers.get('If-None-Match'), etag):
+        return 304, [h for h in response_headers if h[0] != 'Content-Type'], b''
+    return 200, response_headers, body
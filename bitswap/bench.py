@@ -0,0 +1,420 @@
+"""
+Üç sunucu için tekrarlanabilir yük testi
+
+Her sunucu (python-server, working-server, simple-server) geçici bir
+klasörde (kendi veritabanı ve uploads/ klasörüyle) yerel bir portta
+alt süreç olarak başlatılır ve aynı iş yüküyle sürülür:
+
+- önce --seed-files adet dosya yüklenir (indirmeler bunları çeker),
+- sonra --concurrency thread'i --duration saniye boyunca --mix
+  ağırlıklarıyla upload / download / list / stats istekleri gönderir.
+
+Dosya boyutları --sizes dağılımından seçilir. Rastgelelik --seed ile
+sabitlenir, aynı ayarlarla iki çalıştırma aynı istek karışımını üretir.
+Her upload'ın içeriği farklıdır (baştaki 16 byte rastgele), böylece
+tekrar yüklemeler tekilleştirmeye takılmaz.
+
+Sonuç JSON'dur ve commit'ler arasında karşılaştırılabilir: işlem
+başına istek/sn, MB/sn, p50/p90/p99 gecikme ve hata sayısı; sunucu
+süreç ağacının CPU süresi ve en yüksek RSS'i (Linux /proc'tan). İstemci
+de aynı makinede çalıştığı için istemcinin CPU'su da raporlanır;
+sunucudan yüksekse ölçüm istemciye bağlıdır.
+
+Kullanım:
+    python -m bitswap.bench --duration 20 --output sonuc.json
+    python -m bitswap.bench --servers working-server --mix download=1 --sizes 4MiB:1
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from bitswap.units import parse_size, parse_weights
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Sunucu adı -> (betik, indirme yolu, http.server bayraklarını kabul ediyor mu)
+SERVERS = {
+    'python-server': ('python-server/server.py', '/api/download?hash={}', True),
+    'working-server': ('working-server/server.py', '/download/{}', True),
+    'simple-server': ('simple-server/app.py', '/download/{}', False),
+}
+OPERATIONS = ('upload', 'download', 'list', 'stats')
+DEFAULT_MIX = 'upload=1,download=6,list=2,stats=1'
+DEFAULT_SIZES = '4KiB:50,256KiB:30,4MiB:15,32MiB:5'
+READ_SIZE = 1024 * 1024
+STARTUP_TIMEOUT = 30.0
+SHUTDOWN_TIMEOUT = 15.0
+RSS_SAMPLE_INTERVAL = 0.2
+BOUNDARY = 'bitswap-bench-boundary'
+
+
+def percentile(values, fraction):
+    """Sıralı listede en yakın sıra yöntemiyle yüzdelik"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _default_sigint():
+    # Arka planda başlatılan kabuklar SIGINT'i yok sayar; sunucu Ctrl+C ile kapanabilmeli
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+
+def _process_tree(pid):
+    """pid ve tüm alt süreçleri (/proc/<pid>/task/*/children)"""
+    pids = [pid]
+    for current in pids:
+        try:
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return pids
+
+
+def _cpu_seconds(pids):
+    ticks = os.sysconf('SC_CLK_TCK')
+    user = system = 0.0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        user += int(fields[11]) / ticks
+        system += int(fields[12]) / ticks
+    return user, system
+
+
+def _status_bytes(pids, field):
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith(field + ':'):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class ServerProcess:
+    """Geçici klasörde çalışan bir sunucu alt süreci"""
+
+    def __init__(self, name, workers=None, keep=False):
+        self.name = name
+        self.script, self.download_path, self.http_server = SERVERS[name]
+        self.workers = workers
+        self.keep = keep
+        self.port = _free_port()
+        self.base_url = f'http://127.0.0.1:{self.port}'
+        self.directory = tempfile.mkdtemp(prefix=f'bitswap-bench-{name}-')
+        self.process = None
+        self._log = None
+
+    def start(self):
+        command = [sys.executable, os.path.join(REPO_ROOT, self.script), '--port', str(self.port)]
+        if self.http_server and self.workers:
+            command += ['--workers', str(self.workers)]
+        self._log = open(os.path.join(self.directory, 'server.log'), 'wb')
+        self.process = subprocess.Popen(command, cwd=self.directory, stdout=self._log,
+                                        stderr=subprocess.STDOUT, preexec_fn=_default_sigint)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'{self.name} başlatılamadı (bkz. {self._log.name})')
+            try:
+                with urllib.request.urlopen(self.base_url + '/api/files?action=stats', timeout=1):
+                    return self
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError(f'{self.name} {STARTUP_TIMEOUT:.0f} sn içinde hazır olmadı')
+
+    def pids(self):
+        return _process_tree(self.process.pid)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            # SIGINT: sunucular Ctrl+C'deki gibi kapanır (sayaçlar yazılır)
+            self.process.send_signal(signal.SIGINT)
+            try:
+                self.process.wait(SHUTDOWN_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._log is not None:
+            self._log.close()
+        if not self.keep:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class Workload:
+    """İstek karışımı, boyut dağılımı ve önceden üretilmiş içerik"""
+
+    def __init__(self, mix, sizes, seed):
+        self.operations = [op for op, _ in mix]
+        self.operation_weights = [weight for _, weight in mix]
+        self.sizes = [size for size, _ in sizes]
+        self.size_weights = [weight for _, weight in sizes]
+        # Her boyut için tek bir rastgele tampon; upload'lar bunun dilimlerini gönderir
+        rng = random.Random(seed)
+        largest = max(self.sizes)
+        self.payload = memoryview(rng.randbytes(largest))
+
+    def pick_operation(self, rng):
+        return rng.choices(self.operations, self.operation_weights)[0]
+
+    def pick_size(self, rng):
+        return rng.choices(self.sizes, self.size_weights)[0]
+
+
+def _upload(server, workload, rng, size):
+    """Multipart upload; gövde kopyalanmadan parça parça gönderilir"""
+    nonce = rng.randbytes(min(16, size))
+    head = (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; '
+            f'filename="bench-{nonce.hex()}.bin"\r\nContent-Type: application/octet-stream\r\n\r\n').encode()
+    tail = f'\r\n--{BOUNDARY}--\r\n'.encode()
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=300)
+    try:
+        conn.putrequest('POST', '/api/upload')
+        conn.putheader('Content-Type', f'multipart/form-data; boundary={BOUNDARY}')
+        conn.putheader('Content-Length', str(len(head) + size + len(tail)))
+        conn.endheaders()
+        conn.send(head)
+        conn.send(nonce)
+        conn.send(workload.payload[len(nonce):size])
+        conn.send(tail)
+        response = conn.getresponse()
+        body = response.read()
+        result = json.loads(body) if response.status == 200 else {}
+        return response.status == 200 and result.get('success'), len(body), size, result.get('hash')
+    finally:
+        conn.close()
+
+
+def _get(server, path):
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=300)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        received = 0
+        while True:
+            chunk = response.read(READ_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+        return response.status == 200, received, 0, None
+    finally:
+        conn.close()
+
+
+def _run_operation(server, workload, rng, operation, seeded):
+    if operation == 'upload':
+        return _upload(server, workload, rng, workload.pick_size(rng))
+    if operation == 'download':
+        return _get(server, server.download_path.format(rng.choice(seeded)))
+    if operation == 'list':
+        return _get(server, '/api/files?action=list')
+    return _get(server, '/api/files?action=stats')
+
+
+def _summarize(samples, elapsed):
+    """[(gecikme, alınan, gönderilen, başarılı)] -> istatistik sözlüğü"""
+    latencies = sorted(sample[0] for sample in samples)
+    received = sum(sample[1] for sample in samples)
+    sent = sum(sample[2] for sample in samples)
+    ok = sum(1 for sample in samples if sample[3])
+    return {
+        'count': len(samples),
+        'errors': len(samples) - ok,
+        'throughput_rps': round(ok / elapsed, 2) if elapsed else 0,
+        'bytes_in': sent,
+        'bytes_out': received,
+        'mbps': round((sent + received) / elapsed / 1e6, 2) if elapsed else 0,
+        'latency_ms': {
+            'p50': _ms(percentile(latencies, 0.50)),
+            'p90': _ms(percentile(latencies, 0.90)),
+            'p99': _ms(percentile(latencies, 0.99)),
+            'max': _ms(latencies[-1] if latencies else None),
+            'mean': _ms(sum(latencies) / len(latencies) if latencies else None),
+        },
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def benchmark_server(server, workload, args):
+    """Tek bir sunucuyu tohumla ve süre boyunca yük altında ölç"""
+    rng = random.Random(args.seed)
+    seeded = []
+    for _ in range(args.seed_files):
+        ok, _, _, file_hash = _upload(server, workload, rng, workload.pick_size(rng))
+        if ok and file_hash:
+            seeded.append(file_hash)
+    if not seeded and any(op == 'download' for op in workload.operations):
+        raise RuntimeError(f'{server.name}: tohum dosyaları yüklenemedi')
+
+    start = time.monotonic()
+    measure_from = start + args.warmup
+    deadline = measure_from + args.duration
+    results = [[] for _ in range(args.concurrency)]
+
+    def worker(slot):
+        worker_rng = random.Random(args.seed * 1000 + slot + 1)
+        samples = results[slot]
+        while True:
+            began = time.monotonic()
+            if began >= deadline:
+                break
+            operation = workload.pick_operation(worker_rng)
+            try:
+                ok, received, sent, _ = _run_operation(server, workload, worker_rng, operation, seeded)
+            except (OSError, http.client.HTTPException, ValueError):
+                ok, received, sent = False, 0, 0
+            if began >= measure_from:
+                samples.append((operation, time.monotonic() - began, received, sent, ok))
+
+    threads = [threading.Thread(target=worker, args=(slot,), daemon=True) for slot in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+
+    # Isınma bitince CPU sayaçlarını al, ölçüm boyunca RSS örnekle
+    time.sleep(max(0.0, measure_from - time.monotonic()))
+    cpu_before = _cpu_seconds(server.pids())
+    client_before = os.times()
+    peak_rss = 0
+    while time.monotonic() < deadline:
+        peak_rss = max(peak_rss, _status_bytes(server.pids(), 'VmRSS'))
+        time.sleep(RSS_SAMPLE_INTERVAL)
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - measure_from
+    cpu_after = _cpu_seconds(server.pids())
+    client_after = os.times()
+
+    samples = [sample for slot in results for sample in slot]
+    operations = {}
+    for operation in OPERATIONS:
+        selected = [sample[1:] for sample in samples if sample[0] == operation]
+        if selected:
+            operations[operation] = _summarize(selected, elapsed)
+    user = cpu_after[0] - cpu_before[0]
+    system = cpu_after[1] - cpu_before[1]
+    client_cpu = (client_after.user - client_before.user) + (client_after.system - client_before.system)
+    return {
+        'port': server.port,
+        'seed_files': len(seeded),
+        'elapsed_s': round(elapsed, 3),
+        'operations': operations,
+        'total': _summarize([sample[1:] for sample in samples], elapsed),
+        'cpu': {
+            'user_s': round(user, 3),
+            'system_s': round(system, 3),
+            'percent': round((user + system) / elapsed * 100, 1) if elapsed else 0,
+        },
+        'memory': {
+            'peak_rss_bytes': peak_rss,
+            # Süreç ömrü boyunca en yüksek RSS (tohumlama dahil)
+            'vmhwm_bytes': _status_bytes(server.pids(), 'VmHWM'),
+        },
+        'client_cpu_percent': round(client_cpu / elapsed * 100, 1) if elapsed else 0,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='BitSwap sunucuları için yük testi (JSON çıktı)')
+    parser.add_argument('--servers', default=','.join(SERVERS),
+                        help='virgülle ayrılmış sunucular: ' + ', '.join(SERVERS))
+    parser.add_argument('--duration', type=float, default=20.0, help='ölçüm süresi (saniye)')
+    parser.add_argument('--warmup', type=float, default=2.0, help='ölçülmeyen ısınma süresi (saniye)')
+    parser.add_argument('--concurrency', type=int, default=8, help='eşzamanlı istemci thread sayısı')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='işlem ağırlıkları (upload, download, list, stats)')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='dosya boyutu dağılımı: boyut:ağırlık,...')
+    parser.add_argument('--seed-files', type=int, default=20, help='ölçümden önce yüklenen dosya sayısı')
+    parser.add_argument('--seed', type=int, default=1, help='rastgelelik tohumu')
+    parser.add_argument('--workers', type=int, help='http.server sunucularının worker sayısı')
+    parser.add_argument('--keep', action='store_true', help='geçici klasörleri (log, veritabanı) silme')
+    parser.add_argument('--output', help='JSON dosyası (varsayılan: stdout)')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.servers.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SERVERS]
+    if unknown:
+        parser.error('bilinmeyen sunucu: ' + ', '.join(unknown))
+    mix = parse_weights(args.mix)
+    if any(op not in OPERATIONS for op, _ in mix):
+        parser.error('--mix yalnızca şunları içerebilir: ' + ', '.join(OPERATIONS))
+    workload = Workload(mix, parse_weights(args.sizes, parse_size), args.seed)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        },
+        'servers': {},
+    }
+    for name in names:
+        server = ServerProcess(name, args.workers, args.keep)
+        try:
+            print(f'{name}: port {server.port}, klasör {server.directory}', file=sys.stderr)
+            server.start()
+            result = benchmark_server(server, workload, args)
+        except RuntimeError as e:
+            result = {'error': str(e)}
+        finally:
+            server.stop()
+        report['servers'][name] = result
+        total = result.get('total')
+        if total:
+            print(f"{name}: {total['throughput_rps']} istek/sn, p50 {total['latency_ms']['p50']} ms, "
+                  f"p99 {total['latency_ms']['p99']} ms, CPU %{result['cpu']['percent']}, "
+                  f"RSS {result['memory']['peak_rss_bytes'] // (1024 * 1024)} MiB", file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 1 if any('error' in result for result in report['servers'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+İçerik adresli dosya deposu
+
+Yüklenen dosyalar uploads/ altında hash'lerine göre iki seviyeli
+alt klasörlere dağıtılır: uploads/ab/cd/abcdef... Tek bir klasörde
+milyonlarca girdi birikmez; her open/stat/listeleme küçük bir klasörde
+çalışır. Dosya adları yalnızca veritabanında (original_name) tutulur.
+
+Aynı içerik aynı yola düşer, bu yüzden "bu dosya zaten var mı?"
+sorusu veritabanına gitmeden tek bir stat ile cevaplanır.
+
+Eski düz uploads/{hash}_{ad} düzeni için bkz. bitswap.migrate_uploads.
+"""
+
+import os
+
+from bitswap.db import INSERT_FILE
+from bitswap.ingest import SpooledUpload
+
+HASH_LENGTH = 64
+HEX_DIGITS = frozenset('0123456789abcdef')
+# Seviye başına hex karakter sayısı ve seviye sayısı: 256 * 256 klasör
+SHARD_WIDTH = 2
+SHARD_DEPTH = 2
+
+
+def is_valid_hash(file_hash):
+    """Küçük harfli 64 karakterlik hex SHA-256 mı (yol olarak güvenli)"""
+    return (isinstance(file_hash, str) and len(file_hash) == HASH_LENGTH
+            and HEX_DIGITS.issuperset(file_hash))
+
+
+class BlobStore:
+    """root/ab/cd/<hash> düzeninde içerik adresli depo"""
+
+    def __init__(self, root, width=SHARD_WIDTH, depth=SHARD_DEPTH):
+        self.root = root
+        self.width = width
+        self.depth = depth
+
+    def path(self, file_hash):
+        if not is_valid_hash(file_hash):
+            raise ValueError("Geçersiz hash")
+        shards = [file_hash[i * self.width:(i + 1) * self.width] for i in range(self.depth)]
+        return os.path.join(self.root, *shards, file_hash)
+
+    def exists(self, file_hash):
+        return is_valid_hash(file_hash) and os.path.isfile(self.path(file_hash))
+
+    def spool(self):
+        """Depo kökünde geçici dosya: commit aynı dosya sisteminde rename olur"""
+        os.makedirs(self.root, exist_ok=True)
+        return SpooledUpload(self.root)
+
+    def put(self, upload, file_hash):
+        """Tamamlanmış upload'ı hash yoluna taşı"""
+        path = self.path(file_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        upload.commit(path)
+        return path
+
+    def remove(self, file_hash):
+        try:
+            os.remove(self.path(file_hash))
+        except FileNotFoundError:
+            pass
+
+
+def add_file(db, store, upload, original_name, mime_type, uploader_ip):
+    """Upload'ı depoya koy ve files'a ekle; aynı hash zaten kayıtlıysa False
+
+    Blob, kayıt commit edilmeden önce yerine konur: kaydı görülen her
+    dosyanın içeriği de diskte vardır. Commit başarısız olursa blob,
+    yazma kilidi hâlâ tutulurken upload'ın geçici dosyasına geri
+    taşınır; depoda kaydı olmayan blob kalmaz ve upload tekrar
+    denenebilir. Eşzamanlı iki aynı upload'dan yalnızca biri satırı
+    ekler.
+    """
+    file_hash = upload.hexdigest()
+    with db.transaction() as conn:
+        cursor = conn.execute(INSERT_FILE, (file_hash, original_name, store.path(file_hash),
+                                            upload.size, mime_type, uploader_ip))
+        if not cursor.rowcount:
+            upload.discard()
+            return False
+        path = store.put(upload, file_hash)
+        try:
+            # transaction() çıkışındaki commit işlem yapılmamış bağlantıda etkisizdir
+            conn.commit()
+        except BaseException:
+            upload.rollback(path)
+            raise
+    return True
@@ -0,0 +1,130 @@
+"""
+Dosya kataloğu listeleme
+
+/api/files?action=list için keyset (cursor) sayfalama, sıralama ve
+filtreler. OFFSET kullanılmaz: her sayfa bir önceki sayfanın son
+satırından (sıralama değeri, id) devam eder ve ilgili indeks
+üzerinden okunur, bu yüzden derin sayfalar ilk sayfa kadar ucuzdur.
+
+Parametreler:
+    sort      newest (varsayılan) | downloads | largest
+    limit     1..200, varsayılan 50
+    cursor    önceki yanıttaki next_cursor
+    min_size  / max_size  byte cinsinden
+    mime      tam tip (image/png) veya önek (image/)
+"""
+
+import base64
+import json
+
+# sort adı -> sıralama kolonu (hepsi (kolon, id) indeksli, bkz. schema)
+SORTS = {
+    'newest': 'upload_time',
+    'downloads': 'download_count',
+    'largest': 'file_size',
+}
+
+# Sadece yanıtta kullanılan kolonlar
+LIST_COLUMNS = 'id, file_hash, original_name, file_size, mime_type, download_count, upload_time'
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(value, row_id):
+    raw = json.dumps([value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Geçersiz cursor")
+    if not isinstance(row_id, int):
+        raise ValueError("Geçersiz cursor")
+    return value, row_id
+
+
+def _int_param(args, name, default=None, minimum=0, maximum=None):
+    value = args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"Geçersiz {name}")
+    if number < minimum or (maximum is not None and number > maximum):
+        raise ValueError(f"Geçersiz {name}")
+    return number
+
+
+def build_list_query(args):
+    """İstek parametrelerinden (sql, params, sort_column, limit) üret
+
+    args, parametre adından tek bir string değere eşleme yapan bir
+    nesnedir (dict veya Flask request.args). Hatalı parametrelerde
+    ValueError fırlatır.
+    """
+    sort = args.get('sort') or 'newest'
+    if sort not in SORTS:
+        raise ValueError("Geçersiz sort")
+    column = SORTS[sort]
+    limit = _int_param(args, 'limit', DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+    min_size = _int_param(args, 'min_size')
+    max_size = _int_param(args, 'max_size')
+    mime = args.get('mime')
+
+    where = []
+    params = []
+    if min_size is not None:
+        where.append('file_size >= ?')
+        params.append(min_size)
+    if max_size is not None:
+        where.append('file_size <= ?')
+        params.append(max_size)
+    if mime:
+        if mime.endswith('/'):
+            # Önek eşleşmesi LIKE yerine aralık olarak: mime_type indeksi kullanılabilir
+            where.append('mime_type >= ? AND mime_type < ?')
+            params.extend([mime, mime[:-1] + '0'])
+        else:
+            where.append('mime_type = ?')
+            params.append(mime)
+    cursor = args.get('cursor')
+    if cursor:
+        value, row_id = decode_cursor(cursor)
+        where.append(f'({column}, id) < (?, ?)')
+        params.extend([value, row_id])
+
+    sql = f'SELECT {LIST_COLUMNS} FROM files'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += f' ORDER BY {column} DESC, id DESC LIMIT ?'
+    # Bir fazla satır: sonraki sayfa olup olmadığını anlamak için
+    params.append(limit + 1)
+    return sql, params, column, limit
+
+
+def file_json(row):
+    return {
+        'hash': row['file_hash'],
+        'name': row['original_name'],
+        'size': row['file_size'],
+        'mime_type': row['mime_type'],
+        'download_count': row['download_count'],
+        'upload_time': row['upload_time']
+    }
+
+
+def list_files(db, args):
+    """Bir sayfa dosya ve sonraki sayfanın cursor'ı (yoksa None)"""
+    sql, params, column, limit = build_list_query(args)
+    rows = db.query_all(sql, params)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[column], last['id'])
+    return [file_json(row) for row in rows], next_cursor
@@ -0,0 +1,232 @@
+"""
+Katalog sürümü, koşullu GET ve değişiklik beslemesi
+
+catalog_stats.version, files tablosundaki her INSERT/UPDATE/DELETE'te
+trigger'larla artar (bkz. schema._v5_catalog_version). CatalogVersion
+bu değeri bellekte tutar:
+
+- /api/files yanıtları sürümden türetilen bir ETag taşır; istemcinin
+  If-None-Match'i eşleşirse SQLite'a gitmeden 304 döner.
+- /api/changes?since=N uzun yoklamadır (long-poll): sürüm N'den
+  farklı olduğunda ya da zaman aşımında yanıt verir.
+
+Aynı süreçteki yazmalardan sonra refresh() çağrılır ve değişiklik
+hemen görünür; başka süreçlerin yazmaları en geç poll_interval içinde
+fark edilir (tek satırlık bir PK okuması).
+
+http.server sunucularında bekleyen /api/changes istekleri worker
+thread'i tutmaz: LongPollFeed soketi sunucudan devralır ve sürüm
+değiştiğinde veya süre dolduğunda yanıtı kendisi yazar. Boşta duran
+bir sekme yalnızca açık bir soket maliyetindedir. Yanıtlar feed'in kendi
+thread'inde, bloklamayan tek bir send ile yazılır: refresh()'i çağıran
+upload isteği veya sayaç yazımı yavaş istemcileri beklemez.
+"""
+
+import json
+import threading
+import time
+
+from bitswap.db import CATALOG_VERSION
+from bitswap.ranges import etag_matches
+
+DEFAULT_POLL_INTERVAL = 1.0
+# Proxy'lerin tipik 30 sn boşta kalma sınırının altında
+DEFAULT_POLL_TIMEOUT = 25.0
+DEFAULT_MAX_PARKED = 4096
+EXPIRE_INTERVAL = 1.0
+
+
+class CatalogVersion:
+    """catalog_stats.version'ın bellekteki kopyası ve bekleme noktası"""
+
+    def __init__(self, db, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.db = db
+        self.poll_interval = poll_interval
+        self._value = None
+        self._cond = threading.Condition()
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def value(self):
+        if self._value is None:
+            self.refresh()
+        return self._value
+
+    def etag(self, version=None):
+        return f'"catalog-{self.value if version is None else version}"'
+
+    def matches(self, if_none_match, version=None):
+        """If-None-Match başlığı geçerli sürümün ETag'ini içeriyor mu"""
+        return etag_matches(if_none_match, self.etag(version))
+
+    def subscribe(self, listener):
+        """Sürüm değiştiğinde listener(version) çağrılır"""
+        self._listeners.append(listener)
+
+    def refresh(self):
+        """Sürümü veritabanından oku; değiştiyse bekleyenleri uyandır"""
+        version = self.db.query_one(CATALOG_VERSION)[0]
+        with self._cond:
+            changed = version != self._value
+            self._value = version
+            if changed:
+                self._cond.notify_all()
+        if changed:
+            for listener in self._listeners:
+                listener(version)
+        return version
+
+    def wait(self, since, timeout=DEFAULT_POLL_TIMEOUT):
+        """Sürüm since'ten farklı olana veya süre dolana kadar bekle (thread tutar)"""
+        current = self.value
+        with self._cond:
+            self._cond.wait_for(lambda: self._value != since, timeout)
+            return self._value if self._value is not None else current
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception:
+                # Kilitli/meşgul veritabanı: bir sonraki turda yeniden denenir
+                pass
+
+    def start(self):
+        if self._thread is None:
+            self.refresh()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='bitswap-catalog-version', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def change_json(version, changed):
+    return {'success': True, 'version': version, 'changed': changed}
+
+
+def parse_since(value):
+    """since parametresi; yoksa veya geçersizse None (hemen yanıt verilir)"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class LongPollFeed:
+    """PooledHTTPServer için thread tutmayan /api/changes uzun yoklaması"""
+
+    def __init__(self, catalog, timeout=DEFAULT_POLL_TIMEOUT, max_parked=DEFAULT_MAX_PARKED):
+        self.catalog = catalog
+        self.timeout = timeout
+        self.max_parked = max_parked
+        # (son_tarih, soket) listesi
+        self._parked = []
+        # Sürüm değişince yanıtlanacaklar: (sürüm, soketler); feed thread'i boşaltır
+        self._changed = []
+        self._wake = threading.Event()
+        # RLock: park() içindeki ilk catalog.value okuması _on_change'i tetikleyebilir
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        catalog.subscribe(self._on_change)
+
+    def park(self, handler, since):
+        """İsteği beklemeye al; hemen yanıt gerekiyorsa False döndür
+
+        True dönerse yanıt buradan verilir (bekleme sınırı doluysa 503);
+        handler başka bir şey yazmadan dönmelidir.
+        """
+        with self._lock:
+            if since is None or self.catalog.value != since:
+                return False
+            if len(self._parked) >= self.max_parked:
+                handler.send_error(503, "Too many waiting requests")
+                return True
+            handler.close_connection = True
+            handler.server.detach(handler.request)
+            self._parked.append((time.monotonic() + self.timeout, handler.request))
+        return True
+
+    def parked(self):
+        with self._lock:
+            return len(self._parked)
+
+    def _respond(self, sock, version, changed):
+        body = json.dumps(change_json(version, changed)).encode('utf-8')
+        head = (
+            'HTTP/1.1 200 OK\r\n'
+            'Content-Type: application/json; charset=utf-8\r\n'
+            'Cache-Control: no-store\r\n'
+            'Access-Control-Allow-Origin: *\r\n'
+            'Connection: close\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            '\r\n'
+        ).encode('ascii')
+        try:
+            # Yanıt boş soket tamponuna sığar; sığmıyorsa istemci okumuyordur
+            sock.setblocking(False)
+            sock.send(head + body)
+        except OSError:
+            pass
+        finally:
+            sock.close()
+
+    def _on_change(self, version):
+        # refresh()'i çağıran thread'de: yalnızca listeyi devral ve feed thread'ini uyandır
+        with self._lock:
+            if not self._parked:
+                return
+            self._changed.append((version, [sock for _, sock in self._parked]))
+            self._parked = []
+        self._wake.set()
+
+    def _flush(self):
+        with self._lock:
+            changed, self._changed = self._changed, []
+        for version, socks in changed:
+            for sock in socks:
+                self._respond(sock, version, True)
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [sock for deadline, sock in self._parked if deadline <= now]
+            if expired:
+                self._parked = [item for item in self._parked if item[0] > now]
+        for sock in expired:
+            self._respond(sock, self.catalog.value, False)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(EXPIRE_INTERVAL)
+            self._wake.clear()
+            self._flush()
+            self._expire()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='bitswap-long-poll', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Bekleyen tüm istekleri yanıtla (istemciler yeniden bağlanır)"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._flush()
+        with self._lock:
+            parked, self._parked = self._parked, []
+        for _, sock in parked:
+            self._respond(sock, self.catalog.value, False)
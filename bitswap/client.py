@@ -0,0 +1,438 @@
+"""
+Çok kaynaklı paralel indirme istemcisi
+
+Bir .bwt dosyası veya upload yanıtındaki gibi bir
+magnet:?xt=urn:sha256:<hash> bağlantısı alır; parçaları birden çok
+BitSwap sunucusundan (/api/piece/<info_hash>/<index>) ve web_seed
+URL'lerinden (Range ile) aynı anda çeker. Her parça .bwt'deki SHA-256
+ile doğrulanır ve önceden ayrılmış çıktı dosyasına kendi offset'ine
+yazılır (<çıktı>.part, bitince yeniden adlandırılır).
+
+Kaynak başına eşzamanlılık uyarlanır: başarılı istekler sınırı yavaşça
+artırır, hatalar yarıya indirir, üst üste hata veren kaynak bir süre
+dinlendirilir. Beklenenden uzun süren parçalar boşta kalan başka bir
+kaynağa da verilir; ilk doğrulanan yanıt kazanır. Yarım kalmış bir
+.part dosyası varsa doğru parçaları yeniden indirilmez.
+
+Kullanım:
+    python -m bitswap.client dosya.bwt -s http://localhost:8080
+    python -m bitswap.client "magnet:?xt=urn:sha256:..." -s http://a:8000 -s http://b:8080
+"""
+
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from bitswap.blobs import is_valid_hash
+from bitswap.fileio import O_BINARY, PositionalFile
+from bitswap.manifest import CREATED_BY, hash_pieces, info_hash
+
+USER_AGENT = CREATED_BY
+DEFAULT_TIMEOUT = 30.0
+INITIAL_CONCURRENCY = 2
+DEFAULT_MAX_CONCURRENCY = 16
+# Yavaş parça: son parçaların medyan süresinin bu katı (en az MIN_SLOW_SECONDS)
+SLOW_FACTOR = 3.0
+MIN_SLOW_SECONDS = 2.0
+# Bir parçayı aynı anda en fazla kaç kaynak çekebilir
+MAX_DUPLICATES = 2
+# Üst üste bu kadar hata veren kaynak dinlendirilir
+FAILURES_BEFORE_BACKOFF = 3
+MAX_BACKOFF = 30.0
+# Hiç ilerleme olmadan geçebilecek en uzun süre
+STALL_TIMEOUT = 120.0
+
+
+class DownloadError(Exception):
+    pass
+
+
+def parse_magnet(url):
+    """magnet:?xt=urn:sha256:<hash>&dn=<ad>&xl=<boyut> -> dict"""
+    parsed = urllib.parse.urlparse(url)
+    if parsed.scheme != 'magnet':
+        raise DownloadError("magnet bağlantısı değil")
+    query = urllib.parse.parse_qs(parsed.query)
+    for xt in query.get('xt', []):
+        if xt.startswith('urn:sha256:'):
+            file_hash = xt[len('urn:sha256:'):].lower()
+            break
+    else:
+        raise DownloadError("magnet'te xt=urn:sha256: yok")
+    if not is_valid_hash(file_hash):
+        raise DownloadError("Geçersiz sha256")
+    size = query.get('xl', [None])[0]
+    return {
+        'file_hash': file_hash,
+        'name': query.get('dn', [None])[0],
+        'size': int(size) if size and size.isdigit() else None,
+    }
+
+
+def verify_manifest(manifest):
+    """Tek dosyalık .bwt'yi ve info_hash'ini doğrula"""
+    try:
+        files = manifest['files']
+        expected = info_hash(manifest['name'], manifest['piece_length'], manifest['pieces'], files)
+    except (KeyError, TypeError):
+        raise DownloadError("Geçersiz .bwt")
+    if expected != manifest.get('info_hash'):
+        raise DownloadError("info_hash uyuşmuyor")
+    if len(files) != 1:
+        raise DownloadError("Çok dosyalı .bwt desteklenmiyor")
+    size = files[0]['length']
+    count = (size + manifest['piece_length'] - 1) // manifest['piece_length']
+    if count != len(manifest['pieces']):
+        raise DownloadError("Parça sayısı dosya boyutuyla uyuşmuyor")
+    return manifest
+
+
+def load_bwt(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return verify_manifest(json.load(f))
+
+
+def _get(url, headers=None, timeout=DEFAULT_TIMEOUT):
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT, **(headers or {})})
+    return urllib.request.urlopen(request, timeout=timeout)
+
+
+def fetch_manifest(nodes, magnet, timeout=DEFAULT_TIMEOUT):
+    """Magnet'teki hash için .bwt'yi sunuculardan al; ilk doğrulananı döndür"""
+    errors = []
+    for node in nodes:
+        try:
+            with _get(f"{node}/api/metadata/{magnet['file_hash']}", timeout=timeout) as response:
+                manifest = verify_manifest(json.load(response))
+        except (OSError, ValueError, DownloadError, http.client.HTTPException) as e:
+            errors.append(f'{node}: {e}')
+            continue
+        if manifest.get('extra', {}).get('sha256', magnet['file_hash']) != magnet['file_hash']:
+            errors.append(f'{node}: sha256 uyuşmuyor')
+            continue
+        if magnet['size'] is not None and manifest['files'][0]['length'] != magnet['size']:
+            errors.append(f'{node}: boyut uyuşmuyor')
+            continue
+        return manifest
+    raise DownloadError("Metadata alınamadı: " + '; '.join(errors or ['kaynak yok']))
+
+
+class Source:
+    """Bir indirme kaynağı ve uyarlanan eşzamanlılık sınırı"""
+
+    def __init__(self, url, kind, maximum=DEFAULT_MAX_CONCURRENCY):
+        # kind: 'node' (/api/piece uç noktası) veya 'seed' (tam dosya URL'si, Range ile)
+        self.url = url.rstrip('/') if kind == 'node' else url
+        self.kind = kind
+        self.maximum = maximum
+        self.limit = min(INITIAL_CONCURRENCY, maximum)
+        self.inflight = 0
+        self.pieces = 0
+        self.bytes = 0
+        self.busy_time = 0.0
+        self.failures = 0
+        self.disabled_until = 0.0
+        self._streak = 0
+        self._successes = 0
+
+    def available(self, now):
+        return self.inflight < self.limit and now >= self.disabled_until
+
+    def piece_request(self, info_hash_hex, index, offset, length):
+        if self.kind == 'node':
+            return f'{self.url}/api/piece/{info_hash_hex}/{index}', {}
+        return self.url, {'Range': f'bytes={offset}-{offset + length - 1}'}
+
+    def on_success(self, nbytes, elapsed):
+        self.pieces += 1
+        self.bytes += nbytes
+        self.busy_time += elapsed
+        self._streak = 0
+        # Toplamsal artış: sınır kadar başarıdan sonra bir slot daha
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self.limit = min(self.maximum, self.limit + 1)
+
+    def on_failure(self, now):
+        self.failures += 1
+        self._successes = 0
+        self.limit = max(1, self.limit // 2)
+        self._streak += 1
+        if self._streak >= FAILURES_BEFORE_BACKOFF:
+            self.disabled_until = now + min(MAX_BACKOFF, 2.0 ** self._streak)
+
+    def on_slow(self):
+        self._successes = 0
+        self.limit = max(1, self.limit - 1)
+
+    def summary(self):
+        return {
+            'url': self.url,
+            'kind': self.kind,
+            'pieces': self.pieces,
+            'bytes': self.bytes,
+            'failures': self.failures,
+            'concurrency': self.limit,
+        }
+
+
+def _fetch_piece(source, request, length, expected):
+    """Worker thread'inde: parçayı indir ve hash'ini doğrula"""
+    url, headers = request
+    with _get(url, headers, timeout=source.timeout) as response:
+        if source.kind == 'seed' and response.status != 206:
+            raise DownloadError("web seed Range desteklemiyor")
+        data = response.read(length + 1)
+    if len(data) != length:
+        raise DownloadError("Eksik parça")
+    if hashlib.sha256(data).hexdigest() != expected:
+        raise DownloadError("Parça hash'i uyuşmuyor")
+    return data
+
+
+def _preallocate(fd, size):
+    if size and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, size)
+
+
+class Downloader:
+    """Bir .bwt'yi birden çok kaynaktan paralel indirir"""
+
+    def __init__(self, manifest, sources, output, timeout=DEFAULT_TIMEOUT,
+                 verify_sha256=None, progress=None):
+        if not sources:
+            raise DownloadError("Kaynak yok")
+        self.manifest = manifest
+        self.sources = sources
+        self.output = output
+        self.timeout = timeout
+        self.verify_sha256 = verify_sha256
+        self.progress = progress
+        self.size = manifest['files'][0]['length']
+        self.piece_length = manifest['piece_length']
+        self.pieces = manifest['pieces']
+        for source in sources:
+            source.timeout = timeout
+
+    def _span(self, index):
+        offset = index * self.piece_length
+        return offset, min(self.piece_length, self.size - offset)
+
+    def _resume(self, part_path, done):
+        """Önceki .part dosyasındaki doğru parçaları işaretle"""
+        if not os.path.isfile(part_path) or os.path.getsize(part_path) != self.size:
+            return 0
+        resumed = 0
+        for index, piece in enumerate(hash_pieces(part_path, self.piece_length)):
+            if piece == self.pieces[index]:
+                done[index] = 1
+                resumed += 1
+        return resumed
+
+    def run(self):
+        """İndir, doğrula, yerine taşı; istatistikleri döndür"""
+        part_path = self.output + '.part'
+        count = len(self.pieces)
+        done = bytearray(count)
+        resumed = self._resume(part_path, done)
+        pending = deque(index for index in range(count) if not done[index])
+        remaining = len(pending)
+
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT | O_BINARY, 0o644)
+        # pwrite; olmayan platformlarda dosya nesnesiyle (bkz. fileio)
+        writer = PositionalFile(part_path, fd, writable=True)
+        started = time.monotonic()
+        try:
+            _preallocate(fd, self.size)
+            if remaining:
+                self._download(writer, pending, done, remaining, started)
+            os.fsync(fd)
+        finally:
+            writer.close()
+            os.close(fd)
+
+        if self.verify_sha256:
+            with open(part_path, 'rb') as f:
+                if hashlib.file_digest(f, 'sha256').hexdigest() != self.verify_sha256:
+                    raise DownloadError("Dosya sha256'sı uyuşmuyor")
+        os.replace(part_path, self.output)
+        return self._stats(started, resumed, final=True)
+
+    def _download(self, writer, pending, done, remaining, started):
+        workers = sum(source.maximum for source in self.sources)
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bitswap-fetch')
+        inflight = {}
+        fetching = defaultdict(set)
+        attempts = defaultdict(int)
+        durations = deque(maxlen=64)
+        last_progress = last_report = time.monotonic()
+        info_hash_hex = self.manifest['info_hash']
+        try:
+            while remaining:
+                now = time.monotonic()
+                slow_after = max(MIN_SLOW_SECONDS,
+                                 SLOW_FACTOR * statistics.median(durations)) if durations else None
+                for source in sorted(self.sources, key=lambda s: -s.bytes):
+                    while source.available(now):
+                        index = self._next_piece(pending, done, fetching, inflight, source, now, slow_after)
+                        if index is None:
+                            break
+                        offset, length = self._span(index)
+                        request = source.piece_request(info_hash_hex, index, offset, length)
+                        future = executor.submit(_fetch_piece, source, request, length, self.pieces[index])
+                        inflight[future] = (index, source, now)
+                        fetching[index].add(source)
+                        source.inflight += 1
+
+                if not inflight:
+                    wake = min(source.disabled_until for source in self.sources)
+                    time.sleep(max(0.05, min(1.0, wake - now)))
+                    finished = ()
+                else:
+                    finished, _ = wait(inflight, timeout=0.25, return_when=FIRST_COMPLETED)
+
+                now = time.monotonic()
+                for future in finished:
+                    index, source, begun = inflight.pop(future)
+                    source.inflight -= 1
+                    fetching[index].discard(source)
+                    try:
+                        data = future.result()
+                    except (OSError, ValueError, DownloadError, urllib.error.URLError,
+                            http.client.HTTPException):
+                        source.on_failure(now)
+                        attempts[index] += 1
+                        if attempts[index] > FAILURES_BEFORE_BACKOFF * len(self.sources) + 2:
+                            raise DownloadError(f"Parça {index} hiçbir kaynaktan alınamadı")
+                        if not done[index] and not fetching[index]:
+                            pending.appendleft(index)
+                        continue
+                    source.on_success(len(data), now - begun)
+                    durations.append(now - begun)
+                    if done[index]:
+                        # Yavaş parçanın ikinci kopyası: ilk gelen zaten yazıldı
+                        continue
+                    writer.pwrite(data, self._span(index)[0])
+                    done[index] = 1
+                    remaining -= 1
+                    last_progress = now
+
+                if now - last_progress > STALL_TIMEOUT:
+                    raise DownloadError("İndirme ilerlemiyor")
+                if self.progress and now - last_report >= 1.0:
+                    last_report = now
+                    self.progress(self._stats(started, 0, done=done))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _next_piece(self, pending, done, fetching, inflight, source, now, slow_after):
+        while pending:
+            index = pending.popleft()
+            if not done[index]:
+                return index
+        if slow_after is None:
+            return None
+        # Bekleyen parça kalmadı: en uzun süredir inen yavaş parçayı bu kaynağa da ver
+        candidate = None
+        for index, other, begun in inflight.values():
+            if (now - begun > slow_after and not done[index] and source not in fetching[index]
+                    and len(fetching[index]) < MAX_DUPLICATES):
+                if candidate is None or begun < candidate[2]:
+                    candidate = (index, other, begun)
+        if candidate is None:
+            return None
+        candidate[1].on_slow()
+        return candidate[0]
+
+    def _stats(self, started, resumed, done=None, final=False):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        downloaded = sum(source.bytes for source in self.sources)
+        completed = len(self.pieces) if final else sum(done)
+        return {
+            'name': self.manifest['name'],
+            'output': self.output,
+            'size': self.size,
+            'pieces': len(self.pieces),
+            'completed': completed,
+            'resumed': resumed,
+            'downloaded_bytes': downloaded,
+            'elapsed': round(elapsed, 3),
+            'throughput_bps': round(downloaded / elapsed),
+            'sources': [source.summary() for source in self.sources],
+        }
+
+
+def _print_progress(stats):
+    rate = stats['throughput_bps'] / (1024 * 1024)
+    limits = ' '.join(f"{s['url']}[{s['concurrency']}]" for s in stats['sources'])
+    sys.stderr.write(f"\r{stats['completed']}/{stats['pieces']} parça  {rate:.1f} MiB/s  {limits}   ")
+    sys.stderr.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='BitSwap çok kaynaklı paralel indirme')
+    parser.add_argument('target', help='.bwt dosyası veya magnet:?xt=urn:sha256:... bağlantısı')
+    parser.add_argument('-s', '--source', action='append', default=[],
+                        help='BitSwap sunucusu (http://host:port); birden çok verilebilir')
+    parser.add_argument('-o', '--output', help='çıktı dosyası (varsayılan: .bwt içindeki ad)')
+    parser.add_argument('--max-per-source', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help='kaynak başına en fazla eşzamanlı istek')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='istek zaman aşımı (saniye)')
+    parser.add_argument('--no-web-seed', action='store_true', help=".bwt'deki web_seed URL'lerini kullanma")
+    parser.add_argument('--json', action='store_true', help='sonucu JSON olarak yaz')
+    parser.add_argument('-q', '--quiet', action='store_true', help='ilerleme gösterme')
+    args = parser.parse_args(argv)
+
+    nodes = [node.rstrip('/') for node in args.source]
+    try:
+        verify_sha256 = None
+        if args.target.startswith('magnet:'):
+            magnet = parse_magnet(args.target)
+            manifest = fetch_manifest(nodes, magnet, args.timeout)
+            # Güven kaynağı magnet'teki hash: bitince tüm dosya doğrulanır
+            verify_sha256 = magnet['file_hash']
+        else:
+            manifest = load_bwt(args.target)
+
+        sources = [Source(node, 'node', args.max_per_source) for node in nodes]
+        if not args.no_web_seed:
+            for url in dict.fromkeys(manifest.get('web_seed') or []):
+                sources.append(Source(url, 'seed', args.max_per_source))
+        output = args.output or os.path.basename(manifest['name'])
+        downloader = Downloader(manifest, sources, output, args.timeout, verify_sha256,
+                                None if args.quiet or args.json else _print_progress)
+        stats = downloader.run()
+    except DownloadError as e:
+        print(f'\nHata: {e}', file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        rate = stats['throughput_bps'] / (1024 * 1024)
+        print(f"\n{stats['output']}: {stats['size']} byte, {stats['pieces']} parça "
+              f"({stats['resumed']} devam), {stats['elapsed']} sn, {rate:.1f} MiB/s")
+        for source in stats['sources']:
+            print(f"  {source['url']}: {source['pieces']} parça, {source['bytes']} byte, "
+                  f"{source['failures']} hata, son eşzamanlılık {source['concurrency']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
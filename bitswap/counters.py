@@ -0,0 +1,109 @@
+"""
+Toplu yazılan indirme sayaçları
+
+Her indirmede UPDATE + COMMIT yapmak popüler dosyalarda SQLite yazma
+kilidini sıraya sokar. DownloadCounter artışları bellekte biriktirir
+ve tek bir transaction içinde toplu yazar:
+
+- her flush_interval saniyede bir (arka plan thread'i),
+- bekleyen artış sayısı flush_threshold'a ulaştığında,
+- stop() ile kapanışta.
+
+Süreç çökerse kaybolabilecek en fazla artış: flush_threshold adet
+veya son flush_interval saniyedeki artışlar (hangisi önce dolarsa).
+Flush başarısız olursa sayılar bir sonraki denemeye geri eklenir.
+"""
+
+import threading
+from collections import Counter
+
+from bitswap.db import ADD_DOWNLOADS
+
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_FLUSH_THRESHOLD = 500
+
+
+class DownloadCounter:
+    """İndirme sayaçlarını bellekte biriktirip toplu yazar"""
+
+    def __init__(self, db, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 flush_threshold=DEFAULT_FLUSH_THRESHOLD, on_flush=None):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        # Başarılı her yazımdan sonra çağrılır (örn. CatalogVersion.refresh)
+        self.on_flush = on_flush
+        self._pending = Counter()
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        # Aynı anda tek flush: sıralı yazım, gereksiz kilit yarışı yok
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def increment(self, file_hash, n=1):
+        with self._lock:
+            self._pending[file_hash] += n
+            self._pending_total += n
+            due = self._pending_total >= self.flush_threshold
+        if due:
+            self.flush()
+
+    def pending(self, file_hash=None):
+        """Henüz yazılmamış artışlar (tek dosya veya toplam)"""
+        with self._lock:
+            if file_hash is None:
+                return self._pending_total
+            return self._pending.get(file_hash, 0)
+
+    def flush(self):
+        """Bekleyen artışları tek transaction'da yaz; yazılan dosya sayısını döndür"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, Counter()
+                self._pending_total = 0
+            if not batch:
+                return 0
+            try:
+                with self.db.transaction() as conn:
+                    conn.executemany(ADD_DOWNLOADS, [(n, h) for h, n in batch.items()])
+            except Exception:
+                with self._lock:
+                    self._pending.update(batch)
+                    self._pending_total += sum(batch.values())
+                raise
+        if self.on_flush is not None:
+            self.on_flush()
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Bir sonraki turda yeniden denenir
+                pass
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='bitswap-counter-flush', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Arka plan thread'ini durdur ve kalanları yaz"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+def add_counter_arguments(parser):
+    """Sayaç flush ayarlarını argparse parser'ına ekle"""
+    parser.add_argument('--counter-flush-interval', type=float, default=DEFAULT_FLUSH_INTERVAL,
+                        help='indirme sayaçlarının en geç kaç saniyede bir yazılacağı')
+    parser.add_argument('--counter-flush-threshold', type=int, default=DEFAULT_FLUSH_THRESHOLD,
+                        help='bu kadar artış birikince beklemeden yaz (çökmede en fazla kayıp)')
+    return parser
@@ -0,0 +1,164 @@
+"""
+Paylaşılan SQLite erişim katmanı
+
+Her istekte sqlite3.connect/close yapmak yerine bağlantılar bir havuzda
+tutulur ve thread'ler arasında yeniden kullanılır. Bağlantılar WAL
+modunda açılır; okuyucular yazıcıyı beklemez. Yazma işlemleri
+BEGIN IMMEDIATE ile başlar, böylece kilit transaction başında alınır
+ve busy_timeout ile beklenir ("database is locked" yerine sıra beklenir).
+
+Sık kullanılan sorgular bu modülde (listeleme sorguları catalog'da)
+sabit olarak tanımlıdır; sqlite3'ün bağlantı başına statement cache'i
+SQL metnine göre çalıştığı için aynı metin her seferinde hazır
+(prepared) statement'ı yeniden kullanır.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from bitswap.metrics import SQLITE_QUERY_SECONDS, statement_label
+
+# Sık kullanılan sorgular
+FIND_BY_HASH = 'SELECT * FROM files WHERE file_hash = ?'
+EXISTS_BY_HASH = 'SELECT 1 FROM files WHERE file_hash = ?'
+# Aynı hash zaten varsa satır eklenmez (rowcount 0), bkz. blobs.add_file
+INSERT_FILE = '''
+    INSERT OR IGNORE INTO files (file_hash, original_name, file_path, file_size, mime_type, uploader_ip)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+# catalog_stats trigger'larla güncel tutulur (bkz. schema._v3_catalog_stats)
+STATS = 'SELECT total_files, total_size, total_downloads FROM catalog_stats WHERE id = 1'
+# files her değiştiğinde artar (bkz. schema._v5_catalog_version, changes)
+CATALOG_VERSION = 'SELECT version FROM catalog_stats WHERE id = 1'
+FIND_BY_INFO_HASH = 'SELECT file_hash, file_path, file_size FROM files WHERE info_hash = ?'
+# .bwt manifest'i üretildiğinde (bkz. manifest.ensure_manifest)
+SET_INFO_HASH = 'UPDATE files SET info_hash = ? WHERE file_hash = ?'
+# Toplu artış: (adet, hash) — bkz. counters.DownloadCounter
+ADD_DOWNLOADS = 'UPDATE files SET download_count = download_count + ? WHERE file_hash = ?'
+
+DEFAULT_POOL_SIZE = 32
+BUSY_TIMEOUT = 30.0
+CACHE_SIZE_KB = 16 * 1024
+STATEMENT_CACHE_SIZE = 256
+BEGIN_RETRIES = 5
+
+
+class TimedConnection(sqlite3.Connection):
+    """execute/executemany/commit sürelerini metriklere işleyen bağlantı"""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            SQLITE_QUERY_SECONDS.labels(statement_label(sql)).observe(time.perf_counter() - started)
+
+    def executemany(self, sql, parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            SQLITE_QUERY_SECONDS.labels(statement_label(sql)).observe(time.perf_counter() - started)
+
+    def commit(self):
+        started = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            SQLITE_QUERY_SECONDS.labels('commit').observe(time.perf_counter() - started)
+
+
+class Database:
+    """Havuzlanmış, WAL modunda SQLite bağlantıları"""
+
+    def __init__(self, path, pool_size=DEFAULT_POOL_SIZE, busy_timeout=BUSY_TIMEOUT):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+        self._local = threading.local()
+
+    def _connect(self):
+        # isolation_level=None: transaction'ları transaction() ile kendimiz yönetiyoruz
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE,
+                               factory=TimedConnection)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        # WAL ile NORMAL güvenli: commit'ler checkpoint'e kadar fsync beklemez
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Havuzdan bir bağlantı ödünç al; iç içe çağrılar aynı bağlantıyı kullanır"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """Yazma transaction'ı: BEGIN IMMEDIATE ... COMMIT (hata olursa ROLLBACK)"""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                # İç içe transaction dıştakine katılır
+                yield conn
+                return
+            for attempt in range(BEGIN_RETRIES):
+                try:
+                    conn.execute('BEGIN IMMEDIATE')
+                    break
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e) and 'busy' not in str(e):
+                        raise
+                    if attempt == BEGIN_RETRIES - 1:
+                        raise
+                    time.sleep(0.05 * (2 ** attempt))
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def query_one(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def query_all(self, sql, params=()):
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def execute(self, sql, params=()):
+        """Tek bir yazma sorgusunu kendi transaction'ında çalıştır"""
+        with self.transaction() as conn:
+            return conn.execute(sql, params)
+
+    def close(self):
+        """Havuzdaki boş bağlantıları kapat"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
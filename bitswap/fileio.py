@@ -0,0 +1,61 @@
+"""
+Konumlu dosya okuma/yazma (pread/pwrite)
+
+Parça hash'leme ve parçalı upload'lar aynı dosyaya birden çok thread'den
+farklı offset'lerde erişir. POSIX'te os.pread/os.pwrite tek fd üzerinde
+dosya konumunu paylaşmadan çalışır. Bunların olmadığı platformlarda
+(Windows) her thread dosyayı kendi tamponsuz dosya nesnesiyle açar ve
+seek + read/write kullanır; konum thread'ler arasında paylaşılmaz.
+"""
+
+import os
+import threading
+
+HAS_PREAD = hasattr(os, 'pread') and hasattr(os, 'pwrite')
+# Windows'ta os.open metin kipinde açar
+O_BINARY = getattr(os, 'O_BINARY', 0)
+
+
+class PositionalFile:
+    """Açık bir fd üzerinde thread güvenli pread/pwrite"""
+
+    def __init__(self, path, fd, writable=False):
+        self.path = path
+        self.fd = fd
+        self.mode = 'r+b' if writable else 'rb'
+        self._local = threading.local()
+        self._files = []
+        self._lock = threading.Lock()
+
+    def _file(self):
+        f = getattr(self._local, 'file', None)
+        if f is None:
+            f = open(self.path, self.mode, buffering=0)
+            with self._lock:
+                self._files.append(f)
+            self._local.file = f
+        return f
+
+    def pread(self, size, offset):
+        if HAS_PREAD:
+            return os.pread(self.fd, size, offset)
+        f = self._file()
+        f.seek(offset)
+        return f.read(size)
+
+    def pwrite(self, data, offset):
+        if HAS_PREAD:
+            return os.pwrite(self.fd, data, offset)
+        f = self._file()
+        f.seek(offset)
+        view = memoryview(data)
+        while view:
+            view = view[f.write(view):]
+        return len(data)
+
+    def close(self):
+        """Thread'lerin açtığı dosya nesnelerini kapat (fd çağıranındır)"""
+        with self._lock:
+            files, self._files = self._files, []
+        for f in files:
+            f.close()
@@ -0,0 +1,81 @@
+"""
+Yüklenen dosyaları diske akış halinde yazma
+
+SpooledUpload gelen chunk'ları upload dizininde geçici bir dosyaya
+yazar ve SHA-256'yı veri gelirken hesaplar. Hash belli olduktan sonra
+dosya os.replace ile atomik olarak yerine taşınır ya da (zaten
+mevcutsa) silinir.
+"""
+
+import os
+import hashlib
+import tempfile
+import time
+
+from bitswap.metrics import UPLOAD_HASH_SECONDS, UPLOAD_WRITE_SECONDS
+
+
+class SpooledUpload:
+    """Upload dizininde geçici dosya + artımlı SHA-256"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.part')
+        self._file = os.fdopen(fd, 'wb')
+        self._hash = hashlib.sha256()
+        self.size = 0
+        self.committed = False
+        # Upload başına toplam süreler; kapanışta metriklere işlenir
+        self.write_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    def write(self, chunk):
+        started = time.perf_counter()
+        self._file.write(chunk)
+        written = time.perf_counter()
+        self._hash.update(chunk)
+        self.write_seconds += written - started
+        self.hash_seconds += time.perf_counter() - written
+        self.size += len(chunk)
+
+    def write_from(self, chunks):
+        for chunk in chunks:
+            self.write(chunk)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            UPLOAD_WRITE_SECONDS.labels('stream').observe(self.write_seconds)
+            UPLOAD_HASH_SECONDS.labels('stream').observe(self.hash_seconds)
+
+    def commit(self, path):
+        """Geçici dosyayı atomik olarak path'e taşı"""
+        self.close()
+        # mkstemp 0600 oluşturur; normal dosya izinlerine çek
+        os.chmod(self.temp_path, 0o644)
+        os.replace(self.temp_path, path)
+        self.committed = True
+
+    def rollback(self, path):
+        """commit'i geri al: dosyayı path'ten geçici yoluna geri taşı"""
+        os.replace(path, self.temp_path)
+        self.committed = False
+
+    def discard(self):
+        """Geçici dosyayı sil (ör. aynı hash zaten kayıtlıysa)"""
+        self.close()
+        if not self.committed:
+            try:
+                os.unlink(self.temp_path)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.discard()
+        return False
@@ -0,0 +1,142 @@
+"""
+.bwt metadata üretimi
+
+Rust tarafındaki BitSwapMetadata (crates/bit-swap-core/src/metadata.rs)
+ile aynı JSON: 512 KiB'lık parçaların SHA-256'ları (pieces) ve
+{name, piece_length, pieces, files} sözlüğünün kompakt JSON'unun
+SHA-256'sı olan info_hash. Böylece sunucunun ürettiği .bwt dosyaları
+Rust istemcisiyle doğrulanabilir.
+
+Parça hash'leri paylaşılan bir thread havuzunda hesaplanır: hashlib
+büyük bloklarda GIL'i bırakır, her görev kendi parça aralığını
+os.pread ile (Windows'ta thread başına dosya nesnesiyle, bkz. fileio)
+okur; çok GB'lık bir dosya tek çekirdeğe bağlı kalmaz. Parçalı
+upload'larda hash'ler parçalar gelirken hesaplanmıştır (bkz.
+resumable) ve pieces ile verilir; dosya yeniden okunmaz.
+
+Manifest blob'un yanında uploads/ab/cd/<hash>.bwt olarak saklanır;
+info_hash ayrıca files.info_hash'e yazılır (bkz. schema._v6_info_hash).
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from bitswap.db import SET_INFO_HASH
+from bitswap.fileio import O_BINARY, PositionalFile
+
+PIECE_LENGTH = 524288
+CREATED_BY = 'BitSwapTorrent/0.1.0'
+# Görev başına parça sayısı (8 MiB): havuz yükü ile paralellik arasında denge
+PIECES_PER_TASK = 16
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1,
+                                           thread_name_prefix='bitswap-piece')
+        return _executor
+
+
+def hash_pieces(path, piece_length=PIECE_LENGTH):
+    """Dosyanın parça hash'leri (hex), tüm çekirdeklerde paralel"""
+    fd = os.open(path, os.O_RDONLY | O_BINARY)
+    reader = PositionalFile(path, fd)
+    try:
+        size = os.fstat(fd).st_size
+        count = (size + piece_length - 1) // piece_length
+
+        def hash_span(first):
+            hashes = []
+            for index in range(first, min(first + PIECES_PER_TASK, count)):
+                data = reader.pread(piece_length, index * piece_length)
+                hashes.append(hashlib.sha256(data).hexdigest())
+            return hashes
+
+        pieces = []
+        for hashes in _pool().map(hash_span, range(0, count, PIECES_PER_TASK)):
+            pieces.extend(hashes)
+        return pieces
+    finally:
+        reader.close()
+        os.close(fd)
+
+
+def info_hash(name, piece_length, pieces, files):
+    """Rust InfoDict'in serde_json çıktısının SHA-256'sı"""
+    info = {'name': name, 'piece_length': piece_length, 'pieces': pieces, 'files': files}
+    raw = json.dumps(info, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def build_manifest(path, name, piece_length=PIECE_LENGTH, extra=None, pieces=None):
+    """Tek dosyalık .bwt sözlüğü (alan sırası Rust struct'ı ile aynı)
+
+    pieces verilmezse parça hash'leri dosyadan hesaplanır.
+    """
+    if pieces is None:
+        pieces = hash_pieces(path, piece_length)
+    files = [{'path': [name], 'length': os.path.getsize(path)}]
+    return {
+        'name': name,
+        'created_by': CREATED_BY,
+        'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'piece_length': piece_length,
+        'pieces': pieces,
+        'files': files,
+        'info_hash': info_hash(name, piece_length, pieces, files),
+        'trackers': [],
+        'web_seed': [],
+        'extra': extra or {},
+    }
+
+
+def manifest_path(store, file_hash):
+    return store.path(file_hash) + '.bwt'
+
+
+def load_manifest(store, file_hash):
+    with open(manifest_path(store, file_hash), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(store, file_hash, manifest):
+    """Geçici dosyaya yazıp os.replace: okuyucular yarım JSON görmez"""
+    path = manifest_path(store, file_hash)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # mkstemp: thread ve (prefork'ta) süreçler arasında benzersiz ad
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.manifest-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        # mkstemp 0600 oluşturur; normal dosya izinlerine çek
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def ensure_manifest(db, store, file_hash, blob_path, name, pieces=None):
+    """Kayıtlı manifest'i döndür; yoksa üret, sakla ve info_hash'i yaz"""
+    try:
+        return load_manifest(store, file_hash)
+    except FileNotFoundError:
+        pass
+    manifest = build_manifest(blob_path, name, extra={'sha256': file_hash}, pieces=pieces)
+    save_manifest(store, file_hash, manifest)
+    db.execute(SET_INFO_HASH, (manifest['info_hash'], file_hash))
+    return manifest
@@ -0,0 +1,467 @@
+"""
+Upload ve indirme yolları için bellek regresyon kontrolü
+
+Her sunucu (python-server, working-server, simple-server) bu süreç
+içinde, geçici bir klasörde ve yerel bir portta çalıştırılır; sentetik
+dosyalar (varsayılan 1 MiB, 64 MiB, 1 GiB; --sizes ile birkaç GiB)
+şu yollarla gönderilip geri alınır:
+
+- upload: multipart POST /api/upload
+- resumable: /api/uploads oturumu, 4 MiB'lık PUT parçaları, finalize
+- download: dosyanın tamamı için GET
+
+Her durum için tracemalloc tepe değeri (Python tahsisleri) ve RSS
+tepe artışı (/proc/self/clear_refs ile sıfırlanan VmHWM; yoksa
+örnekleme) ölçülür. Akış halinde çalışan yolların belleği dosya
+boyutuyla büyümemelidir: bütçeler boyuttan bağımsızdır ve aşılırsa
+çıkış kodu 1 olur.
+
+--check, upload/indirme yollarına dokunan değişikliklerde merge'den
+önce geçmesi gereken kapıdır: üç sunucu ve üç yol, bütçelerin çok
+üstünde bir boyutla (256 MiB) ölçülür; dosya boyutuyla büyüyen bir
+tampon bütçeyi aşar. JSON yalnızca --output ile yazılır; herhangi bir
+aşım ya da başlatılamayan sunucu çıkış kodunu 1 yapar. CI'da
+.github/workflows/memcheck.yml bu kapıyı çalıştırır.
+
+İstemci de aynı süreçtedir ama veriyi tek bir önceden ayrılmış
+tampondan gönderir ve readinto ile alır; ölçüme katkısı sabittir.
+
+Kullanım:
+    python -m bitswap.memcheck --check
+    python -m bitswap.memcheck
+    python -m bitswap.memcheck --sizes 1MiB,1GiB,4GiB --output mem.json
+    python -m bitswap.memcheck --servers working-server --rss-budget upload=48MiB
+"""
+
+import argparse
+import contextlib
+import http.client
+import importlib.util
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from bitswap.bench import REPO_ROOT, SERVERS
+from bitswap.serving import PooledHTTPServer
+from bitswap.units import parse_size
+
+PATHS = ('upload', 'resumable', 'download')
+DEFAULT_SIZES = '1MiB,64MiB,1GiB'
+# --check: bütçelerin (en fazla 48 MiB) çok üstünde, birkaç saniyede biten boyutlar
+CHECK_SIZES = '1MiB,256MiB'
+MIB = 1024 * 1024
+# Yol -> (tracemalloc tepe bütçesi, RSS tepe artışı bütçesi); dosya boyutundan bağımsız.
+# simple-server (werkzeug) boyuttan bağımsız ~10 MiB'lık geçici tepe gösterir;
+# download bütçesi bunu kaldırır ama dosyanın tamamını belleğe alan bir yolu yakalar.
+BUDGETS = {
+    'upload': (16 * MIB, 64 * MIB),
+    'resumable': (24 * MIB, 96 * MIB),
+    'download': (16 * MIB, 48 * MIB),
+}
+BLOCK_SIZE = MIB
+CHUNK_SIZE = 4 * MIB
+NONCE_SIZE = 16
+MULTIPART_OVERHEAD = 4096
+WARMUP_SIZE = 256 * 1024
+WARMUP_ROUNDS = 2
+RSS_SAMPLE_INTERVAL = 0.01
+BOUNDARY = 'bitswap-memcheck-boundary'
+
+
+def _status_bytes(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """VmHWM'i şimdiki RSS'e çek (Linux 4.0+); olmazsa False"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class MemoryProbe:
+    """Bir durum boyunca tracemalloc ve RSS tepe artışı"""
+
+    def __enter__(self):
+        self._stop = threading.Event()
+        self._sampled = 0
+        self._use_hwm = _reset_peak_rss() and _status_bytes('VmHWM') is not None
+        self.rss_before = _status_bytes('VmRSS') or 0
+        if not self._use_hwm:
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        tracemalloc.reset_peak()
+        self.traced_before = tracemalloc.get_traced_memory()[0]
+        self.started = time.perf_counter()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self._sampled = max(self._sampled, _status_bytes('VmRSS') or 0)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.started
+        self.traced_peak = tracemalloc.get_traced_memory()[1] - self.traced_before
+        if self._use_hwm:
+            peak = _status_bytes('VmHWM')
+        else:
+            self._stop.set()
+            self._thread.join()
+            peak = self._sampled
+        self.rss_peak = max(0, peak - self.rss_before)
+        return False
+
+
+def _load_module(name):
+    """Sunucu betiğini __main__ olmadan yükle (çalışma klasörü önceden ayarlanmalı)"""
+    path = os.path.join(REPO_ROOT, SERVERS[name][0])
+    spec = importlib.util.spec_from_file_location('memcheck_' + name.replace('-', '_'), path)
+    module = importlib.util.module_from_spec(spec)
+    # Flask uygulama kökünü sys.modules üzerinden bulur
+    sys.modules[spec.name] = module
+    with contextlib.redirect_stdout(sys.stderr):
+        spec.loader.exec_module(module)
+    return module
+
+
+class InProcessServer:
+    """Bu süreçte, arka plan thread'inde çalışan bir sunucu
+
+    Sadece ölçülen yolların ihtiyacı kurulur (şema, depo); sayaç
+    flush'ı, tracker gibi arka plan servisleri başlatılmaz.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.download_path = SERVERS[name][1]
+        self.directory = tempfile.mkdtemp(prefix=f'bitswap-memcheck-{name}-')
+        self.max_size = None
+        self.module = None
+        self._cwd = os.getcwd()
+        self._server = None
+
+    def start(self):
+        # Sunucular veritabanı ve uploads/ için göreli yollar kullanır
+        os.chdir(self.directory)
+        module = self.module = _load_module(self.name)
+        if self.name == 'simple-server':
+            from werkzeug.serving import make_server
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            module.init_db()
+            self.store = module.store
+            self.max_size = module.app.config['MAX_CONTENT_LENGTH']
+            self._server = make_server('127.0.0.1', 0, module.app, threaded=True)
+        else:
+            handler = module.BitSwapHandler
+            handler.init_database()
+            self.store = handler.store
+            # İstek logları (python-server stderr'e yazar) çıktıyı boğmasın
+            quiet = type('QuietHandler', (handler,), {'log_message': lambda self, *args: None})
+            self._server = PooledHTTPServer(('127.0.0.1', 0), quiet, workers=4)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            # Bekleyen yazımlar göreli yollar başka klasörü göstermeden bitsin
+            if self.name == 'simple-server':
+                self.module.downloads.stop()
+                self.module.uploads.stop()
+                self.module.catalog.stop()
+                self.module.db.close()
+            else:
+                self.module.BitSwapHandler.downloads.flush()
+                self.module.BitSwapHandler.db.close()
+        os.chdir(self._cwd)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def remove(self, file_hash):
+        """Büyük dosyaları boyutlar arasında diskten sil"""
+        try:
+            os.remove(self.store.path(file_hash))
+        except OSError:
+            pass
+
+
+class SyntheticFile:
+    """Tek bir 1 MiB bloğun tekrarı; baştaki rastgele nonce içeriği tekil yapar"""
+
+    def __init__(self, block, size, rng):
+        self.block = memoryview(block)
+        self.size = size
+        self.nonce = rng.randbytes(min(NONCE_SIZE, size))
+
+    def send(self, conn, start=0, stop=None):
+        """[start, stop) aralığını kopyalamadan gönder"""
+        stop = self.size if stop is None else stop
+        position = start
+        if position < len(self.nonce):
+            conn.send(self.nonce[position:min(stop, len(self.nonce))])
+            position = min(stop, len(self.nonce))
+        while position < stop:
+            offset = position % BLOCK_SIZE
+            length = min(BLOCK_SIZE - offset, stop - position)
+            conn.send(self.block[offset:offset + length])
+            position += length
+
+
+def _json_response(conn):
+    response = conn.getresponse()
+    body = response.read()
+    try:
+        result = json.loads(body)
+    except ValueError:
+        result = {}
+    if response.status not in (200, 201) or not result.get('success', True):
+        raise RuntimeError(f'HTTP {response.status}: {body[:200]!r}')
+    return result
+
+
+def upload(server, synthetic):
+    head = (f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; '
+            f'filename="memcheck.bin"\r\nContent-Type: application/octet-stream\r\n\r\n').encode()
+    tail = f'\r\n--{BOUNDARY}--\r\n'.encode()
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=600)
+    try:
+        conn.putrequest('POST', '/api/upload')
+        conn.putheader('Content-Type', f'multipart/form-data; boundary={BOUNDARY}')
+        conn.putheader('Content-Length', str(len(head) + synthetic.size + len(tail)))
+        conn.endheaders()
+        conn.send(head)
+        synthetic.send(conn)
+        conn.send(tail)
+        return _json_response(conn)['hash']
+    finally:
+        conn.close()
+
+
+def resumable(server, synthetic):
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=600)
+    try:
+        body = json.dumps({'size': synthetic.size, 'name': 'memcheck.bin', 'chunk_size': CHUNK_SIZE})
+        conn.request('POST', '/api/uploads', body, {'Content-Type': 'application/json'})
+        session = _json_response(conn)['session']
+        for offset in range(0, synthetic.size, CHUNK_SIZE):
+            stop = min(offset + CHUNK_SIZE, synthetic.size)
+            conn.putrequest('PUT', f'/api/uploads/{session}?offset={offset}')
+            conn.putheader('Content-Type', 'application/octet-stream')
+            conn.putheader('Content-Length', str(stop - offset))
+            conn.endheaders()
+            synthetic.send(conn, offset, stop)
+            _json_response(conn)
+            # http.server sunucuları HTTP/1.0: her istekte yeni bağlantı
+            conn.close()
+        conn.request('POST', f'/api/uploads/{session}/finalize')
+        return _json_response(conn)['hash']
+    finally:
+        conn.close()
+
+
+def download(server, file_hash, expected_size, buffer):
+    conn = http.client.HTTPConnection('127.0.0.1', server.port, timeout=600)
+    try:
+        conn.request('GET', server.download_path.format(file_hash))
+        response = conn.getresponse()
+        if response.status != 200:
+            raise RuntimeError(f'HTTP {response.status}')
+        received = 0
+        while True:
+            n = response.readinto(buffer)
+            if not n:
+                break
+            received += n
+        if received != expected_size:
+            raise RuntimeError(f'{received} byte alındı, {expected_size} bekleniyordu')
+    finally:
+        conn.close()
+
+
+def check_server(name, sizes, paths, budgets, block, rng):
+    """Tek sunucu için tüm boyut/yol durumları -> (sonuçlar, aşılan bütçeler)"""
+    results = {}
+    failures = []
+    # İndirme tamponu ölçüm dışında bir kez ayrılır
+    buffer = bytearray(BLOCK_SIZE)
+    server = InProcessServer(name).start()
+    try:
+        # Isınma: ilk isteklerdeki tembel import'lar ve önbellekler ölçüme girmesin
+        for _ in range(WARMUP_ROUNDS):
+            warmup = SyntheticFile(block, WARMUP_SIZE, rng)
+            file_hash = upload(server, warmup)
+            download(server, file_hash, WARMUP_SIZE, buffer)
+            server.remove(resumable(server, SyntheticFile(block, WARMUP_SIZE, rng)))
+            server.remove(file_hash)
+        for size in sizes:
+            label = _size_label(size)
+            cases = results[label] = {}
+            file_hash = None
+            for path in paths:
+                # Multipart gövdesi dosyadan biraz büyüktür
+                body_size = size + MULTIPART_OVERHEAD if path != 'resumable' else size
+                if server.max_size is not None and body_size > server.max_size:
+                    cases[path] = {'skipped': f'sunucu sınırı aşılıyor ({server.max_size} byte)'}
+                    continue
+                synthetic = SyntheticFile(block, size, rng)
+                created = None
+                try:
+                    if path == 'download' and file_hash is None:
+                        # İndirilecek dosya ölçüm dışında yüklenir
+                        file_hash = upload(server, synthetic)
+                    with MemoryProbe() as probe:
+                        if path == 'upload':
+                            created = upload(server, synthetic)
+                        elif path == 'resumable':
+                            created = resumable(server, synthetic)
+                        else:
+                            download(server, file_hash, size, buffer)
+                except (OSError, RuntimeError, http.client.HTTPException) as e:
+                    cases[path] = {'error': str(e)}
+                    failures.append(f'{name} {path} {label}: {e}')
+                    continue
+                if created is not None:
+                    if file_hash is None:
+                        file_hash = created
+                    else:
+                        server.remove(created)
+                traced_budget, rss_budget = budgets[path]
+                case = {
+                    'tracemalloc_peak_bytes': probe.traced_peak,
+                    'rss_peak_bytes': probe.rss_peak,
+                    'seconds': round(probe.seconds, 3),
+                    'mbps': round(size / probe.seconds / 1e6, 1) if probe.seconds else None,
+                    'budget': {'tracemalloc_bytes': traced_budget, 'rss_bytes': rss_budget},
+                }
+                case['ok'] = probe.traced_peak <= traced_budget and probe.rss_peak <= rss_budget
+                cases[path] = case
+                if not case['ok']:
+                    failures.append(f'{name} {path} {label}: tracemalloc {_mib(probe.traced_peak)} '
+                                    f'(bütçe {_mib(traced_budget)}), RSS {_mib(probe.rss_peak)} '
+                                    f'(bütçe {_mib(rss_budget)})')
+                print(f'{name} {path} {label}: tracemalloc {_mib(probe.traced_peak)}, '
+                      f'RSS +{_mib(probe.rss_peak)}, {probe.seconds:.2f} sn'
+                      f'{"" if case["ok"] else "  <-- BÜTÇE AŞILDI"}', file=sys.stderr)
+            if file_hash is not None:
+                server.remove(file_hash)
+    finally:
+        server.stop()
+    return results, failures
+
+
+def _size_label(size):
+    for unit, factor in (('GiB', 1024 ** 3), ('MiB', MIB), ('KiB', 1024)):
+        if size >= factor and size % factor == 0:
+            return f'{size // factor}{unit}'
+    return f'{size}B'
+
+
+def _mib(value):
+    return f'{value / MIB:.1f} MiB'
+
+
+def _budget_overrides(values, index, budgets, parser):
+    """'upload=16MiB,download=8MiB' değerlerini bütçelere uygula"""
+    for value in values or ():
+        for item in value.split(','):
+            path, _, size = item.replace(':', '=').partition('=')
+            path = path.strip()
+            if path not in budgets:
+                parser.error(f'bilinmeyen yol: {path}')
+            try:
+                size = parse_size(size)
+            except ValueError:
+                parser.error(f'geçersiz bütçe: {item}')
+            updated = list(budgets[path])
+            updated[index] = size
+            budgets[path] = tuple(updated)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Upload/indirme yolları için bellek bütçesi kontrolü')
+    parser.add_argument('--servers', default=','.join(SERVERS),
+                        help='virgülle ayrılmış sunucular: ' + ', '.join(SERVERS))
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='dosya boyutları, ör. 1MiB,1GiB,4GiB')
+    parser.add_argument('--paths', default=','.join(PATHS), help='ölçülecek yollar: ' + ', '.join(PATHS))
+    parser.add_argument('--tracemalloc-budget', action='append', metavar='YOL=BOYUT',
+                        help='tracemalloc tepe bütçesi, ör. upload=16MiB (tekrarlanabilir)')
+    parser.add_argument('--rss-budget', action='append', metavar='YOL=BOYUT',
+                        help='RSS tepe artışı bütçesi, ör. download=48MiB (tekrarlanabilir)')
+    parser.add_argument('--seed', type=int, default=1, help='rastgelelik tohumu')
+    parser.add_argument('--output', help='JSON dosyası (varsayılan: stdout)')
+    parser.add_argument('--check', action='store_true',
+                        help=f'merge öncesi kapı: --sizes {CHECK_SIZES}, stdout\'a yalnızca sonuç')
+    args = parser.parse_args(argv)
+    if args.check and args.sizes == DEFAULT_SIZES:
+        args.sizes = CHECK_SIZES
+
+    names = [name.strip() for name in args.servers.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SERVERS]
+    if unknown:
+        parser.error('bilinmeyen sunucu: ' + ', '.join(unknown))
+    paths = [path.strip() for path in args.paths.split(',') if path.strip()]
+    if any(path not in PATHS for path in paths):
+        parser.error('--paths yalnızca şunları içerebilir: ' + ', '.join(PATHS))
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    budgets = dict(BUDGETS)
+    _budget_overrides(args.tracemalloc_budget, 0, budgets, parser)
+    _budget_overrides(args.rss_budget, 1, budgets, parser)
+
+    rng = random.Random(args.seed)
+    # Gönderilen tek tampon ölçüm başlamadan ayrılır
+    block = rng.randbytes(BLOCK_SIZE)
+    tracemalloc.start()
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {'servers': names, 'sizes': sizes, 'paths': paths,
+                       'budgets': {path: list(budget) for path, budget in budgets.items()}},
+        },
+        'servers': {},
+        'failures': [],
+    }
+    for name in names:
+        try:
+            results, failures = check_server(name, sizes, paths, budgets, block, rng)
+        except (ImportError, OSError, RuntimeError) as e:
+            results, failures = {'error': str(e)}, [f'{name}: {e}']
+        report['servers'][name] = results
+        report['failures'].extend(failures)
+    tracemalloc.stop()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    elif not args.check:
+        print(output)
+    for failure in report['failures']:
+        print('BAŞARISIZ: ' + failure, file=sys.stderr)
+    if args.check:
+        print('memcheck: ' + (f"{len(report['failures'])} başarısız" if report['failures'] else 'geçti'))
+    return 1 if report['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
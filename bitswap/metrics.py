@@ -0,0 +1,478 @@
+"""
+Süreç içi metrikler ve Prometheus metin formatı
+
+Sayaç (Counter), anlık değer (Gauge) ve sabit kovalı histogram
+(Histogram) aileleri tek bir kayıt defterinde (REGISTRY) tutulur ve
+/metrics'te Prometheus metin formatında (0.0.4) sunulur. Etiketli her
+seri ilk kullanımda bir kez oluşturulur; sonraki güncellemeler tek bir
+sözlük araması ve kısa bir kilitten ibarettir, istek yolunda ek
+tahsis veya I/O yoktur.
+
+Ölçülenler:
+
+- HTTP: rota başına istek süresi, durum kodlu istek sayısı, gelen/giden
+  byte'lar ve o anda işlenen istek sayısı. Rotalar sabit bir tabloya
+  indirgenir (route_label), hash ve oturum id'leri etikete girmez.
+- Upload: upload başına SHA-256 ve disk yazma süreleri (bkz. ingest,
+  resumable).
+- SQLite: sorgu türüne göre execute ve commit süreleri (bkz. db). BEGIN
+  IMMEDIATE süresi yazma kilidi için beklenen süredir.
+- Bant genişliği: sınırlı aktarımların token bekleyerek geçirdiği süre
+  (bkz. shaping).
+- Süreç: CPU süresi, RSS ve thread sayısı (Linux /proc).
+
+Çok süreçli çalışmada (bkz. prefork) /metrics'i yanıtlayan süreç diğer
+süreçlerin collect() çıktılarını da toplar; her seri process etiketi
+taşır.
+
+Yavaş bir düğümde bu süreler birlikte okunur: istek süresinin çoğu
+hash'te ise CPU, yazmada ise disk, BEGIN/commit'te ise SQLite kilidi
+darboğazdır.
+"""
+
+import bisect
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+try:
+    import resource
+except ImportError:
+    # Windows: getrusage yok
+    resource = None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+UPLOAD_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                  60.0, 300.0)
+
+# Tam eşleşen rotalar; diğerleri önek tablosuyla etiketlenir
+ROUTES = frozenset((
+    '/', '/metrics', '/api/files', '/api/changes', '/api/upload', '/api/upload/negotiate',
+    '/api/uploads', '/api/announce', '/api/scrape', '/api/download', '/api/admin/profile',
+    '/api/admin/bandwidth',
+))
+ROUTE_PREFIXES = (
+    ('/download/', '/download/:hash'),
+    ('/api/piece/', '/api/piece/:info_hash/:index'),
+    ('/api/metadata/', '/api/metadata/:hash'),
+    ('/api/uploads/', '/api/uploads/:id'),
+    ('/ui/', '/ui/:asset'),
+    ('/uploads/', '/uploads/:file'),
+)
+
+
+def route_label(path):
+    """İstek yolu -> sınırlı sayıda değer alan rota etiketi"""
+    path = urlparse(path).path
+    if path in ROUTES:
+        return path
+    for prefix, label in ROUTE_PREFIXES:
+        if path.startswith(prefix):
+            if label == '/api/uploads/:id' and path.endswith('/finalize'):
+                return '/api/uploads/:id/finalize'
+            return label
+    return 'other'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_text(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Etiket değerleri -> seri eşlemesi olan metrik ailesi"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values):
+        """Etiket değerlerine ait seri (ilk çağrıda oluşturulur)"""
+        series = self._series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: {len(self.labelnames)} etiket bekleniyor")
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def collect(self, extra=''):
+        """(ad, HELP/TYPE satırları, örnek satırları); extra her örneğe eklenen etiket metni"""
+        header = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        samples = []
+        for values, series in sorted(self._series.items()):
+            samples.extend(self._sample_lines(values, series, extra))
+        return self.name, header, samples
+
+
+class _Value:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Yalnızca artan sayaç; function verilirse değer okunurken hesaplanır
+
+    function None döndürürse (değer bu platformda ölçülemiyor) seri
+    çıktıya yazılmaz.
+    """
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        self.function = function
+        super().__init__(name, documentation, labelnames)
+
+    def _new_series(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def _sample_lines(self, values, series, extra=''):
+        return [f'{self.name}{_label_text(self.labelnames, values, extra)} {_format_value(series.value)}']
+
+    def collect(self, extra=''):
+        if self.function is not None:
+            value = self.function()
+            if value is None:
+                return self.name, [], []
+            self._default.set(value)
+        return super().collect(extra)
+
+
+class Gauge(Counter):
+    """Artıp azalabilen anlık değer"""
+
+    type = 'gauge'
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set(self, value):
+        self._default.set(value)
+
+
+class Histogram(_Metric):
+    """Sabit kovalı histogram (kovalar artan sırada, +Inf otomatik eklenir)"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def _sample_lines(self, values, series, extra=''):
+        with series.lock:
+            counts = list(series.counts)
+            total = series.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = 'le="' + _format_value(float(bound)) + '"'
+            bucket_extra = f'{extra},{le}' if extra else le
+            lines.append(f'{self.name}_bucket{_label_text(self.labelnames, values, bucket_extra)} {cumulative}')
+        labels = _label_text(self.labelnames, values, extra)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class _HistogramSeries:
+    __slots__ = ('buckets', 'counts', 'sum', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class Registry:
+    """Metrik aileleri; render() Prometheus metin formatını üretir"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"{metric.name} zaten kayıtlı")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=(), function=None):
+        return self.register(Counter(name, documentation, labelnames, function))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collect(self, extra=''):
+        """Tüm ailelerin collect() çıktıları (bkz. render_families)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [metric.collect(extra) for metric in metrics]
+
+    def render(self):
+        return render_families(self.collect())
+
+
+def render_families(families):
+    """collect() çıktılarını (ör. birden çok süreçten) aile adına göre birleştirip metne çevir"""
+    merged = {}
+    for name, header, samples in families:
+        merged.setdefault(name, (header, []))[1].extend(samples)
+    lines = []
+    for header, samples in merged.values():
+        lines.extend(header)
+        lines.extend(samples)
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def _process_cpu_seconds():
+    if resource is None:
+        return time.process_time()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _process_rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        if resource is None:
+            return None
+        # /proc yoksa en yüksek RSS (Linux'ta KiB)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'bitswap_http_requests_total', 'HTTP requests by method, route and status',
+    ('method', 'route', 'status'))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'bitswap_http_request_duration_seconds', 'HTTP request latency including the response body',
+    ('method', 'route'))
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    'bitswap_http_requests_in_flight', 'HTTP requests currently being handled')
+HTTP_RECEIVED_BYTES = REGISTRY.counter(
+    'bitswap_http_received_bytes_total', 'Request body bytes by route', ('route',))
+HTTP_SENT_BYTES = REGISTRY.counter(
+    'bitswap_http_sent_bytes_total', 'Response body bytes by route', ('route',))
+HTTP_REJECTED = REGISTRY.counter(
+    'bitswap_http_rejected_total', 'Connections rejected with 503 because the worker queue was full')
+HTTP_HANDOFFS = REGISTRY.counter(
+    'bitswap_http_handoffs_total', 'Connections handed off to the process that owns the request state',
+    ('route',))
+SHAPING_WAIT_SECONDS = REGISTRY.counter(
+    'bitswap_shaping_wait_seconds_total', 'Time transfers spent waiting for bandwidth tokens',
+    ('direction',))
+UPLOAD_HASH_SECONDS = REGISTRY.histogram(
+    'bitswap_upload_hash_seconds', 'Time spent computing SHA-256 per upload', ('mode',),
+    UPLOAD_BUCKETS)
+UPLOAD_WRITE_SECONDS = REGISTRY.histogram(
+    'bitswap_upload_write_seconds', 'Time spent writing upload data to disk per upload', ('mode',),
+    UPLOAD_BUCKETS)
+SQLITE_QUERY_SECONDS = REGISTRY.histogram(
+    'bitswap_sqlite_query_seconds', 'SQLite statement time by statement type (begin = write lock wait)',
+    ('statement',), QUERY_BUCKETS)
+PROCESS_CPU_SECONDS = REGISTRY.counter(
+    'process_cpu_seconds_total', 'User and system CPU time of the process', function=_process_cpu_seconds)
+PROCESS_RSS_BYTES = REGISTRY.gauge(
+    'process_resident_memory_bytes', 'Resident set size of the process', function=_process_rss_bytes)
+PROCESS_THREADS = REGISTRY.gauge(
+    'process_threads', 'Threads in the process', function=threading.active_count)
+
+# SQL'in ilk kelimesi -> statement etiketi
+STATEMENTS = frozenset(('select', 'insert', 'update', 'delete', 'begin', 'commit', 'pragma'))
+
+
+def statement_label(sql):
+    word = sql.lstrip()[:7].split(None, 1)
+    word = word[0].lower() if word else ''
+    return word if word in STATEMENTS else 'other'
+
+
+class RequestTimer:
+    """Tek bir HTTP isteğinin ölçümü: oluşturulunca başlar, finish() ile biter"""
+
+    __slots__ = ('method', 'route', 'received', 'started')
+
+    def __init__(self, method, path, received=0):
+        self.method = method
+        self.route = route_label(path)
+        self.received = received
+        self.started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc()
+
+    def cancel(self):
+        """İsteği saymadan bırak (ör. başka sürece devredildi, orada ölçülür)"""
+        started, self.started = self.started, None
+        if started is not None:
+            HTTP_IN_FLIGHT.dec()
+
+    def finish(self, status, sent=0):
+        """İsteği metriklere işle; ikinci çağrı yok sayılır"""
+        started, self.started = self.started, None
+        if started is None:
+            return
+        HTTP_IN_FLIGHT.dec()
+        if self.received:
+            HTTP_RECEIVED_BYTES.labels(self.route).inc(self.received)
+        HTTP_REQUEST_SECONDS.labels(self.method, self.route).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(self.method, self.route, str(status)).inc()
+        if sent:
+            HTTP_SENT_BYTES.labels(self.route).inc(sent)
+
+
+def content_length(value):
+    """Content-Length başlığı -> int (yoksa veya hatalıysa 0)"""
+    try:
+        return max(0, int(value or 0))
+    except ValueError:
+        return 0
+
+
+class CountingWriter:
+    """wfile sarmalayıcısı: yazılan byte'ları sayar, gerisini asıl nesneye bırakır"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        return self.raw.write(data)
+
+    def bypassed(self, count):
+        """wfile'ı atlayarak (sendfile) sokete gönderilen byte'ları say"""
+        self.written += count
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class InstrumentedHandler:
+    """BaseHTTPRequestHandler karışımı: her isteği metriklere işler
+
+    Ölçüm istek satırı okunduktan sonra başlar (keep-alive'da bir
+    sonraki isteği bekleme süresi sayılmaz) ve do_* metodu yanıtı
+    gönderip döndüğünde biter. Durum kodu log_request'ten alınır. Giden
+    byte'lar başlıklardan sonra gerçekten gönderilenlerdir: wfile'a
+    yazılanlar ve transfer.send_file'ın sendfile ile gönderip bildirdiği
+    byte'lar. Yarıda kesilen aktarımda Content-Length sayılmaz.
+    """
+
+    request_timer = None
+
+    def setup(self):
+        super().setup()
+        self.wfile = CountingWriter(self.wfile)
+        self.body_start = 0
+
+    def parse_request(self):
+        ok = super().parse_request()
+        self.response_status = 'none'
+        self.body_start = self.wfile.written
+        if ok:
+            self.request_timer = RequestTimer(self.command, self.path,
+                                              content_length(self.headers.get('Content-Length')))
+        else:
+            # Hatalı istek satırı: send_error zaten gönderildi
+            self.request_timer = RequestTimer('invalid', '')
+        return ok
+
+    def handle_one_request(self):
+        self.request_timer = None
+        try:
+            super().handle_one_request()
+        finally:
+            timer = self.request_timer
+            if timer is not None:
+                self.request_timer = None
+                timer.finish(self.response_status, self.wfile.written - self.body_start)
+
+    def log_request(self, code='-', size='-'):
+        self.response_status = getattr(code, 'value', code)
+        super().log_request(code, size)
+
+    def end_headers(self):
+        super().end_headers()
+        self.body_start = self.wfile.written
+
+    def render_metrics(self):
+        return REGISTRY.render()
+
+    def send_metrics(self):
+        """/metrics: kayıt defterini metin formatında gönder"""
+        body = self.render_metrics()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
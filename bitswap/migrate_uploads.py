@@ -0,0 +1,98 @@
+"""
+Düz uploads/ klasörünü içerik adresli düzene taşıma
+
+Eski sunucular dosyaları uploads/{hash}_{ad} olarak tek klasöre
+yazıyordu. Bu araç files tablosundaki her satırın dosyasını
+uploads/ab/cd/<hash> yoluna taşır (aynı dosya sisteminde rename,
+veri kopyalanmaz) ve file_path'i günceller. Güncellemeler id sırasıyla
+gruplar halinde, grup başına tek transaction'da yazılır.
+
+Araç tekrar çalıştırılabilir: taşınmış satırlar atlanır, yarıda kalan
+bir çalışma kaldığı yerden devam eder. Taşıma sırasında sunucunun
+durdurulması önerilir.
+
+Kullanım (sunucunun çalıştığı klasörde):
+    python -m bitswap.migrate_uploads --db bitswap.db --uploads uploads
+"""
+
+import argparse
+import os
+import re
+import sys
+
+from bitswap.blobs import BlobStore
+from bitswap.db import Database
+
+DEFAULT_BATCH_SIZE = 500
+
+FLAT_NAME = re.compile(r'^[0-9a-f]{64}_')
+SELECT_BATCH = 'SELECT id, file_hash, file_path FROM files WHERE id > ? ORDER BY id LIMIT ?'
+UPDATE_PATH = 'UPDATE files SET file_path = ? WHERE id = ?'
+
+
+def migrate_flat(db, store, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """Kayıtlı dosyaları depoya taşı; sayaçları döndür"""
+    counts = {'moved': 0, 'already': 0, 'duplicate': 0, 'missing': 0}
+    last_id = 0
+    while True:
+        rows = db.query_all(SELECT_BATCH, (last_id, batch_size))
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        updates = []
+        for row in rows:
+            target = store.path(row['file_hash'])
+            source = row['file_path']
+            if source == target:
+                counts['already'] += 1
+                continue
+            if os.path.isfile(target):
+                # Önceki yarım kalmış çalışma veya aynı içeriğin ikinci kopyası
+                counts['duplicate'] += 1
+                if not dry_run and source and os.path.isfile(source):
+                    os.remove(source)
+            elif source and os.path.isfile(source):
+                counts['moved'] += 1
+                if not dry_run:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(source, target)
+            else:
+                counts['missing'] += 1
+                continue
+            updates.append((target, row['id']))
+        if updates and not dry_run:
+            with db.transaction() as conn:
+                conn.executemany(UPDATE_PATH, updates)
+    return counts
+
+
+def leftover_files(directory):
+    """Taşımadan sonra klasörde kalan, kaydı olmayan düz dosyalar"""
+    with os.scandir(directory) as entries:
+        return [entry.name for entry in entries
+                if entry.is_file() and FLAT_NAME.match(entry.name)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Düz uploads/ klasörünü uploads/ab/cd/<hash> düzenine taşı')
+    parser.add_argument('--db', required=True, help='SQLite veritabanı (bitswap.db, database.sqlite)')
+    parser.add_argument('--uploads', default='uploads', help='upload klasörü')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='transaction başına güncellenen satır')
+    parser.add_argument('--dry-run', action='store_true', help='hiçbir şeyi taşımadan say')
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        counts = migrate_flat(db, BlobStore(args.uploads), args.batch_size, args.dry_run)
+    finally:
+        db.close()
+    print(' '.join(f'{name}={count}' for name, count in counts.items()))
+    leftovers = [] if args.dry_run else leftover_files(args.uploads)
+    if leftovers:
+        print(f'{len(leftovers)} kayıtsız dosya {args.uploads}/ içinde kaldı (ör. {leftovers[0]})')
+    return 1 if counts['missing'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
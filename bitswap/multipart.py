@@ -0,0 +1,146 @@
+"""
+Akış tabanlı multipart/form-data ayrıştırıcı
+
+İstek gövdesini bellekte toplamadan parça parça okur. Her form alanı
+için başlıklar ayrıştırılır ve gövde sabit boyutlu chunk'lar halinde
+verilir; bellek kullanımı dosya boyutundan bağımsızdır.
+"""
+
+from email.parser import HeaderParser
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MAX_HEADER_SIZE = 16 * 1024
+
+
+class MultipartError(ValueError):
+    """Bozuk veya eksik multipart gövdesi"""
+
+
+def parse_boundary(content_type):
+    """Content-Type başlığından boundary değerini bytes olarak döndür"""
+    if not content_type or not content_type.lower().startswith('multipart/form-data'):
+        raise MultipartError("Geçersiz content type")
+    msg = HeaderParser().parsestr(f'Content-Type: {content_type}\r\n\r\n')
+    boundary = msg.get_param('boundary')
+    if not boundary:
+        raise MultipartError("Boundary bulunamadı")
+    return boundary.encode('latin-1')
+
+
+class Part:
+    """Tek bir form alanı; gövdesi iter_chunks() ile okunur"""
+
+    def __init__(self, reader, headers):
+        self._reader = reader
+        self.headers = headers
+        self.name = headers.get_param('name', header='content-disposition')
+        self.filename = headers.get_filename()
+        self.content_type = headers.get_content_type() if 'content-type' in headers else None
+        self._body = None
+
+    def iter_chunks(self):
+        """Alan gövdesini chunk'lar halinde ver (bir kez okunabilir)"""
+        if self._body is None:
+            self._body = self._reader._read_body()
+        return self._body
+
+    def read(self, limit=64 * 1024):
+        """Küçük metin alanları için gövdeyi tek parça oku"""
+        data = b''
+        for chunk in self.iter_chunks():
+            data += chunk
+            if len(data) > limit:
+                raise MultipartError("Form alanı çok büyük")
+        return data
+
+    def drain(self):
+        for _ in self.iter_chunks():
+            pass
+
+
+class MultipartReader:
+    """fp'den content_length byte'lık multipart gövdeyi akış halinde ayrıştır"""
+
+    def __init__(self, fp, boundary, content_length, chunk_size=DEFAULT_CHUNK_SIZE):
+        self._fp = fp
+        self._remaining = content_length
+        self._chunk_size = chunk_size
+        self._delimiter = b'\r\n--' + boundary
+        # İlk sınırın önünde CRLF yok; aynı arama kalıbı için ekliyoruz
+        self._buf = b'\r\n'
+        self._finished = False
+
+    def _fill(self):
+        """Tampona bir chunk daha oku; veri kalmadıysa False döndür"""
+        if self._remaining <= 0:
+            return False
+        data = self._fp.read(min(self._chunk_size, self._remaining))
+        if not data:
+            self._remaining = 0
+            return False
+        self._remaining -= len(data)
+        self._buf += data
+        return True
+
+    def _skip_to_delimiter(self):
+        keep = len(self._delimiter) - 1
+        while True:
+            idx = self._buf.find(self._delimiter)
+            if idx >= 0:
+                self._buf = self._buf[idx + len(self._delimiter):]
+                return
+            self._buf = self._buf[-keep:]
+            if not self._fill():
+                raise MultipartError("Multipart sınırı bulunamadı")
+
+    def _read_body(self):
+        delimiter = self._delimiter
+        keep = len(delimiter) - 1
+        while True:
+            idx = self._buf.find(delimiter)
+            if idx >= 0:
+                if idx:
+                    yield self._buf[:idx]
+                self._buf = self._buf[idx + len(delimiter):]
+                return
+            safe = len(self._buf) - keep
+            if safe > 0:
+                yield self._buf[:safe]
+                self._buf = self._buf[safe:]
+            if not self._fill():
+                raise MultipartError("Beklenmeyen gövde sonu")
+
+    def _read_headers(self):
+        while True:
+            # Sınırdan sonra '--' gövdenin bittiğini, CRLF yeni alanı gösterir
+            while len(self._buf) < 2:
+                if not self._fill():
+                    raise MultipartError("Beklenmeyen gövde sonu")
+            if self._buf.startswith(b'--'):
+                self._finished = True
+                return None
+            end = self._buf.find(b'\r\n\r\n')
+            if end >= 0:
+                break
+            if len(self._buf) > MAX_HEADER_SIZE:
+                raise MultipartError("Multipart başlıkları çok büyük")
+            if not self._fill():
+                raise MultipartError("Beklenmeyen gövde sonu")
+        raw = self._buf[:end]
+        self._buf = self._buf[end + 4:]
+        # Sınır satırının geri kalanı (CRLF ve olası boşluklar)
+        raw = raw.split(b'\r\n', 1)[1] if b'\r\n' in raw else b''
+        return HeaderParser().parsestr(raw.decode('utf-8', 'replace') + '\r\n\r\n')
+
+    def __iter__(self):
+        """Alanları sırayla ver; okunmayan alan gövdeleri otomatik atlanır"""
+        self._skip_to_delimiter()
+        part = None
+        while True:
+            if part is not None:
+                part.drain()
+            headers = self._read_headers()
+            if headers is None:
+                return
+            part = Part(self, headers)
+            yield part
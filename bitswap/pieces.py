@@ -0,0 +1,90 @@
+"""
+Parça bazlı indirme
+
+/api/piece/<info_hash>/<index>, .bwt düzenindeki tek bir parçayı
+gönderir. Parçanın içeriği hash'i ile sabittir: ETag parça hash'idir ve
+yanıt "immutable" olarak önbelleğe alınabilir. İstemciler parçaları bir
+veya birden çok sunucudan paralel çekip her birini ayrı doğrular.
+
+PieceIndex info_hash -> parça düzeni eşlemesini bellekte (LRU) tutar;
+sıcak bir dosyanın her parça isteği için veritabanına veya manifest
+dosyasına gidilmez. Hash'ler 32 byte'lık ikili dizi olarak saklanır.
+"""
+
+import threading
+from collections import OrderedDict
+
+from bitswap.blobs import is_valid_hash
+from bitswap.db import FIND_BY_INFO_HASH
+from bitswap.manifest import load_manifest
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Önbellekteki toplam parça sayısı sınırı (~32 MiB hash)
+DEFAULT_CACHE_PIECES = 1 << 20
+
+
+class PieceLayout:
+    """Bir dosyanın parça düzeni: yol, boyut, piece_length ve hash'ler"""
+
+    def __init__(self, file_hash, path, size, piece_length, pieces):
+        self.file_hash = file_hash
+        self.path = path
+        self.size = size
+        self.piece_length = piece_length
+        self._hashes = b''.join(bytes.fromhex(piece) for piece in pieces)
+        self.count = len(pieces)
+
+    def piece(self, index):
+        """(offset, length, hex hash); aralık dışıysa IndexError"""
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        offset = index * self.piece_length
+        length = min(self.piece_length, self.size - offset)
+        return offset, length, self._hashes[index * 32:(index + 1) * 32].hex()
+
+
+class PieceIndex:
+    """info_hash -> PieceLayout, toplam parça sayısıyla sınırlı LRU"""
+
+    def __init__(self, db, store, max_pieces=DEFAULT_CACHE_PIECES):
+        self.db = db
+        self.store = store
+        self.max_pieces = max_pieces
+        self._layouts = OrderedDict()
+        self._cached_pieces = 0
+        self._lock = threading.Lock()
+
+    def get(self, info_hash):
+        """Parça düzeni; bilinmeyen info_hash için None"""
+        with self._lock:
+            layout = self._layouts.get(info_hash)
+            if layout is not None:
+                self._layouts.move_to_end(info_hash)
+                return layout
+        if not is_valid_hash(info_hash):
+            return None
+        row = self.db.query_one(FIND_BY_INFO_HASH, (info_hash,))
+        if row is None:
+            return None
+        try:
+            manifest = load_manifest(self.store, row['file_hash'])
+        except FileNotFoundError:
+            return None
+        layout = PieceLayout(row['file_hash'], row['file_path'], row['file_size'],
+                             manifest['piece_length'], manifest['pieces'])
+        with self._lock:
+            if info_hash not in self._layouts:
+                self._layouts[info_hash] = layout
+                self._cached_pieces += layout.count
+                while self._cached_pieces > self.max_pieces and len(self._layouts) > 1:
+                    _, evicted = self._layouts.popitem(last=False)
+                    self._cached_pieces -= evicted.count
+        return layout
+
+
+def parse_piece_path(path):
+    """/api/piece/<info_hash>/<index> -> (info_hash, index); biçim hatalıysa None"""
+    parts = path.split('/')
+    if len(parts) != 5 or not (parts[4].isascii() and parts[4].isdigit()):
+        return None
+    return parts[3], int(parts[4])
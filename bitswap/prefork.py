@@ -0,0 +1,475 @@
+"""
+Çok süreçli (pre-fork) çalışma
+
+Thread havuzuna rağmen upload'larda SHA-256 ve multipart ayrıştırma
+GIL'e bağlıdır; tek süreç tek çekirdek kullanır. --processes N ile
+run_server N süreç fork eder ve hepsi aynı portu dinler:
+
+- varsayılan: dinleme soketi supervisor'da bir kez açılır, süreçler fork
+  ile devralır ve aynı accept kuyruğundan bağlantı alır. Bir süreç
+  ölürse kuyrukta bekleyen bağlantılar diğerlerine kalır.
+- --reuse-port: her süreç SO_REUSEPORT ile kendi soketini açar, kernel
+  bağlantıları süreçlere dağıtır (accept yarışı yok, yük daha dengeli).
+  Ölen sürecin kuyruğundaki bağlantılar sıfırlanır.
+
+Fork'tan önce supervisor'da thread ve açık SQLite bağlantısı olmamalı;
+şema göçü burada bir kez yapılır. Supervisor ölen süreci aynı numarayla
+yeniden başlatır (art arda çöküşlerde bekleme ikiye katlanır) ve
+SIGINT/SIGTERM'de süreçlere SIGTERM gönderip sayaçlarını yazmalarını
+bekler.
+
+Süreçler arası durum:
+
+- SQLite: her süreç kendi bağlantı havuzunu açar; yazmalar WAL, BEGIN
+  IMMEDIATE ve busy_timeout ile süreçler arasında da sıraya girer (bkz.
+  db). İndirme sayaçları artış olarak yazılır (download_count + ?), her
+  süreç kendi birikimini yazar; catalog_stats trigger'larla tutarlı
+  kalır.
+- Katalog sürümü başka süreçlerin yazmalarını poll_interval içinde görür
+  (bkz. changes).
+- Bellekteki durum sahibi olan süreçte kalır: upload oturum id'leri
+  "<süreç>." önekini taşır, tracker ve profil uç noktasının sahibi süreç
+  0'dır. Başka bir sürece düşen istek, başlıkları okunduktan sonra
+  bağlantı soketiyle birlikte (SCM_RIGHTS) sahibine devredilir; gövde
+  oradan okunur, yanıtı sahibi yazar. Sahibine ulaşılamazsa (yeniden
+  başlıyor) istek yerinde işlenir: oturum bulunamaz, istemci baştan
+  başlar.
+- /metrics'i yanıtlayan süreç diğerlerinin metriklerini de toplar; her
+  seri process etiketi taşır.
+
+Süreçler birbirine supervisor'ın geçici klasöründeki Unix soketleri
+(process-<n>.sock) üzerinden ulaşır.
+"""
+
+import io
+import json
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import weakref
+from urllib.parse import parse_qs, urlparse
+
+from bitswap.metrics import HTTP_HANDOFFS, REGISTRY, render_families, route_label
+from bitswap.profiling import PROFILE_PATH
+
+DEFAULT_PROCESSES = 1
+# Tracker ve profil uç noktasının sahibi
+PRIMARY = 0
+PRIMARY_PATHS = frozenset(('/api/announce', '/api/scrape', PROFILE_PATH))
+ID_SEPARATOR = '.'
+CONTROL_TIMEOUT = 5.0
+CONTROL_BUFFER = 64 * 1024
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 30.0
+# Bundan kısa yaşayan süreç çökmüş sayılır: yeniden başlatma beklemesi artar
+MIN_UPTIME = 5.0
+STOP_TIMEOUT = 10.0
+POLL_INTERVAL = 0.2
+
+
+def session_owner(session_id, processes):
+    """Oturum id'sinin önekindeki süreç numarası; önek yoksa None"""
+    prefix, separator, _ = (session_id or '').partition(ID_SEPARATOR)
+    if not separator or not (prefix.isascii() and prefix.isdigit()):
+        return None
+    index = int(prefix)
+    return index if index < processes else None
+
+
+def request_owner(path, processes):
+    """İsteğin durumunu tutan süreç; herhangi bir süreç işleyebiliyorsa None"""
+    parsed = urlparse(path)
+    if parsed.path in PRIMARY_PATHS:
+        return PRIMARY
+    if parsed.path.startswith('/api/uploads/'):
+        return session_owner(parsed.path.split('/')[3], processes)
+    if parsed.path == '/api/upload':
+        return session_owner(parse_qs(parsed.query).get('session', [None])[0], processes)
+    return None
+
+
+def _read_all(sock):
+    chunks = []
+    while True:
+        data = sock.recv(CONTROL_BUFFER)
+        if not data:
+            return b''.join(chunks)
+        chunks.append(data)
+
+
+class ReplayReader(io.RawIOBase):
+    """Önce devreden sürecin okuduğu byte'ları, sonra soketi okur"""
+
+    def __init__(self, replay, raw):
+        self._replay = memoryview(replay)
+        self._raw = raw
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._replay:
+            n = min(len(b), len(self._replay))
+            b[:n] = self._replay[:n]
+            self._replay = self._replay[n:]
+            return n
+        return self._raw.readinto(b)
+
+    def pending(self):
+        """Henüz okunmamış önceden okunmuş byte'lar (bağlantı yeniden devredilirken)"""
+        return bytes(self._replay)
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+class PreforkProcess:
+    """Supervisor'ın fork ettiği tek bir sunucu süreci ve kardeşlerine kanalı"""
+
+    def __init__(self, index, processes, run_dir, listener):
+        self.index = index
+        self.processes = processes
+        self.run_dir = run_dir
+        self.listener = listener
+        self.id_prefix = f'{index}{ID_SEPARATOR}'
+        self.label = f'process="{index}"'
+        self.server = None
+        # Devralınan soket -> devreden sürecin önceden okuduğu byte'lar
+        self._replay = weakref.WeakKeyDictionary()
+        self._replay_lock = threading.Lock()
+        self._control = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def primary(self):
+        return self.index == PRIMARY
+
+    def control_path(self, index):
+        return os.path.join(self.run_dir, f'process-{index}.sock')
+
+    def start(self, server):
+        """Kanalı aç; devralınan bağlantılar server'ın kuyruğuna girer"""
+        self.server = server
+        path = self.control_path(self.index)
+        try:
+            # Aynı numaralı önceki (ölmüş) süreçten kalan soket
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        self._control = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._control.bind(path)
+        self._control.listen(socket.SOMAXCONN)
+        self._control.settimeout(1.0)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='bitswap-prefork', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._control is not None:
+            self._control.close()
+            self._control = None
+
+    def _request(self, index, message, fds=()):
+        """index sürecine mesaj gönder, yanıtı (bağlantı kapanana kadar) döndür"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as channel:
+            channel.settimeout(CONTROL_TIMEOUT)
+            channel.connect(self.control_path(index))
+            if fds:
+                # Tanımlayıcılar ilk byte'la birlikte gider
+                socket.send_fds(channel, [message[:1]], fds)
+                message = message[1:]
+            channel.sendall(message)
+            channel.shutdown(socket.SHUT_WR)
+            return _read_all(channel)
+
+    def handoff(self, handler, owner):
+        """Bağlantıyı owner sürecine devret; olmazsa False (istek burada işlenir)
+
+        Başlıklar okunmuş, gövde okunmamıştır: istek satırı, başlıklar ve
+        rfile tamponunda bekleyen byte'lar soketle birlikte gönderilir.
+        """
+        connection = handler.connection
+        timeout = connection.gettimeout()
+        try:
+            # Soketi bekletmeden: tampon boşsa b''
+            connection.settimeout(0)
+            buffered = handler.rfile.peek()
+        finally:
+            connection.settimeout(timeout)
+        if isinstance(handler.rfile.raw, ReplayReader):
+            buffered += handler.rfile.raw.pending()
+        head = b''.join(f'{name}: {value}\r\n'.encode('latin-1')
+                        for name, value in handler.headers.raw_items())
+        message = b'handoff\n' + handler.raw_requestline + head + b'\r\n' + buffered
+        try:
+            return self._request(owner, message, [connection.fileno()]) == b'1'
+        except OSError:
+            return False
+
+    def take_replay(self, sock):
+        with self._replay_lock:
+            return self._replay.pop(sock, None)
+
+    def render_metrics(self):
+        """Tüm süreçlerin metrikleri; ulaşılamayan (yeniden başlayan) süreç atlanır"""
+        families = REGISTRY.collect(self.label)
+        for index in range(self.processes):
+            if index == self.index:
+                continue
+            try:
+                families.extend(json.loads(self._request(index, b'metrics\n')))
+            except (OSError, ValueError):
+                continue
+        return render_families(families)
+
+    def _adopt(self, channel, fd, replay):
+        sock = socket.socket(fileno=fd)
+        try:
+            # Dosya durumu devredenle paylaşılır; onun zaman aşımı soketi bloklamaz yapmış olabilir
+            sock.setblocking(True)
+            client_address = sock.getpeername()
+            channel.sendall(b'1')
+        except OSError:
+            sock.close()
+            return
+        if replay:
+            with self._replay_lock:
+                self._replay[sock] = replay
+        self.server.process_request(sock, client_address)
+
+    def _serve(self, channel):
+        channel.settimeout(CONTROL_TIMEOUT)
+        data, fds, _, _ = socket.recv_fds(channel, CONTROL_BUFFER, 1)
+        try:
+            op, _, payload = (data + _read_all(channel)).partition(b'\n')
+            if op == b'handoff' and len(fds) == 1:
+                self._adopt(channel, fds.pop(), payload)
+            elif op == b'metrics':
+                channel.sendall(json.dumps(REGISTRY.collect(self.label)).encode('utf-8'))
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                channel, _ = self._control.accept()
+            except TimeoutError:
+                continue
+            except OSError:
+                return
+            with channel:
+                try:
+                    self._serve(channel)
+                except OSError:
+                    pass
+
+
+class PreforkHandler:
+    """BaseHTTPRequestHandler karışımı: isteği durumunu tutan sürece devreder
+
+    Karışımların en dışında olmalıdır: devredilen istek burada sayılmaz
+    (ölçümü iptal edilir, bitswap_http_handoffs_total artar), sahibi olan
+    süreç baştan sona ölçer.
+    """
+
+    prefork = None
+
+    def setup(self):
+        super().setup()
+        replay = self.prefork.take_replay(self.request) if self.prefork is not None else None
+        if replay:
+            # Tampon henüz boş: ham soket akışı devralınır (detach kapatmaz)
+            self.rfile = io.BufferedReader(ReplayReader(replay, self.rfile.detach()))
+
+    def parse_request(self):
+        ok = super().parse_request()
+        process = self.prefork
+        if not ok or process is None:
+            return ok
+        owner = request_owner(self.path, process.processes)
+        if owner is None or owner == process.index or not process.handoff(self, owner):
+            return ok
+        HTTP_HANDOFFS.labels(route_label(self.path)).inc()
+        timer = getattr(self, 'request_timer', None)
+        if timer is not None:
+            timer.cancel()
+        # Soket artık sahibinde: burada kapatılır ama shutdown edilmez
+        self.close_connection = True
+        self.server.detach(self.request)
+        self.request.close()
+        return False
+
+    def render_metrics(self):
+        if self.prefork is not None:
+            return self.prefork.render_metrics()
+        return super().render_metrics()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _describe(status):
+    code = os.waitstatus_to_exitcode(status)
+    return f'sinyal {-code}' if code < 0 else f'çıkış kodu {code}'
+
+
+class Supervisor:
+    """Sunucu süreçlerini fork eder, izler ve ölenleri yeniden başlatır
+
+    Dinleme soketi (--reuse-port'ta yalnızca ayrılmış port) oluşturulurken
+    açılır: port doluysa hata fork'tan önce görülür.
+    """
+
+    def __init__(self, processes, server_address, reuse_port=False):
+        if processes < 1:
+            raise ValueError("processes en az 1 olmalı")
+        if reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+            raise ValueError("Bu platformda SO_REUSEPORT yok")
+        self.processes = processes
+        self.reuse_port = reuse_port
+        self.listener = self._listen(server_address)
+        # pid -> (süreç numarası, başlangıç zamanı)
+        self._children = {}
+        self._delays = [RESTART_DELAY] * processes
+
+    def _listen(self, server_address):
+        if not self.reuse_port:
+            return socket.create_server(server_address, backlog=socket.SOMAXCONN)
+        # Portu dinlemeden ayır (port 0 ise süreçler aynı portu alsın); dinleme
+        # durumunda olmayan soket kernel'in dağıtımına katılmaz
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        try:
+            sock.bind(server_address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def run(self, serve):
+        """serve(process) her süreçte çalışır; SIGINT/SIGTERM gelene kadar süreçleri ayakta tut"""
+        run_dir = tempfile.mkdtemp(prefix='bitswap-prefork-')
+        previous_int = signal.getsignal(signal.SIGINT)
+        previous_term = signal.signal(signal.SIGTERM, _interrupt)
+        # süreç numarası -> yeniden başlatma zamanı
+        pending = {}
+        try:
+            for index in range(self.processes):
+                self._spawn(index, run_dir, serve)
+            while True:
+                try:
+                    pid, status = os.waitpid(-1, os.WNOHANG)
+                except ChildProcessError:
+                    pid = 0
+                if pid:
+                    self._reap(pid, status, pending)
+                    continue
+                now = time.monotonic()
+                for index, when in list(pending.items()):
+                    if when <= now:
+                        del pending[index]
+                        self._spawn(index, run_dir, serve)
+                time.sleep(POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            try:
+                self._stop_children()
+            finally:
+                signal.signal(signal.SIGTERM, previous_term)
+                signal.signal(signal.SIGINT, previous_int)
+                self.listener.close()
+                shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _spawn(self, index, run_dir, serve):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid:
+            self._children[pid] = (index, time.monotonic())
+            return
+        # Çocuk süreç: Ctrl+C'yi supervisor karşılar, kapanış SIGTERM ile
+        status = 1
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, _interrupt)
+            listener = self.listener
+            if self.reuse_port:
+                address = listener.getsockname()
+                listener.close()
+                listener = socket.create_server(address, backlog=socket.SOMAXCONN, reuse_port=True)
+            serve(PreforkProcess(index, self.processes, run_dir, listener))
+            status = 0
+        except KeyboardInterrupt:
+            status = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(status)
+
+    def _reap(self, pid, status, pending):
+        child = self._children.pop(pid, None)
+        if child is None:
+            return
+        index, started = child
+        if time.monotonic() - started >= MIN_UPTIME:
+            self._delays[index] = RESTART_DELAY
+        delay = self._delays[index]
+        self._delays[index] = min(delay * 2, MAX_RESTART_DELAY)
+        print(f"⚠️  Süreç {index} (pid {pid}) sonlandı ({_describe(status)}); "
+              f"{delay:g} sn sonra yeniden başlatılıyor", file=sys.stderr)
+        pending[index] = time.monotonic() + delay
+
+    def _stop_children(self):
+        """Süreçlere SIGTERM gönder; STOP_TIMEOUT içinde çıkmayanları öldür"""
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while self._children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self._children.pop(pid, None)
+                continue
+            if time.monotonic() >= deadline:
+                for pid in self._children:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                deadline = float('inf')
+            time.sleep(0.05)
+        self._children.clear()
+
+
+def add_prefork_arguments(parser):
+    """Çok süreçli çalışma seçeneklerini argparse parser'ına ekle"""
+    parser.add_argument('--processes', type=int, default=DEFAULT_PROCESSES,
+                        help='fork edilecek sunucu süreci sayısı (her biri --workers thread ile)')
+    parser.add_argument('--reuse-port', action='store_true',
+                        help='her süreç SO_REUSEPORT ile kendi soketini açar (varsayılan: devralınan soket)')
+    return parser
@@ -0,0 +1,328 @@
+"""
+Çalışan sunucuda isteğe bağlı profil çıkarma
+
+Sunucuyu profiler altında yeniden başlatmadan gerçek trafiğin profilini
+almak için: yönetici token'ı (--admin-token veya BITSWAP_ADMIN_TOKEN)
+ile /api/admin/profile'a POST edilir ve sonraki N istek ya da belirli
+bir süre boyunca gelen istekler profillenir.
+
+    curl -X POST -H 'X-Admin-Token: ...' -d '{"requests": 200}' .../api/admin/profile
+    curl -X POST -H 'X-Admin-Token: ...' -d '{"seconds": 30, "mode": "deterministic"}' ...
+    curl -H 'X-Admin-Token: ...' .../api/admin/profile      # durum, son çıktılar
+    curl -X DELETE -H 'X-Admin-Token: ...' .../api/admin/profile   # erken bitir
+
+İki kip vardır:
+
+- sampling (varsayılan): bir thread her interval_ms'de profillenen
+  isteklerin yığınlarını (sys._current_frames) okur. Duvar saati
+  örneklemesidir: soket/disk beklemeleri de görünür. Çıktı flamegraph
+  araçlarının (flamegraph.pl, speedscope) okuduğu collapsed formattır.
+- deterministic: ek olarak istekler cProfile ile çalıştırılır ve
+  birleştirilmiş pstats dökümü yazılır. cProfile yükü yüksektir ve aynı
+  anda tek istek izlenir; o sırada gelen diğer istekler yalnızca
+  örneklenir.
+
+Çıktılar oturum bitince --profile-dir altına
+profile-<zaman>-<pid>.collapsed ve .prof olarak yazılır. Token
+verilmemişse uç nokta kapalıdır (404); oturum yokken istek yolundaki
+tek maliyet bir özellik okumasıdır.
+"""
+
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler
+
+from bitswap.metrics import content_length, route_label
+
+PROFILE_PATH = '/api/admin/profile'
+ADMIN_HEADER = 'X-Admin-Token'
+DEFAULT_PROFILE_DIR = 'profiles'
+MODES = ('sampling', 'deterministic')
+DEFAULT_REQUESTS = 100
+MAX_REQUESTS = 100000
+# Unutulan oturumlar en geç bu kadar sürer
+MAX_SECONDS = 3600
+DEFAULT_INTERVAL_MS = 10
+MIN_INTERVAL_MS = 1
+MAX_INTERVAL_MS = 1000
+MAX_PROFILE_BODY = 4096
+_HANDLE_ONE_REQUEST = BaseHTTPRequestHandler.handle_one_request.__code__
+
+
+def _positive_number(request, key, maximum):
+    value = request.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or not 0 < value <= maximum:
+        raise ValueError(f"{key} 0 ile {maximum} arasında olmalı")
+    return value
+
+
+def token_matches(admin_token, token):
+    """Sabit zamanlı karşılaştırma; token tanımlı değilse her zaman False"""
+    if not admin_token or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), admin_token.encode('utf-8'))
+
+
+def parse_profile_request(body):
+    """{"mode", "requests", "seconds", "interval_ms"} -> (kip, istek sayısı, süre, aralık)"""
+    try:
+        request = json.loads(body) if body.strip() else {}
+    except ValueError:
+        raise ValueError("Geçersiz JSON")
+    if not isinstance(request, dict):
+        raise ValueError("Geçersiz JSON")
+    mode = request.get('mode', 'sampling')
+    if mode not in MODES:
+        raise ValueError("mode sampling veya deterministic olmalı")
+    requests = _positive_number(request, 'requests', MAX_REQUESTS)
+    if requests is not None and not isinstance(requests, int):
+        raise ValueError("requests tam sayı olmalı")
+    seconds = _positive_number(request, 'seconds', MAX_SECONDS)
+    interval = _positive_number(request, 'interval_ms', MAX_INTERVAL_MS) or DEFAULT_INTERVAL_MS
+    if interval < MIN_INTERVAL_MS:
+        raise ValueError(f"interval_ms en az {MIN_INTERVAL_MS} olmalı")
+    if requests is None and seconds is None:
+        requests = DEFAULT_REQUESTS
+    return mode, requests, seconds, interval / 1000
+
+
+class ProfileSession:
+    """Tek bir profil oturumu: kalan istekler, örnekler ve cProfile sonuçları"""
+
+    def __init__(self, mode, requests, seconds, interval):
+        self.mode = mode
+        self.remaining = requests
+        self.started = time.monotonic()
+        self.deadline = self.started + (seconds or MAX_SECONDS)
+        self.interval = interval
+        self.requests = 0
+        # thread id -> (kök etiketi, yığının kesileceği çerçeve)
+        self.threads = {}
+        self.samples = Counter()
+        self.profiles = []
+        self.profiling = False
+        self.stopped = threading.Event()
+
+    def admits(self, now):
+        return not self.stopped.is_set() and self.remaining != 0 and now < self.deadline
+
+    def status(self, now):
+        return {
+            'mode': self.mode,
+            'remaining_requests': self.remaining,
+            'expires_in': max(0, round(self.deadline - now, 1)),
+            'requests': self.requests,
+            'samples': sum(self.samples.values()),
+        }
+
+
+class RequestProfiler:
+    """Yönetici tarafından açılan profil oturumları"""
+
+    def __init__(self, admin_token=None, directory=DEFAULT_PROFILE_DIR):
+        self.admin_token = admin_token
+        self.directory = directory
+        # İstek yolunda kilitsiz okunan hızlı kontrol
+        self.active = False
+        self.last = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def authorized(self, token):
+        return token_matches(self.admin_token, token)
+
+    def start(self, mode, requests=None, seconds=None, interval=DEFAULT_INTERVAL_MS / 1000):
+        session = ProfileSession(mode, requests, seconds, interval)
+        with self._lock:
+            if self._session is not None:
+                raise ValueError("Zaten açık bir profil oturumu var")
+            self._session = session
+            self.active = True
+        threading.Thread(target=self._run, args=(session,), name='bitswap-profiler', daemon=True).start()
+        return self.status()
+
+    def stop(self):
+        """Oturumu erken bitir; süren istekler tamamlanınca çıktı yazılır"""
+        with self._lock:
+            session = self._session
+        if session is not None:
+            session.stopped.set()
+        return self.status()
+
+    def status(self):
+        with self._lock:
+            session = self._session
+            current = session.status(time.monotonic()) if session is not None else None
+        return {
+            'active': current is not None,
+            'session': current,
+            'last': self.last,
+            'directory': os.path.abspath(self.directory),
+        }
+
+    def begin(self, method, path, stop_frame):
+        """İstek başında: oturum bu isteği alıyorsa bir belirteç döndür"""
+        route = route_label(path)
+        if route == PROFILE_PATH:
+            return None
+        profile = None
+        with self._lock:
+            session = self._session
+            if session is None or not session.admits(time.monotonic()):
+                return None
+            if session.remaining is not None:
+                session.remaining -= 1
+            session.requests += 1
+            ident = threading.get_ident()
+            session.threads[ident] = (f'{method} {route}', stop_frame)
+            if session.mode == 'deterministic' and not session.profiling:
+                session.profiling = True
+                profile = cProfile.Profile()
+        if profile is not None:
+            profile.enable()
+        return session, ident, profile
+
+    def end(self, token):
+        session, ident, profile = token
+        if profile is not None:
+            profile.disable()
+        with self._lock:
+            session.threads.pop(ident, None)
+            if profile is not None:
+                session.profiles.append(profile)
+                session.profiling = False
+
+    def _sample(self, session):
+        with self._lock:
+            threads = list(session.threads.items())
+        if not threads:
+            return
+        frames = sys._current_frames()
+        for ident, (root, stop_frame) in threads:
+            frame = frames.get(ident)
+            stack = []
+            while frame is not None and frame is not stop_frame:
+                code = frame.f_code
+                stack.append(f'{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            stack.append(root)
+            stack.reverse()
+            session.samples[';'.join(stack)] += 1
+        del frames
+
+    def _run(self, session):
+        """Örnekleme döngüsü; oturum bitip süren istekler tamamlanınca çıktıyı yaz"""
+        while True:
+            with self._lock:
+                done = not session.admits(time.monotonic()) and not session.threads
+            if done:
+                break
+            self._sample(session)
+            session.stopped.wait(session.interval)
+        with self._lock:
+            self._session = None
+            self.active = False
+        try:
+            self.last = self._write(session)
+        except OSError as e:
+            self.last = {'error': str(e)}
+
+    def _write(self, session):
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, time.strftime('profile-%Y%m%d-%H%M%S') + f'-{os.getpid()}')
+        result = {
+            'mode': session.mode,
+            'requests': session.requests,
+            'samples': sum(session.samples.values()),
+            'duration': round(time.monotonic() - session.started, 3),
+        }
+        if session.samples:
+            result['collapsed'] = os.path.abspath(base + '.collapsed')
+            with open(result['collapsed'], 'w') as f:
+                for stack, count in session.samples.most_common():
+                    f.write(f'{stack} {count}\n')
+        if session.profiles:
+            result['pstats'] = os.path.abspath(base + '.prof')
+            pstats.Stats(*session.profiles).dump_stats(result['pstats'])
+        return result
+
+
+class ProfiledHandler:
+    """BaseHTTPRequestHandler karışımı: açık profil oturumuna istekleri kaydeder
+
+    Profil, istek satırı ayrıştırıldıktan sonra başlar ve do_* dağıtımı
+    bitince sona erer; yığınlar BaseHTTPRequestHandler.handle_one_request
+    çerçevesinde kesilir (karışımların sırasından bağımsız).
+    """
+
+    profiler = None
+    profile_token = None
+
+    def parse_request(self):
+        ok = super().parse_request()
+        self.profile_token = None
+        profiler = self.profiler
+        if ok and profiler is not None and profiler.active:
+            frame = sys._getframe(1)
+            while frame is not None and frame.f_code is not _HANDLE_ONE_REQUEST:
+                frame = frame.f_back
+            self.profile_token = profiler.begin(self.command, self.path, frame)
+        return ok
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        finally:
+            token, self.profile_token = self.profile_token, None
+            if token is not None:
+                self.profiler.end(token)
+
+    def handle_profile(self):
+        """/api/admin/profile: GET durum, POST oturum aç, DELETE erken bitir"""
+        profiler = self.profiler
+        if profiler is None or not profiler.admin_token:
+            self.send_error(404)
+            return
+        if not profiler.authorized(self.headers.get(ADMIN_HEADER)):
+            self.send_error(403)
+            return
+        try:
+            if self.command == 'POST':
+                length = content_length(self.headers.get('Content-Length'))
+                if length > MAX_PROFILE_BODY:
+                    raise ValueError("İstek çok büyük")
+                response = profiler.start(*parse_profile_request(self.rfile.read(length)))
+            elif self.command == 'DELETE':
+                response = profiler.stop()
+            else:
+                response = profiler.status()
+            response = {'success': True, **response}
+        except ValueError as e:
+            response = {'success': False, 'message': str(e)}
+
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200 if response['success'] else 400)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def add_profile_arguments(parser):
+    """Profil uç noktası ayarlarını argparse parser'ına ekle"""
+    parser.add_argument('--admin-token', default=os.environ.get('BITSWAP_ADMIN_TOKEN'),
+                        help='/api/admin/profile ve /api/admin/bandwidth için X-Admin-Token '
+                             '(yoksa uç noktalar kapalı)')
+    parser.add_argument('--profile-dir', default=DEFAULT_PROFILE_DIR,
+                        help='profil çıktılarının (.collapsed, .prof) yazılacağı klasör')
+    return parser
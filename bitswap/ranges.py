@@ -0,0 +1,132 @@
+"""
+HTTP Range istekleri (RFC 7233)
+
+Range ve If-Range başlıklarını değerlendirir, 206 yanıtları için
+Content-Range ve multipart/byteranges gövde düzenini üretir. ETag
+dosyanın SHA-256 hash'inden türetilir; içerik hash'e bağlı olduğu
+için güçlü (strong) ETag'dir.
+"""
+
+import uuid
+
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    """İstenen aralıkların hiçbiri dosya içinde değil (416)"""
+
+
+def make_etag(file_hash):
+    return f'"{file_hash}"'
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match başlığı etag'i içeriyor mu (zayıf karşılaştırma)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def parse_range_header(value, size):
+    """'bytes=...' değerini [(start, stop), ...] yarı açık aralıklarına çevir
+
+    Söz dizimi hatalı veya desteklenmeyen başlıklar için None döner
+    (başlık yok sayılır ve tam dosya gönderilir). Aralıkların hiçbiri
+    karşılanamıyorsa RangeNotSatisfiable fırlatır.
+    """
+    unit, _, spec = value.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    ranges = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        first, dash, last = item.partition('-')
+        first, last = first.strip(), last.strip()
+        if not dash or (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # bytes=-N: son N byte
+            if not last:
+                return None
+            length = int(last)
+            if length == 0:
+                continue
+            ranges.append((max(size - length, 0), size))
+            continue
+        start = int(first)
+        stop = int(last) + 1 if last else size
+        if last and stop <= start:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(stop, size)))
+    if not ranges:
+        raise RangeNotSatisfiable()
+    return coalesce(ranges)
+
+
+def coalesce(ranges):
+    """Çakışan veya bitişik aralıkları birleştir; çok fazla aralık varsa None"""
+    merged = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def requested_ranges(headers, size, etag):
+    """İstek başlıklarına göre gönderilecek aralıklar; None ise tam dosya"""
+    range_header = headers.get('Range')
+    if not range_header:
+        return None
+    if_range = headers.get('If-Range')
+    # If-Range tarih de olabilir; Last-Modified göndermediğimiz için
+    # sadece güçlü ETag eşleşmesi aralık isteğini geçerli kılar
+    if if_range is not None and if_range.strip() != etag:
+        return None
+    return parse_range_header(range_header, size)
+
+
+def content_range(start, stop, size):
+    return f'bytes {start}-{stop - 1}/{size}'
+
+
+def counts_as_download(ranges):
+    """Tam indirme veya dosyanın başını içeren ilk parça bir indirme sayılır
+
+    Kaldığı yerden devam eden istekler ve çok bağlantılı indiricilerin
+    diğer parçaları sayacı artırmaz.
+    """
+    return not ranges or ranges[0][0] == 0
+
+
+class ByteRanges:
+    """Birden fazla aralık için multipart/byteranges gövde düzeni"""
+
+    def __init__(self, ranges, size, content_type):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/byteranges; boundary={self.boundary}'
+        self.parts = []
+        for start, stop in ranges:
+            head = (
+                f'\r\n--{self.boundary}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Range: {content_range(start, stop, size)}\r\n'
+                f'\r\n'
+            ).encode('latin-1')
+            self.parts.append((head, start, stop))
+        self.trailer = f'\r\n--{self.boundary}--\r\n'.encode('latin-1')
+        self.content_length = (
+            sum(len(head) + stop - start for head, start, stop in self.parts)
+            + len(self.trailer)
+        )
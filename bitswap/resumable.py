@@ -0,0 +1,467 @@
+"""
+Devam ettirilebilir (parçalı) upload'lar
+
+Tek bir multipart POST yarıda koparsa her şey baştan gönderilir. Bu
+modülde istemci bir oturum açar, dosyayı sabit boyutlu parçalar
+(chunk) halinde herhangi bir sırada ve paralel PUT eder, hangi
+aralıkların alındığını sorabilir ve sonunda oturumu tamamlar:
+
+    POST   /api/uploads                      {"size", "name", "hash"?, "chunk_size"?}
+    PUT    /api/uploads/<id>?offset=<n>      parça gövdesi
+    GET    /api/uploads/<id>                 alınan aralıklar
+    POST   /api/uploads/<id>/finalize        dosyayı kaydet
+    DELETE /api/uploads/<id>                 oturumu iptal et
+
+Parçalar önceden boyutlandırılmış tek bir geçici dosyaya kendi
+offset'lerine yazılır (uploads/.sessions/<id>.part). SHA-256 sıralı
+bir hash olduğu için oturum "hash sınırını" tutar: sınırdaki parça
+gelince bellekteki verisiyle hash'lenir, ardından önceden (sıra dışı)
+gelmiş bitişik parçalar diskten okunup sınır ilerletilir. Böylece
+tamamlama anında dosyanın tamamı yeniden okunmaz; sadece sıra dışı
+gelen parçalar bir kez (çoğunlukla sayfa önbelleğinden) okunur.
+
+.bwt manifest'inin parça hash'leri sıraya bağlı değildir: chunk_size
+manifest.PIECE_LENGTH'in katı olduğundan her parça kendi manifest
+parçalarını bellekteki verisinden hash'ler. Tamamlamada manifest bu
+hash'lerden kurulur; dosya bunun için de okunmaz.
+
+Aynı parçanın tekrar gönderilmesi (bağlantı koptu, istemci emin değil)
+zararsızdır: alınmış parça yok sayılır. Oturumlar son etkinlikten
+ttl saniye sonra düşer; arka plan thread'i dosyalarını siler. Oturum
+durumu bellekte tutulur: sunucu yeniden başlarsa açık oturumlar ve
+.sessions/ altındaki dosyaları temizlenir. Çok süreçli çalışmada oturum
+id'leri sahip sürecin önekini taşır; istekler o sürece devredilir ve
+yeniden başlayan süreç yalnızca kendi önekli dosyalarını siler (bkz.
+prefork).
+"""
+
+import hashlib
+import json
+import mimetypes
+import os
+import secrets
+import threading
+import time
+
+from bitswap.blobs import add_file, is_valid_hash
+from bitswap.fileio import O_BINARY, PositionalFile
+from bitswap.manifest import PIECE_LENGTH, ensure_manifest
+from bitswap.metrics import UPLOAD_HASH_SECONDS, UPLOAD_WRITE_SECONDS
+from bitswap.sessions import DEFAULT_SESSION_TTL, MAX_NAME_LENGTH, MAX_NEGOTIATION_BODY
+from bitswap.units import parse_size
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+# Parçalar manifest parçalarına bölünebilmeli: chunk_size PIECE_LENGTH'in katıdır
+MIN_CHUNK_SIZE = PIECE_LENGTH
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_UPLOADS = 1000
+# Oturum başına dosya boyutu sınırı (sunucularda --max-upload-size)
+DEFAULT_MAX_UPLOAD_SIZE = 16 * 1024 ** 3
+SWEEP_INTERVAL = 60.0
+SESSION_DIR = '.sessions'
+# Diskten hash'lenen parçalar bu boyutta okunur
+READ_SIZE = 1024 * 1024
+MAX_CREATE_BODY = MAX_NEGOTIATION_BODY
+
+
+class UploadTooLarge(ValueError):
+    """Bildirilen boyut max_size'ı aşıyor (HTTP 413)"""
+
+
+class ChunkedUpload:
+    """Tek bir parçalı upload: geçici dosya, alınan parçalar ve artımlı SHA-256
+
+    blobs.add_file'ın beklediği arayüzü (size, hexdigest, commit,
+    rollback, discard) sağlar; SpooledUpload yerine geçer. chunk_size
+    PIECE_LENGTH'in katı olmalıdır (bkz. parse_create).
+    """
+
+    def __init__(self, session_id, directory, size, chunk_size, name, expected_hash, ttl):
+        self.id = session_id
+        self.size = size
+        self.chunk_size = chunk_size
+        self.name = name
+        self.expected_hash = expected_hash
+        self.ttl = ttl
+        self.count = (size + chunk_size - 1) // chunk_size
+        self.temp_path = os.path.join(directory, session_id + '.part')
+        self._fd = os.open(self.temp_path, os.O_RDWR | os.O_CREAT | os.O_EXCL | O_BINARY, 0o644)
+        # pread/pwrite; olmayan platformlarda thread başına dosya nesnesi (bkz. fileio)
+        self._file = PositionalFile(self.temp_path, self._fd, writable=True)
+        try:
+            # Seyrek dosya: yer, parçalar yazıldıkça ayrılır
+            os.ftruncate(self._fd, size)
+        except OSError:
+            self.discard()
+            raise
+        self._received = bytearray(self.count)
+        self._received_count = 0
+        # Yazılan/hash'lenen parçalar; discard bunlar bitene kadar dosyayı kapatmaz
+        self._writing = set()
+        self._lock = threading.Condition()
+        self._closing = False
+        # Hash sınırı: [0, _hashed) aralığındaki parçalar hash'lendi
+        self._hash = hashlib.sha256()
+        self._hashed = 0
+        self._hash_lock = threading.Lock()
+        # Manifest parça hash'leri (hex); her parça kendi aralığını doldurur
+        self._pieces = [None] * ((size + PIECE_LENGTH - 1) // PIECE_LENGTH)
+        self.expires = time.monotonic() + ttl
+        self.finalizing = False
+        self.committed = False
+        # Upload başına toplam süreler; kapanışta metriklere işlenir
+        self.write_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    def span(self, index):
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.size - offset)
+
+    @property
+    def complete(self):
+        return self._received_count == self.count
+
+    def write_chunk(self, offset, data):
+        """Parçayı yaz; zaten alınmışsa yok say. Hatalı parçada ValueError"""
+        if offset % self.chunk_size or not 0 <= offset < self.size:
+            raise ValueError("Offset parça sınırında değil")
+        index = offset // self.chunk_size
+        if len(data) != self.span(index)[1]:
+            raise ValueError("Parça boyutu hatalı")
+        with self._lock:
+            if self.finalizing or self._closing:
+                raise ValueError("Upload tamamlanıyor veya kapatıldı")
+            self.expires = time.monotonic() + self.ttl
+            if self._received[index]:
+                return False
+            if index in self._writing:
+                raise ValueError("Bu parça şu anda yazılıyor")
+            self._writing.add(index)
+        try:
+            started = time.perf_counter()
+            self._file.pwrite(data, offset)
+            written = time.perf_counter()
+            self._hash_pieces(offset, data)
+            with self._lock:
+                self.write_seconds += written - started
+                self.hash_seconds += time.perf_counter() - written
+                self._received[index] = 1
+                self._received_count += 1
+            self._advance_hash(index, data)
+        finally:
+            with self._lock:
+                self._writing.discard(index)
+                self._lock.notify_all()
+        return True
+
+    def _hash_pieces(self, offset, data):
+        view = memoryview(data)
+        first = offset // PIECE_LENGTH
+        for start in range(0, len(view), PIECE_LENGTH):
+            self._pieces[first + start // PIECE_LENGTH] = \
+                hashlib.sha256(view[start:start + PIECE_LENGTH]).hexdigest()
+
+    def _advance_hash(self, index=None, data=None):
+        with self._hash_lock:
+            started = time.perf_counter()
+            while self._hashed < self.count and self._received[self._hashed]:
+                if self._hashed == index:
+                    self._hash.update(data)
+                else:
+                    # Sıra dışı gelmiş parça: diskten (çoğunlukla sayfa önbelleğinden)
+                    offset, length = self.span(self._hashed)
+                    end = offset + length
+                    while offset < end:
+                        block = self._file.pread(min(READ_SIZE, end - offset), offset)
+                        self._hash.update(block)
+                        offset += len(block)
+                self._hashed += 1
+            elapsed = time.perf_counter() - started
+        with self._lock:
+            self.hash_seconds += elapsed
+
+    def received_ranges(self):
+        """Alınan byte aralıkları: [[başlangıç, bitiş), ...]"""
+        ranges = []
+        with self._lock:
+            received = bytes(self._received)
+        index = 0
+        while index < self.count:
+            if not received[index]:
+                index += 1
+                continue
+            first = index
+            while index < self.count and received[index]:
+                index += 1
+            ranges.append([first * self.chunk_size, min(index * self.chunk_size, self.size)])
+        return ranges
+
+    def status(self):
+        ranges = self.received_ranges()
+        return {
+            'session': self.id,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'chunks': self.count,
+            'received': ranges,
+            'received_bytes': sum(end - start for start, end in ranges),
+            'complete': self.complete,
+            'expires_in': max(0, int(self.expires - time.monotonic())),
+        }
+
+    def start_finalize(self):
+        """Tamamlamayı başlat: tüm parçalar gelmiş olmalı, ikinci çağrı reddedilir"""
+        with self._lock:
+            if self.finalizing or self._closing:
+                raise ValueError("Upload zaten tamamlanıyor veya iptal edildi")
+            if not self.complete:
+                raise ValueError("Eksik parçalar var")
+            # Son parçaların hash'lenmesi bitsin
+            while self._writing:
+                self._lock.wait()
+            self.finalizing = True
+
+    def abort(self):
+        """İptal için işaretle; tamamlanmakta olan upload iptal edilemez"""
+        with self._lock:
+            if self.finalizing:
+                raise ValueError("Upload tamamlanıyor")
+            self._closing = True
+
+    def cancel_finalize(self):
+        with self._lock:
+            self.finalizing = False
+
+    def hexdigest(self):
+        self._advance_hash()
+        if self._hashed != self.count:
+            raise ValueError("Upload tamamlanmadı")
+        return self._hash.hexdigest()
+
+    def pieces(self):
+        """Manifest parça hash'leri; tamamlanmamış upload'da ValueError"""
+        if not self.complete:
+            raise ValueError("Upload tamamlanmadı")
+        return list(self._pieces)
+
+    def close(self):
+        if self._fd is not None:
+            self._file.close()
+            os.close(self._fd)
+            self._fd = None
+            UPLOAD_WRITE_SECONDS.labels('chunked').observe(self.write_seconds)
+            UPLOAD_HASH_SECONDS.labels('chunked').observe(self.hash_seconds)
+
+    def commit(self, path):
+        """Geçici dosyayı atomik olarak path'e taşı"""
+        self.close()
+        os.replace(self.temp_path, path)
+        self.committed = True
+
+    def rollback(self, path):
+        """commit'i geri al: dosyayı path'ten geçici yoluna geri taşı"""
+        os.replace(path, self.temp_path)
+        self.committed = False
+
+    def discard(self):
+        with self._lock:
+            self._closing = True
+            while self._writing:
+                self._lock.wait()
+        self.close()
+        if not self.committed:
+            try:
+                os.unlink(self.temp_path)
+            except FileNotFoundError:
+                pass
+
+
+class ResumableUploads:
+    """Açık parçalı upload oturumları; süresi dolanlar arka planda silinir"""
+
+    def __init__(self, store, ttl=DEFAULT_SESSION_TTL, max_uploads=DEFAULT_MAX_UPLOADS, max_size=None):
+        self.store = store
+        self.ttl = ttl
+        self.max_uploads = max_uploads
+        # Toplam dosya boyutu sınırı (ör. simple-server'ın MAX_CONTENT_LENGTH'i)
+        self.max_size = max_size
+        self.directory = os.path.join(store.root, SESSION_DIR)
+        # Oturum id öneki; çok süreçli çalışmada sahip süreç (bkz. prefork)
+        self.id_prefix = ''
+        self._uploads = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def create(self, size, name, expected_hash=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        if self.max_size is not None and size > self.max_size:
+            raise UploadTooLarge("Dosya çok büyük")
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            if len(self._uploads) >= self.max_uploads:
+                raise ValueError("Çok fazla açık upload oturumu")
+            upload = ChunkedUpload(self.id_prefix + secrets.token_urlsafe(16), self.directory, size,
+                                   chunk_size, name, expected_hash, self.ttl)
+            self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, session_id):
+        """Açık oturum; bilinmiyor veya süresi dolmuşsa None"""
+        with self._lock:
+            upload = self._uploads.get(session_id)
+        if upload is None or upload.expires < time.monotonic():
+            return None
+        return upload
+
+    def remove(self, session_id):
+        """Oturumu kapat; commit edilmemişse dosyasını sil"""
+        with self._lock:
+            upload = self._uploads.pop(session_id, None)
+        if upload is not None:
+            upload.discard()
+        return upload is not None
+
+    def cancel(self, session_id):
+        """DELETE: oturumu iptal et ve dosyasını sil; bilinmeyen oturumda False"""
+        upload = self.get(session_id)
+        if upload is None:
+            return False
+        upload.abort()
+        return self.remove(session_id)
+
+    def expire(self, now=None):
+        now = now or time.monotonic()
+        with self._lock:
+            expired = [upload for upload in self._uploads.values()
+                       if upload.expires < now and not upload.finalizing]
+            for upload in expired:
+                del self._uploads[upload.id]
+        for upload in expired:
+            upload.discard()
+        return len(expired)
+
+    def _clear_directory(self):
+        # Önceki çalışmadan kalan oturum dosyaları: durumları bellekteydi, devam edilemez
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if (entry.is_file() and entry.name.endswith('.part')
+                            and entry.name.startswith(self.id_prefix)):
+                        os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+    def _run(self):
+        while not self._stop.wait(SWEEP_INTERVAL):
+            self.expire()
+
+    def start(self):
+        if self._thread is None:
+            self._clear_directory()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='bitswap-upload-sweep', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            uploads, self._uploads = list(self._uploads.values()), {}
+        for upload in uploads:
+            upload.discard()
+
+
+def add_upload_arguments(parser):
+    """Parçalı upload sınırlarını argparse parser'ına ekle"""
+    parser.add_argument('--max-upload-size', type=parse_size, default=DEFAULT_MAX_UPLOAD_SIZE,
+                        help='parçalı upload oturumu başına en büyük dosya (örn. 4GiB; 0 = sınırsız)')
+    return parser
+
+
+def parse_create(body):
+    """{"size", "name", "hash"?, "chunk_size"?} -> (size, name, hash veya None, chunk_size)"""
+    try:
+        request = json.loads(body)
+    except ValueError:
+        raise ValueError("Geçersiz JSON")
+    if not isinstance(request, dict):
+        raise ValueError("Geçersiz JSON")
+
+    def integer(name, default=None):
+        value = request.get(name, default)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f"Geçersiz {name}")
+        return value
+
+    size = integer('size')
+    if size <= 0:
+        raise ValueError("Geçersiz size")
+    name = request.get('name')
+    if not isinstance(name, str) or not name:
+        raise ValueError("Geçersiz name")
+    file_hash = request.get('hash')
+    if file_hash is not None:
+        if not isinstance(file_hash, str) or not is_valid_hash(file_hash.lower()):
+            raise ValueError("Geçersiz hash")
+        file_hash = file_hash.lower()
+    chunk_size = integer('chunk_size', DEFAULT_CHUNK_SIZE)
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE or chunk_size % PIECE_LENGTH:
+        raise ValueError("Geçersiz chunk_size")
+    return size, name[:MAX_NAME_LENGTH], file_hash, chunk_size
+
+
+def create_upload(store, uploads, body):
+    """Oturum aç; hash verilmiş ve içerik depoda varsa oturum açmadan existing=True"""
+    size, name, file_hash, chunk_size = parse_create(body)
+    if file_hash and store.exists(file_hash):
+        return {'existing': True, 'hash': file_hash, 'size': os.path.getsize(store.path(file_hash))}
+    upload = uploads.create(size, name, file_hash, chunk_size)
+    return {'existing': False, **upload.status()}
+
+
+def parse_offset(value):
+    if value is None or not (value.isascii() and value.isdigit()):
+        raise ValueError("Geçersiz offset")
+    return int(value)
+
+
+def parse_upload_path(path):
+    """/api/uploads/<id>[/finalize] -> (id, finalize mı); biçim hatalıysa None"""
+    parts = path.split('/')
+    if len(parts) == 4 and parts[3]:
+        return parts[3], False
+    if len(parts) == 5 and parts[3] and parts[4] == 'finalize':
+        return parts[3], True
+    return None
+
+
+def finalize_upload(db, store, uploads, session_id, uploader_ip):
+    """Tamamlanan oturumu depoya kaydet -> (upload, hash, yeni mi); bilinmeyen oturumda None
+
+    Dosya hash'i ve manifest'in parça hash'leri parçalar gelirken
+    hesaplandı: burada dosya yeniden okunmaz, manifest saklanan
+    hash'lerden kurulur.
+    Bildirilen hash tutmazsa oturum silinir; veritabanı hatası gibi
+    geçici bir hatada oturum açık kalır ve tamamlama tekrar denenebilir.
+    """
+    upload = uploads.get(session_id)
+    if upload is None:
+        return None
+    upload.start_finalize()
+    file_hash = upload.hexdigest()
+    if upload.expected_hash and upload.expected_hash != file_hash:
+        uploads.remove(session_id)
+        raise ValueError("Yüklenen içerik bildirilen hash ile uyuşmuyor")
+    mime_type = mimetypes.guess_type(upload.name)[0] or 'application/octet-stream'
+    try:
+        created = (not store.exists(file_hash)
+                   and add_file(db, store, upload, upload.name, mime_type, uploader_ip))
+        ensure_manifest(db, store, file_hash, store.path(file_hash), upload.name, upload.pieces())
+    except Exception:
+        upload.cancel_finalize()
+        raise
+    uploads.remove(session_id)
+    return upload, file_hash, created
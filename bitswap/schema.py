@@ -0,0 +1,195 @@
+"""
+Sürümlü veritabanı şeması
+
+Şema sunucu başlarken bir kez kurulur/güncellenir; istek başına
+CREATE TABLE çalıştırılmaz. Uygulanan son sürüm SQLite'ın
+PRAGMA user_version alanında tutulur ve eksik migration'lar sırayla,
+tek bir yazma transaction'ı içinde uygulanır.
+
+Üç sunucunun şemaları zamanla ayrışmıştı (mime_type ve peers sadece
+python-server'da vardı); ilk migration mevcut veritabanlarını ortak
+şemaya getirir.
+"""
+
+import mimetypes
+
+
+def _guess_mime(name):
+    return mimetypes.guess_type(name or '')[0] or 'application/octet-stream'
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+
+def _v1_common_tables(conn):
+    """files + peers tabloları; eski şemalara mime_type eklenir"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT UNIQUE NOT NULL,
+            original_name TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            mime_type TEXT,
+            upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+            download_count INTEGER DEFAULT 0,
+            uploader_ip TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS peers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT,
+            peer_ip TEXT,
+            last_seen DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    if 'mime_type' not in _columns(conn, 'files'):
+        conn.execute('ALTER TABLE files ADD COLUMN mime_type TEXT')
+    conn.create_function('guess_mime', 1, _guess_mime, deterministic=True)
+    conn.execute('UPDATE files SET mime_type = guess_mime(original_name) WHERE mime_type IS NULL')
+
+
+def _v2_catalog_indexes(conn):
+    """Listeleme ve peer sorguları için indeksler"""
+    # (upload_time, id): ORDER BY upload_time DESC LIMIT n sıralama yapmadan okunur
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_files_upload_time ON files(upload_time, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_files_download_count ON files(download_count, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_peers_file_hash ON peers(file_hash)')
+
+
+def _v3_catalog_stats(conn):
+    """Toplam dosya/boyut/indirme sayılarını trigger'larla güncel tutan özet tablo"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_files INTEGER NOT NULL,
+            total_size INTEGER NOT NULL,
+            total_downloads INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT OR REPLACE INTO catalog_stats (id, total_files, total_size, total_downloads)
+        SELECT 1, COUNT(*), COALESCE(SUM(file_size), 0), COALESCE(SUM(download_count), 0) FROM files
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_files_stats_insert AFTER INSERT ON files
+        BEGIN
+            UPDATE catalog_stats SET
+                total_files = total_files + 1,
+                total_size = total_size + NEW.file_size,
+                total_downloads = total_downloads + COALESCE(NEW.download_count, 0)
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_files_stats_delete AFTER DELETE ON files
+        BEGIN
+            UPDATE catalog_stats SET
+                total_files = total_files - 1,
+                total_size = total_size - OLD.file_size,
+                total_downloads = total_downloads - COALESCE(OLD.download_count, 0)
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_files_stats_update AFTER UPDATE OF file_size, download_count ON files
+        BEGIN
+            UPDATE catalog_stats SET
+                total_size = total_size + NEW.file_size - OLD.file_size,
+                total_downloads = total_downloads + COALESCE(NEW.download_count, 0) - COALESCE(OLD.download_count, 0)
+            WHERE id = 1;
+        END
+    ''')
+
+
+def _v4_listing_indexes(conn):
+    """Boyuta göre sıralama ve mime filtresi için indeksler (bkz. catalog)"""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_files_size ON files(file_size, id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_files_mime ON files(mime_type, upload_time, id)')
+
+
+def _v5_catalog_version(conn):
+    """catalog_stats.version: files'taki her değişiklikte artan sayaç (bkz. changes)"""
+    if 'version' not in _columns(conn, 'catalog_stats'):
+        conn.execute('ALTER TABLE catalog_stats ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+    for name in ('trg_files_stats_insert', 'trg_files_stats_delete', 'trg_files_stats_update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    conn.execute('''
+        CREATE TRIGGER trg_files_stats_insert AFTER INSERT ON files
+        BEGIN
+            UPDATE catalog_stats SET
+                total_files = total_files + 1,
+                total_size = total_size + NEW.file_size,
+                total_downloads = total_downloads + COALESCE(NEW.download_count, 0),
+                version = version + 1
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER trg_files_stats_delete AFTER DELETE ON files
+        BEGIN
+            UPDATE catalog_stats SET
+                total_files = total_files - 1,
+                total_size = total_size - OLD.file_size,
+                total_downloads = total_downloads - COALESCE(OLD.download_count, 0),
+                version = version + 1
+            WHERE id = 1;
+        END
+    ''')
+    # Listelenen her kolon değişebilir; sadece boyut/sayaç değil tüm UPDATE'ler
+    conn.execute('''
+        CREATE TRIGGER trg_files_stats_update AFTER UPDATE ON files
+        BEGIN
+            UPDATE catalog_stats SET
+                total_size = total_size + NEW.file_size - OLD.file_size,
+                total_downloads = total_downloads + COALESCE(NEW.download_count, 0) - COALESCE(OLD.download_count, 0),
+                version = version + 1
+            WHERE id = 1;
+        END
+    ''')
+
+
+def _v6_info_hash(conn):
+    """.bwt manifest'inin info_hash'i; parçalar info_hash ile sorgulanır (bkz. manifest)"""
+    if 'info_hash' not in _columns(conn, 'files'):
+        conn.execute('ALTER TABLE files ADD COLUMN info_hash TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_files_info_hash ON files(info_hash)')
+
+
+def _v7_tracker_peers(conn):
+    """peers tablosu tracker checkpoint'leri için (bkz. tracker)"""
+    columns = _columns(conn, 'peers')
+    for name, kind in (('info_hash', 'TEXT'), ('peer_port', 'INTEGER'), ('peer_id', 'TEXT'),
+                       ('seeder', 'INTEGER NOT NULL DEFAULT 0')):
+        if name not in columns:
+            conn.execute(f'ALTER TABLE peers ADD COLUMN {name} {kind}')
+    # Checkpoint UPSERT'ünün çakışma hedefi; eski satırların info_hash'i NULL, çakışmaz
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_peers_endpoint ON peers(info_hash, peer_ip, peer_port)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_peers_last_seen ON peers(last_seen)')
+
+
+MIGRATIONS = [
+    _v1_common_tables,
+    _v2_catalog_indexes,
+    _v3_catalog_stats,
+    _v4_listing_indexes,
+    _v5_catalog_version,
+    _v6_info_hash,
+    _v7_tracker_peers,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(db):
+    """Eksik migration'ları uygula; uygulanan son sürümü döndür"""
+    with db.transaction() as conn:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {number}')
+        if version < SCHEMA_VERSION:
+            conn.execute('ANALYZE')
+    return max(version, SCHEMA_VERSION)
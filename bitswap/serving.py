@@ -0,0 +1,147 @@
+"""
+Sınırlı worker havuzlu HTTP sunucu
+
+HTTPServer her bağlantıyı sırayla işler; yavaş bir indirme diğer tüm
+istekleri bekletir. PooledHTTPServer kabul edilen bağlantıları sabit
+boyutlu bir kuyruğa koyar ve sabit sayıda worker thread ile işler.
+Kuyruk doluysa bağlantı beklemeden 503 ile reddedilir.
+
+listener verilirse sunucu kendi soketini açmaz, önceden açılmış dinleme
+soketini kullanır (çok süreçli çalışma, bkz. prefork).
+"""
+
+import queue
+import socket
+import threading
+from http.server import HTTPServer
+
+from bitswap.metrics import HTTP_REJECTED
+
+DEFAULT_WORKERS = 16
+DEFAULT_QUEUE_SIZE = 64
+DEFAULT_REQUEST_TIMEOUT = 60.0
+
+OVERLOAD_RESPONSE = (
+    b'HTTP/1.0 503 Service Unavailable\r\n'
+    b'Content-Type: text/plain; charset=utf-8\r\n'
+    b'Retry-After: 1\r\n'
+    b'Connection: close\r\n'
+    b'Content-Length: 20\r\n'
+    b'\r\n'
+    b'Server overloaded.\r\n'
+)
+
+
+class PooledHTTPServer(HTTPServer):
+    """Bağlantıları sınırlı bir thread havuzunda işleyen HTTPServer"""
+
+    def __init__(self, server_address, handler_class, workers=DEFAULT_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, backlog=None,
+                 request_timeout=DEFAULT_REQUEST_TIMEOUT, bind_and_activate=True, listener=None):
+        if workers < 1:
+            raise ValueError("workers en az 1 olmalı")
+        if queue_size < 1:
+            raise ValueError("queue_size en az 1 olmalı")
+        self.workers = workers
+        self.queue_size = queue_size
+        self.request_timeout = request_timeout
+        # listen() backlog'u: kernel'in accept öncesi tuttuğu bağlantılar
+        self.request_queue_size = backlog or max(workers + queue_size, 5)
+        self.rejected = 0
+        self._pending = queue.Queue()
+        # İşlenen + kuyrukta bekleyen bağlantı sayısı
+        self._admitted = 0
+        self._admit_lock = threading.Lock()
+        # İşlemi worker'dan devralınan (örn. uzun yoklama) soketler
+        self._detached = set()
+        self._threads = []
+        super().__init__(server_address, handler_class, bind_and_activate and listener is None)
+        if listener is not None:
+            self.socket.close()
+            self.socket = listener
+            self.server_address = listener.getsockname()
+            host, port = self.server_address[:2]
+            self.server_name = socket.getfqdn(host)
+            self.server_port = port
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f'bitswap-worker-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def process_request(self, request, client_address):
+        """Bağlantıyı kuyruğa koy; yer yoksa 503 ile reddet"""
+        with self._admit_lock:
+            if self._admitted >= self.workers + self.queue_size:
+                overloaded = True
+            else:
+                overloaded = False
+                self._admitted += 1
+        if overloaded:
+            self.reject_request(request)
+        else:
+            self._pending.put((request, client_address))
+
+    def reject_request(self, request):
+        """Aşırı yük: kısa bir 503 yanıtı gönder ve bağlantıyı kapat"""
+        self.rejected += 1
+        HTTP_REJECTED.inc()
+        try:
+            request.settimeout(1.0)
+            request.sendall(OVERLOAD_RESPONSE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def detach(self, request):
+        """Soketi devret: worker dönünce kapatılmaz, sahibi kapatır"""
+        self._detached.add(request)
+
+    def shutdown_request(self, request):
+        try:
+            self._detached.remove(request)
+        except KeyError:
+            super().shutdown_request(request)
+
+    def _worker(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                if self.request_timeout:
+                    request.settimeout(self.request_timeout)
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._admit_lock:
+                    self._admitted -= 1
+
+    def server_close(self):
+        super().server_close()
+        # Kuyrukta bekleyen bağlantıları kapat, worker'ları durdur
+        while True:
+            try:
+                item = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.shutdown_request(item[0])
+        for _ in self._threads:
+            self._pending.put(None)
+        for t in self._threads:
+            t.join(timeout=1.0)
+
+
+def add_server_arguments(parser, port):
+    """run_server seçeneklerini argparse parser'ına ekle"""
+    parser.add_argument('--port', type=int, default=port, help='dinlenecek port')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='eşzamanlı istek işleyen worker thread sayısı')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help='worker bekleyen bağlantı kuyruğu; doluysa 503 döner')
+    parser.add_argument('--request-timeout', type=float, default=DEFAULT_REQUEST_TIMEOUT,
+                        help='bağlantı başına soket zaman aşımı (saniye)')
+    return parser
@@ -0,0 +1,143 @@
+"""
+Hash-first upload pazarlığı ve upload oturumları
+
+İstemci dosyayı göndermeden önce SHA-256'sını (ve isteğe bağlı
+boyutunu) /api/upload/negotiate'e POST eder:
+
+- içerik depoda zaten varsa hiçbir byte gönderilmez, yanıt share_url
+  içerir;
+- yoksa bir oturum açılır ve istemci dosyayı upload_url'e
+  (/api/upload?session=<id>) yükler. Sunucu akış sırasında hesaplanan
+  hash'i oturumdaki hash ile karşılaştırır; uyuşmayan içerik kaydedilmez.
+
+Varlık kontrolü içerik adresli depoda tek bir stat'tır (bkz. blobs),
+veritabanına gidilmez. Oturumlar bellekte oluşturma sırasıyla tutulur;
+süresi dolanlar yeni oturum açılırken temizlenir ve toplam sayı
+max_sessions ile sınırlıdır (en eskisi düşer). Çok süreçli çalışmada
+oturum id'leri sahip sürecin önekini taşır (bkz. prefork).
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from bitswap.blobs import is_valid_hash
+
+DEFAULT_SESSION_TTL = 3600
+DEFAULT_MAX_SESSIONS = 10000
+# Pazarlık gövdesi küçük bir JSON: daha büyüğü okunmaz
+MAX_NEGOTIATION_BODY = 4096
+MAX_NAME_LENGTH = 255
+
+
+class UploadSession:
+    """Pazarlıkla açılan tek bir upload"""
+
+    def __init__(self, session_id, file_hash, size, name, expires):
+        self.id = session_id
+        self.file_hash = file_hash
+        self.size = size
+        self.name = name
+        self.expires = expires
+
+
+class UploadSessions:
+    """Süreli upload oturumları (oturum id -> UploadSession)"""
+
+    def __init__(self, ttl=DEFAULT_SESSION_TTL, max_sessions=DEFAULT_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # Oturum id öneki; çok süreçli çalışmada sahip süreç (bkz. prefork)
+        self.id_prefix = ''
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, file_hash, size=None, name=None):
+        now = time.monotonic()
+        session = UploadSession(self.id_prefix + secrets.token_urlsafe(16), file_hash, size, name,
+                                now + self.ttl)
+        with self._lock:
+            self._expire(now)
+            while len(self._sessions) >= self.max_sessions:
+                self._sessions.popitem(last=False)
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        """Geçerli oturum; bilinmiyor veya süresi dolmuşsa None"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.expires < time.monotonic():
+                return None
+            return session
+
+    def finish(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _expire(self, now):
+        # Oluşturma sırası = bitiş sırası (ttl sabit): baştan itibaren sil
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.expires >= now:
+                break
+            self._sessions.popitem(last=False)
+
+
+def parse_negotiation(body):
+    """{"hash": ..., "size": ..., "name": ...} -> (hash, boyut veya None, ad veya None)"""
+    try:
+        request = json.loads(body)
+    except ValueError:
+        raise ValueError("Geçersiz JSON")
+    if not isinstance(request, dict):
+        raise ValueError("Geçersiz JSON")
+    file_hash = request.get('hash')
+    if not isinstance(file_hash, str) or not is_valid_hash(file_hash.lower()):
+        raise ValueError("Geçersiz hash")
+    size = request.get('size')
+    if size is not None and (not isinstance(size, int) or isinstance(size, bool) or size < 0):
+        raise ValueError("Geçersiz size")
+    name = request.get('name')
+    if name is not None and not isinstance(name, str):
+        raise ValueError("Geçersiz name")
+    return file_hash.lower(), size, name[:MAX_NAME_LENGTH] if name else None
+
+
+def negotiate(store, sessions, body):
+    """Pazarlık sonucu: depoda varsa existing=True, yoksa yeni oturum
+
+    Sunucuya özgü alanlar (share_url, upload_url, message) çağıran
+    tarafından eklenir. Hatalı istekte ValueError fırlatır.
+    """
+    file_hash, size, name = parse_negotiation(body)
+    if store.exists(file_hash):
+        stored_size = os.path.getsize(store.path(file_hash))
+        if size is not None and size != stored_size:
+            raise ValueError("Boyut kayıtlı dosyayla uyuşmuyor")
+        return {'existing': True, 'hash': file_hash, 'size': stored_size}
+    session = sessions.create(file_hash, size, name)
+    return {'existing': False, 'hash': file_hash, 'session': session.id, 'expires_in': sessions.ttl}
+
+
+def check_upload(sessions, session_id):
+    """upload_url'deki oturumu doğrula; oturumsuz yükleme için None"""
+    if not session_id:
+        return None
+    session = sessions.get(session_id)
+    if session is None:
+        raise ValueError("Bilinmeyen veya süresi dolmuş upload oturumu")
+    return session
+
+
+def verify_upload(session, file_hash, size):
+    """Yüklenen içerik pazarlıktaki hash/boyutla uyuşmuyorsa ValueError"""
+    if session is None:
+        return
+    if file_hash != session.file_hash:
+        raise ValueError("Yüklenen içerik bildirilen hash ile uyuşmuyor")
+    if session.size is not None and size != session.size:
+        raise ValueError("Yüklenen içerik bildirilen boyutla uyuşmuyor")
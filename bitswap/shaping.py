@@ -0,0 +1,312 @@
+"""
+İndirme ve upload'larda bant genişliği sınırlama
+
+Tek bir istemci indirme döngüsüyle çıkış hattını doldurabilir. Shaper
+token bucket'larla beş sınır uygular (byte/s, 0 = sınırsız):
+
+- download_rate: tüm indirmelerin toplamı
+- download_ip_rate: bir IP'nin indirmelerinin toplamı
+- file_rate: bir dosyanın (tam dosya, aralık ve parça istekleri) toplamı
+- upload_rate / upload_ip_rate: upload'larda toplam ve IP başına
+
+Kovalar GCRA ile tutulur: her kova tek bir "teorik varış zamanı"dır.
+Aktarım her dilim (quantum) için ilgili tüm kovalardan yer ayırır ve en
+uzun bekleme kadar uyur. Ayırma reddedilmez, sıraya girer: aynı kovayı
+paylaşan aktarımlar dilim dilim sırayla ilerler, hız aralarında eşit
+bölünür. Dilim en düşük sınırın ~50 ms'sidir (16 KiB - 1 MiB); boşta
+kalan kova BURST_SECONDS'lik veriyi beklemeden geçirir.
+
+Hiçbir sınır yokken download()/upload() None döndürür ve gönderim
+yolu değişmez: tam dosya tek bir sendfile çağrısıdır, dilim başına
+kilit veya uyku yoktur. Sınırlar çalışırken /api/admin/bandwidth ile
+(yönetici token'ı, bkz. profiling) değiştirilebilir; yeni değer sınırlı
+aktarımların sonraki dilimine uygulanır.
+
+    curl -H 'X-Admin-Token: ...' .../api/admin/bandwidth
+    curl -X POST -H 'X-Admin-Token: ...' -d '{"download_ip_rate": "2MiB"}' .../api/admin/bandwidth
+
+IP ve dosya kovaları sabit boyutlu tablolarda anahtarın CRC32'siyle
+seçilir; çakışan iki anahtar aynı kovayı paylaşır (sınır aşılmaz, en
+fazla daha sıkı uygulanır). Çok süreçli çalışmada tablo ve sınırlar
+fork'tan önce dosya destekli paylaşılan belleğe alınır (shared=True):
+sınırlar tüm süreçlerin toplamına uygulanır ve değişiklik hepsine
+yansır. Süreçler arasında her kova kendi byte aralığında fcntl.lockf
+ile kilitlenir; kilidi tutan süreç ölürse kernel kilidi bırakır.
+"""
+
+import json
+import mmap
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: fork yok, yalnız tek süreçli tablo
+    fcntl = None
+
+from bitswap.metrics import SHAPING_WAIT_SECONDS, content_length
+from bitswap.profiling import ADMIN_HEADER, token_matches
+from bitswap.units import parse_size
+
+BANDWIDTH_PATH = '/api/admin/bandwidth'
+RATE_NAMES = ('download_rate', 'download_ip_rate', 'file_rate', 'upload_rate', 'upload_ip_rate')
+# IP ve dosya kovası tablolarının boyutu (her biri 8 byte)
+DEFAULT_SLOTS = 1 << 16
+# Boşta kalan kovanın beklemeden geçirdiği veri (saniye cinsinden)
+BURST_SECONDS = 0.25
+QUANTUM_SECONDS = 0.05
+MIN_QUANTUM = 16 * 1024
+MAX_QUANTUM = 1024 * 1024
+MAX_BANDWIDTH_BODY = 4096
+
+# Tablo düzeni: sınırlar, iki genel kova, ardından üç anahtarlı kova tablosu
+_DOWNLOAD_RATE, _DOWNLOAD_IP_RATE, _FILE_RATE, _UPLOAD_RATE, _UPLOAD_IP_RATE = range(len(RATE_NAMES))
+_GLOBAL_DOWNLOAD = len(RATE_NAMES)
+_GLOBAL_UPLOAD = _GLOBAL_DOWNLOAD + 1
+_KEYED = _GLOBAL_UPLOAD + 1
+
+
+def parse_rate(text):
+    """'10MiB', '500KB', '0' veya sayı -> byte/s"""
+    rate = text if isinstance(text, (int, float)) else parse_size(text)
+    if rate < 0:
+        raise ValueError(text)
+    return rate
+
+
+def parse_rates(body):
+    """{"download_rate": ..., ...} -> {ad: byte/s}; değerler sayı veya '10MiB'"""
+    try:
+        request = json.loads(body) if body.strip() else {}
+    except ValueError:
+        raise ValueError("Geçersiz JSON")
+    if not isinstance(request, dict):
+        raise ValueError("Geçersiz JSON")
+    rates = {}
+    for name, value in request.items():
+        if name not in RATE_NAMES:
+            raise ValueError(f"Bilinmeyen sınır: {name}")
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"{name} byte/s olmalı")
+        try:
+            rates[name] = parse_rate(value)
+        except ValueError:
+            raise ValueError(f"{name} byte/s olmalı")
+    return rates
+
+
+class Shaper:
+    """Genel, IP başına ve dosya başına token bucket'lar"""
+
+    def __init__(self, rates=None, admin_token=None, shared=False, slots=DEFAULT_SLOTS):
+        self.admin_token = admin_token
+        self.slots = slots
+        size = (_KEYED + 3 * slots) * 8
+        # Süreç içi thread'ler için; lockf kilitleri aynı sürecin thread'lerini ayırmaz
+        self._lock = threading.Lock()
+        if shared:
+            # Dosya destekli MAP_SHARED: fork'ta paylaşılır, kovalar lockf ile kilitlenir
+            self._file = tempfile.TemporaryFile()
+            self._file.truncate(size)
+            self._buffer = mmap.mmap(self._file.fileno(), size)
+        else:
+            # Anonim mmap: sayfalar ilk yazmada ayrılır
+            self._file = None
+            self._buffer = mmap.mmap(-1, size)
+        self._table = memoryview(self._buffer).cast('d')
+        self.set_rates(rates or {})
+
+    def authorized(self, token):
+        return token_matches(self.admin_token, token)
+
+    def rates(self):
+        return {name: int(self._table[index]) for index, name in enumerate(RATE_NAMES)}
+
+    def set_rates(self, rates):
+        """Verilen sınırları değiştir (diğerleri aynı kalır)"""
+        for name, rate in rates.items():
+            self._table[RATE_NAMES.index(name)] = rate or 0
+        return self.rates()
+
+    def download(self, ip, file_key):
+        """İndirme aktarımı; hiçbir indirme sınırı yoksa None"""
+        return self._transfer('download', (
+            (_DOWNLOAD_RATE, _GLOBAL_DOWNLOAD),
+            (_DOWNLOAD_IP_RATE, self._slot(0, ip)),
+            (_FILE_RATE, self._slot(2, file_key)),
+        ))
+
+    def upload(self, ip):
+        """Upload aktarımı; hiçbir upload sınırı yoksa None"""
+        return self._transfer('upload', (
+            (_UPLOAD_RATE, _GLOBAL_UPLOAD),
+            (_UPLOAD_IP_RATE, self._slot(1, ip)),
+        ))
+
+    def _slot(self, table, key):
+        return _KEYED + table * self.slots + zlib.crc32(str(key).encode('utf-8')) % self.slots
+
+    def _transfer(self, direction, buckets):
+        # Kilitsiz okuma: sınırsız yolda tek maliyet birkaç float karşılaştırması
+        if not any(self._table[rate] > 0 for rate, _ in buckets):
+            return None
+        return Transfer(self, direction, buckets)
+
+    def reserve(self, buckets, count):
+        """Kovalardan en fazla bir dilim ayır -> (byte sayısı, bekleme süresi)"""
+        table = self._table
+        limited = sorted((slot, table[rate]) for rate, slot in buckets if table[rate] > 0)
+        if not limited:
+            return count, 0.0
+        quantum = min(rate for _, rate in limited) * QUANTUM_SECONDS
+        count = min(count, max(MIN_QUANTUM, min(MAX_QUANTUM, int(quantum))))
+        with self._lock:
+            # Kovalar hep artan sırada kilitlenir: süreçler arasında kilitlenme olmaz
+            for slot, _ in limited:
+                self._lock_slot(slot, True)
+            try:
+                now = time.monotonic()
+                wait = 0.0
+                for slot, rate in limited:
+                    arrival = max(table[slot], now) + count / rate
+                    table[slot] = arrival
+                    wait = max(wait, arrival - BURST_SECONDS - now)
+                return count, wait
+            finally:
+                for slot, _ in limited:
+                    self._lock_slot(slot, False)
+
+    def _lock_slot(self, slot, locked):
+        """Paylaşılan tabloda kovanın 8 byte'ını süreçler arası kilitle / bırak"""
+        if self._file is not None:
+            fcntl.lockf(self._file.fileno(), fcntl.LOCK_EX if locked else fcntl.LOCK_UN, 8, slot * 8)
+
+
+class Transfer:
+    """Tek bir sınırlı aktarım: take() her dilimden önce gerekiyorsa bekler"""
+
+    def __init__(self, shaper, direction, buckets):
+        self.shaper = shaper
+        self.buckets = buckets
+        self._waited = SHAPING_WAIT_SECONDS.labels(direction)
+
+    def take(self, count):
+        """count byte'a kadar izin al; izin verilen (dilimle sınırlı) miktarı döndür"""
+        count, wait = self.shaper.reserve(self.buckets, count)
+        if wait > 0:
+            self._waited.inc(wait)
+            time.sleep(wait)
+        return count
+
+
+class ThrottledReader:
+    """Upload gövdesi için read()'i dilimlere bölüp sınırlayan sarmalayıcı"""
+
+    def __init__(self, fp, transfer):
+        self.fp = fp
+        self.transfer = transfer
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            chunks = iter(lambda: self.read(MAX_QUANTUM), b'')
+            return b''.join(chunks)
+        chunks = []
+        while size > 0:
+            data = self.fp.read(self.transfer.take(size))
+            if not data:
+                break
+            chunks.append(data)
+            size -= len(data)
+        return chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+    def __getattr__(self, name):
+        return getattr(self.fp, name)
+
+
+def throttled_reader(fp, transfer):
+    return fp if transfer is None else ThrottledReader(fp, transfer)
+
+
+def iter_throttled(chunks, transfer):
+    """WSGI gövdesini dilimlere bölerek sınırla; iç gövdenin close'u korunur"""
+    try:
+        for chunk in chunks:
+            start = 0
+            while start < len(chunk):
+                count = transfer.take(len(chunk) - start)
+                yield chunk[start:start + count]
+                start += count
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def throttled_body(chunks, transfer):
+    return chunks if transfer is None else iter_throttled(chunks, transfer)
+
+
+class ShapedHandler:
+    """BaseHTTPRequestHandler karışımı: sınırlı aktarımlar ve /api/admin/bandwidth"""
+
+    shaper = None
+
+    def download_transfer(self, file_key):
+        shaper = self.shaper
+        return shaper.download(self.client_address[0], file_key) if shaper is not None else None
+
+    def upload_reader(self):
+        """rfile veya upload sınırı varsa sınırlı sarmalayıcısı"""
+        shaper = self.shaper
+        if shaper is None:
+            return self.rfile
+        return throttled_reader(self.rfile, shaper.upload(self.client_address[0]))
+
+    def handle_bandwidth(self):
+        """/api/admin/bandwidth: GET sınırlar, POST sınırları değiştir"""
+        shaper = self.shaper
+        if shaper is None or not shaper.admin_token:
+            self.send_error(404)
+            return
+        if not shaper.authorized(self.headers.get(ADMIN_HEADER)):
+            self.send_error(403)
+            return
+        try:
+            if self.command == 'POST':
+                length = content_length(self.headers.get('Content-Length'))
+                if length > MAX_BANDWIDTH_BODY:
+                    raise ValueError("İstek çok büyük")
+                rates = shaper.set_rates(parse_rates(self.rfile.read(length)))
+            else:
+                rates = shaper.rates()
+            response = {'success': True, 'rates': rates}
+        except ValueError as e:
+            response = {'success': False, 'message': str(e)}
+
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200 if response['success'] else 400)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def add_shaping_arguments(parser):
+    """Bant genişliği sınırlarını argparse parser'ına ekle (byte/s, 0 = sınırsız)"""
+    for name, help in (
+            ('download_rate', 'tüm indirmelerin toplam hızı'),
+            ('download_ip_rate', 'bir IP\'nin toplam indirme hızı'),
+            ('file_rate', 'bir dosyanın toplam indirme hızı'),
+            ('upload_rate', 'tüm upload\'ların toplam hızı'),
+            ('upload_ip_rate', 'bir IP\'nin toplam upload hızı')):
+        parser.add_argument('--' + name.replace('_', '-'), type=parse_rate, default=0,
+                            help=f'{help}, byte/s (örn. 10MiB; 0 = sınırsız)')
+    return parser
+
+
+def rates_from_args(args):
+    return {name: getattr(args, name) for name in RATE_NAMES}
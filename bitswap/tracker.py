@@ -0,0 +1,329 @@
+"""
+Bellek içi tracker: announce ve scrape
+
+Peer'lar info_hash ile anahtarlanan swarm'larda bellekte tutulur;
+announce başına veritabanına gidilmez. Swarm'lar SHARDS adet parçaya
+(her birinin kendi kilidi) dağıtılır, farklı dosyaların announce'ları
+aynı kilidi beklemez.
+
+Her swarm peer anahtarlarını bir listede ve anahtar -> konum sözlüğünde
+tutar: ekleme/çıkarma O(1) (sondakiyle yer değiştirme), rastgele peer
+alt kümesi numwant boyutunda bir random.sample'dır. Süresi (peer_ttl)
+dolan peer'lar arka plan thread'inde checkpoint_interval saniyede bir
+temizlenir; boşalan swarm silinir.
+
+Değişen peer'lar bir "kirli" sözlükte birikir ve checkpoint_interval
+saniyede bir peers tablosuna tek transaction'da toplu yazılır (bkz.
+counters). Açılışta süresi dolmamış peer'lar tablodan geri yüklenir.
+Çökmede kaybolabilecek en fazla bilgi son checkpoint_interval
+saniyedeki announce'lardır; peer'lar bir sonraki announce'ta geri gelir.
+"""
+
+import calendar
+import random
+import threading
+import time
+
+from bitswap.blobs import is_valid_hash
+
+DEFAULT_INTERVAL = 600
+DEFAULT_PEER_TTL = 1800
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+DEFAULT_NUMWANT = 50
+MAX_NUMWANT = 200
+MAX_SCRAPE = 100
+MAX_PEER_ID = 40
+SHARDS = 64
+EVENTS = ('', 'started', 'completed', 'stopped')
+
+# peers.file_hash, info_hash'ten bulunur; bilinmeyen info_hash için NULL kalır
+UPSERT_PEER = '''
+    INSERT INTO peers (file_hash, info_hash, peer_ip, peer_port, peer_id, seeder, last_seen)
+    VALUES ((SELECT file_hash FROM files WHERE info_hash = ?), ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (info_hash, peer_ip, peer_port) DO UPDATE SET
+        peer_id = excluded.peer_id, seeder = excluded.seeder, last_seen = excluded.last_seen
+'''
+DELETE_PEER = 'DELETE FROM peers WHERE info_hash = ? AND peer_ip = ? AND peer_port = ?'
+EXPIRE_PEERS = 'DELETE FROM peers WHERE info_hash IS NOT NULL AND last_seen < ?'
+LOAD_PEERS = '''
+    SELECT info_hash, peer_ip, peer_port, peer_id, seeder, last_seen FROM peers
+    WHERE info_hash IS NOT NULL AND last_seen >= ?
+'''
+
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _sql_time(seconds):
+    # CURRENT_TIMESTAMP ile aynı biçim (UTC), datetime('now', ...) karşılaştırmaları çalışır
+    return time.strftime(_TIME_FORMAT, time.gmtime(seconds))
+
+
+class Swarm:
+    """Bir info_hash'in peer'ları"""
+
+    __slots__ = ('peers', 'entries', 'seeders', 'downloaded')
+
+    def __init__(self):
+        # (ip, port) -> [konum, yanıt girdisi, seeder, son görülme]
+        self.peers = {}
+        # Yanıttaki {'ip', 'port', 'peer_id'} sözlükleri: announce başına yeniden kurulmaz
+        self.entries = []
+        self.seeders = 0
+        self.downloaded = 0
+
+    def put(self, key, peer_id, seeder, seen):
+        """Peer'ı ekle/güncelle; kayıtlı peer_id'yi döndür (boş gelirse eskisi kalır)"""
+        record = self.peers.get(key)
+        if record is None:
+            entry = {'ip': key[0], 'port': key[1], 'peer_id': peer_id}
+            self.peers[key] = [len(self.entries), entry, seeder, seen]
+            self.entries.append(entry)
+            self.seeders += seeder
+            return peer_id
+        self.seeders += seeder - record[2]
+        if peer_id:
+            record[1]['peer_id'] = peer_id
+        record[2:] = seeder, seen
+        return record[1]['peer_id']
+
+    def remove(self, key):
+        record = self.peers.pop(key, None)
+        if record is None:
+            return
+        self.seeders -= record[2]
+        last = self.entries.pop()
+        if last is not record[1]:
+            self.entries[record[0]] = last
+            self.peers[(last['ip'], last['port'])][0] = record[0]
+
+    def sample(self, count, requester, skip_seeders):
+        """En fazla count rastgele peer, istek sahibi hariç
+
+        Bağımsız bir örneklem (random.sample) alınır: ardışık bir pencere
+        listede komşu peer'ları hep birlikte döndürür ve istemcilere
+        ilişkili peer kümeleri verir. Örneklem boyutu numwant ile
+        sınırlı olduğundan maliyet swarm büyüklüğünden bağımsızdır.
+        """
+        total = len(self.entries)
+        if count <= 0 or total == 0:
+            return []
+        # Seeder'a seeder gönderilmez: filtre sonrası yetmesi için örneklem geniş tutulur
+        size = count * 2 if skip_seeders else count + 1
+        window = random.sample(self.entries, min(size, total))
+        own = requester[1] if requester else None
+        if skip_seeders:
+            peers = self.peers
+            window = [entry for entry in window
+                      if entry is not own and not peers[(entry['ip'], entry['port'])][2]]
+        else:
+            window = [entry for entry in window if entry is not own]
+        return window[:count]
+
+    def expire(self, oldest):
+        for key in [key for key, record in self.peers.items() if record[3] < oldest]:
+            self.remove(key)
+
+
+class Tracker:
+    """Sharded bellek içi swarm indeksi ve peers tablosuna toplu checkpoint"""
+
+    def __init__(self, db, interval=DEFAULT_INTERVAL, peer_ttl=DEFAULT_PEER_TTL,
+                 checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self.peer_ttl = peer_ttl
+        self.checkpoint_interval = checkpoint_interval
+        self._shards = [({}, threading.Lock()) for _ in range(SHARDS)]
+        # (info_hash, ip, port) -> (peer_id, seeder, görülme) veya silme için None
+        self._dirty = {}
+        self._dirty_lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _shard(self, info_hash):
+        return self._shards[hash(info_hash) % SHARDS]
+
+    def announce(self, info_hash, ip, port, peer_id='', left=None, event='', numwant=DEFAULT_NUMWANT):
+        """Peer'ı kaydet/güncelle; announce yanıtını döndür"""
+        now = time.time()
+        key = (ip, port)
+        seeder = left == 0
+        swarms, lock = self._shard(info_hash)
+        with lock:
+            swarm = swarms.get(info_hash)
+            if event == 'stopped':
+                peers = []
+                if swarm is not None:
+                    swarm.remove(key)
+                    if not swarm.peers:
+                        del swarms[info_hash]
+            else:
+                if swarm is None:
+                    swarm = swarms[info_hash] = Swarm()
+                peer_id = swarm.put(key, peer_id, seeder, now)
+                if event == 'completed':
+                    swarm.downloaded += 1
+                peers = swarm.sample(numwant, swarm.peers[key], seeder)
+            complete = swarm.seeders if swarm else 0
+            incomplete = len(swarm.peers) - complete if swarm else 0
+        with self._dirty_lock:
+            self._dirty[(info_hash, ip, port)] = None if event == 'stopped' else (peer_id, seeder, now)
+        return {
+            'interval': self.interval,
+            'min_interval': self.interval // 2,
+            'complete': complete,
+            'incomplete': incomplete,
+            'peers': peers,
+        }
+
+    def scrape(self, info_hashes):
+        """info_hash -> {complete, incomplete, downloaded}"""
+        files = {}
+        for info_hash in info_hashes:
+            swarms, lock = self._shard(info_hash)
+            with lock:
+                swarm = swarms.get(info_hash)
+                if swarm is None:
+                    files[info_hash] = {'complete': 0, 'incomplete': 0, 'downloaded': 0}
+                else:
+                    files[info_hash] = {
+                        'complete': swarm.seeders,
+                        'incomplete': len(swarm.peers) - swarm.seeders,
+                        'downloaded': swarm.downloaded,
+                    }
+        return files
+
+    def peer_count(self):
+        total = 0
+        for swarms, lock in self._shards:
+            with lock:
+                total += sum(len(swarm.peers) for swarm in swarms.values())
+        return total
+
+    def expire(self, now=None):
+        """Süresi dolan peer'ları ve boş swarm'ları bellekten sil"""
+        oldest = (now or time.time()) - self.peer_ttl
+        for swarms, lock in self._shards:
+            with lock:
+                for info_hash in list(swarms):
+                    swarm = swarms[info_hash]
+                    swarm.expire(oldest)
+                    if not swarm.peers:
+                        del swarms[info_hash]
+
+    def checkpoint(self):
+        """Kirli peer'ları ve süresi dolanları tek transaction'da yaz"""
+        with self._checkpoint_lock:
+            with self._dirty_lock:
+                batch, self._dirty = self._dirty, {}
+            upserts = []
+            deletes = []
+            for (info_hash, ip, port), peer in batch.items():
+                if peer is None:
+                    deletes.append((info_hash, ip, port))
+                else:
+                    upserts.append((info_hash, info_hash, ip, port, peer[0], int(peer[1]), _sql_time(peer[2])))
+            try:
+                with self.db.transaction() as conn:
+                    if upserts:
+                        conn.executemany(UPSERT_PEER, upserts)
+                    if deletes:
+                        conn.executemany(DELETE_PEER, deletes)
+                    conn.execute(EXPIRE_PEERS, (_sql_time(time.time() - self.peer_ttl),))
+            except Exception:
+                # Yeniden denenir; bu arada gelen daha yeni announce'lar korunur
+                with self._dirty_lock:
+                    for key, peer in batch.items():
+                        self._dirty.setdefault(key, peer)
+                raise
+        return len(batch)
+
+    def load(self):
+        """Süresi dolmamış peer'ları tablodan belleğe al"""
+        rows = self.db.query_all(LOAD_PEERS, (_sql_time(time.time() - self.peer_ttl),))
+        for row in rows:
+            seen = calendar.timegm(time.strptime(row['last_seen'], _TIME_FORMAT))
+            swarms, lock = self._shard(row['info_hash'])
+            with lock:
+                swarm = swarms.get(row['info_hash'])
+                if swarm is None:
+                    swarm = swarms[row['info_hash']] = Swarm()
+                swarm.put((row['peer_ip'], row['peer_port']), row['peer_id'] or '', bool(row['seeder']), seen)
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.checkpoint_interval):
+            self.expire()
+            try:
+                self.checkpoint()
+            except Exception:
+                # Bir sonraki turda yeniden denenir
+                pass
+
+    def start(self):
+        if self._thread is None:
+            self.load()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='bitswap-tracker', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Arka plan thread'ini durdur ve son durumu yaz"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.checkpoint()
+
+
+def _int_param(query, name, default, low, high):
+    value = query.get(name, [None])[0]
+    if value is None or value == '':
+        return default
+    if not (value.isascii() and value.isdigit()):
+        raise ValueError(f'Invalid {name}')
+    return max(low, min(high, int(value)))
+
+
+def parse_announce(query, client_ip):
+    """parse_qs sonucu -> Tracker.announce argümanları; hatalıysa ValueError"""
+    info_hash = (query.get('info_hash', [''])[0]).lower()
+    if not is_valid_hash(info_hash):
+        raise ValueError('Invalid info_hash')
+    port = _int_param(query, 'port', None, 0, 65536)
+    if port is None or not 0 < port < 65536:
+        raise ValueError('Invalid port')
+    event = query.get('event', [''])[0]
+    if event not in EVENTS:
+        raise ValueError('Invalid event')
+    return {
+        'info_hash': info_hash,
+        # Peer adresi bağlantıdan alınır; ip parametresiyle başkası adına kayıt yapılamaz
+        'ip': client_ip,
+        'port': port,
+        'peer_id': query.get('peer_id', [''])[0][:MAX_PEER_ID],
+        'left': _int_param(query, 'left', None, 0, 1 << 62),
+        'event': event,
+        'numwant': _int_param(query, 'numwant', DEFAULT_NUMWANT, 0, MAX_NUMWANT),
+    }
+
+
+def parse_scrape(query):
+    """?info_hash=...&info_hash=... -> geçerli hash listesi"""
+    info_hashes = [value.lower() for value in query.get('info_hash', [])][:MAX_SCRAPE]
+    if not info_hashes or not all(is_valid_hash(value) for value in info_hashes):
+        raise ValueError('Invalid info_hash')
+    return list(dict.fromkeys(info_hashes))
+
+
+def add_tracker_arguments(parser):
+    """Tracker ayarlarını argparse parser'ına ekle"""
+    parser.add_argument('--tracker-interval', type=int, default=DEFAULT_INTERVAL,
+                        help="istemcilere önerilen announce aralığı (saniye)")
+    parser.add_argument('--tracker-peer-ttl', type=int, default=DEFAULT_PEER_TTL,
+                        help="bu kadar saniye announce etmeyen peer listeden düşer")
+    parser.add_argument('--tracker-checkpoint-interval', type=float, default=DEFAULT_CHECKPOINT_INTERVAL,
+                        help='peers tablosuna toplu yazım aralığı (saniye)')
+    return parser
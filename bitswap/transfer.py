@@ -0,0 +1,179 @@
+"""
+Dosyadan sokete veri gönderme
+
+Düz TCP soketlerinde socket.sendfile (Linux'ta os.sendfile) ile veri
+kernel içinde kopyalanır ve Python'dan geçmez. TLS gibi sarılmış
+soketlerde veya sendfile olmayan platformlarda büyük, yeniden
+kullanılan bir tamponla readinto/write döngüsüne düşülür.
+
+Bant genişliği sınırı olan aktarımlarda (bkz. shaping) aynı yollar
+dilim dilim çağrılır; sınırsız aktarımın yolu değişmez.
+"""
+
+import os
+import socket
+
+from bitswap.ranges import ByteRanges, content_range
+
+FALLBACK_BUFFER_SIZE = 1024 * 1024
+# sendfile bu boyutta dilimlerle çağrılır: bağlantı koparsa o ana kadar
+# gönderilen byte'lar bilinir (yarıda kalan dilim sayılmaz)
+SENDFILE_SLICE = 16 * 1024 * 1024
+
+HAS_SENDFILE = hasattr(os, 'sendfile')
+
+
+def _can_sendfile(connection):
+    # SSLSocket gibi alt sınıflar şifreleme için veriyi Python'dan geçirmek zorunda
+    return HAS_SENDFILE and type(connection) is socket.socket
+
+
+def _sendfile(wfile, connection, f, offset, count):
+    sent = connection.sendfile(f, offset, count)
+    # sendfile wfile'ı atlar; yazılanları sayan sarmalayıcıya (bkz.
+    # metrics.CountingWriter) gönderileni ayrıca bildir
+    bypassed = getattr(wfile, 'bypassed', None)
+    if bypassed is not None:
+        bypassed(sent)
+    return sent
+
+
+def copy_buffered(wfile, f, offset=0, count=None, buffer_size=FALLBACK_BUFFER_SIZE):
+    """f'den wfile'a tek bir büyük tampon üzerinden kopyala"""
+    f.seek(offset)
+    buf = bytearray(min(buffer_size, count) if count is not None else buffer_size)
+    view = memoryview(buf)
+    sent = 0
+    while count is None or sent < count:
+        want = len(buf) if count is None else min(len(buf), count - sent)
+        n = f.readinto(view[:want])
+        if not n:
+            break
+        wfile.write(view[:n])
+        sent += n
+    return sent
+
+
+def send_file(wfile, connection, f, offset=0, count=None, transfer=None):
+    """f'nin [offset, offset+count) aralığını istemciye gönder
+
+    wfile ve connection BaseHTTPRequestHandler'dan gelir; başlıklar
+    end_headers() ile zaten yazılmış olmalıdır. transfer verilirse
+    (bkz. shaping.Transfer) her dilimden önce izin beklenir. Gönderilen
+    byte sayısını döndürür.
+    """
+    if count is None:
+        count = os.fstat(f.fileno()).st_size - offset
+    if count <= 0:
+        return 0
+    if hasattr(wfile, 'flush'):
+        wfile.flush()
+    if _can_sendfile(connection):
+        send = lambda start, n: _sendfile(wfile, connection, f, start, n)
+        take = lambda n: min(n, SENDFILE_SLICE)
+    else:
+        send = lambda start, n: copy_buffered(wfile, f, start, n)
+        take = None
+    if transfer is not None:
+        take = transfer.take
+    if take is None:
+        return send(offset, count)
+    sent = 0
+    while sent < count:
+        n = send(offset + sent, take(count - sent))
+        if not n:
+            break
+        sent += n
+    return sent
+
+
+def send_file_response(handler, f, size, content_type, etag, ranges=None, extra_headers=(),
+                       transfer=None):
+    """Tam dosya (200) veya istenen aralıklar (206) için yanıt gönder
+
+    handler bir BaseHTTPRequestHandler'dır; ranges
+    bitswap.ranges.requested_ranges sonucudur.
+    """
+    if not ranges:
+        handler.send_response(200)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Length', str(size))
+    elif len(ranges) == 1:
+        start, stop = ranges[0]
+        handler.send_response(206)
+        handler.send_header('Content-Type', content_type)
+        handler.send_header('Content-Range', content_range(start, stop, size))
+        handler.send_header('Content-Length', str(stop - start))
+    else:
+        body = ByteRanges(ranges, size, content_type)
+        handler.send_response(206)
+        handler.send_header('Content-Type', body.content_type)
+        handler.send_header('Content-Length', str(body.content_length))
+    handler.send_header('Accept-Ranges', 'bytes')
+    handler.send_header('ETag', etag)
+    for name, value in extra_headers:
+        handler.send_header(name, value)
+    handler.end_headers()
+
+    if handler.command == 'HEAD':
+        return 0
+    if not ranges:
+        return send_file(handler.wfile, handler.connection, f, 0, size, transfer)
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        return send_file(handler.wfile, handler.connection, f, start, stop - start, transfer)
+    sent = 0
+    for head, start, stop in body.parts:
+        handler.wfile.write(head)
+        sent += send_file(handler.wfile, handler.connection, f, start, stop - start, transfer)
+    handler.wfile.write(body.trailer)
+    return sent
+
+
+def send_piece_response(handler, f, offset, length, etag, cache_control, extra_headers=(),
+                        transfer=None):
+    """Dosyanın [offset, offset+length) parçasını tek başına 200 ile gönder"""
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'application/octet-stream')
+    handler.send_header('Content-Length', str(length))
+    handler.send_header('ETag', etag)
+    handler.send_header('Cache-Control', cache_control)
+    for name, value in extra_headers:
+        handler.send_header(name, value)
+    handler.end_headers()
+    if handler.command == 'HEAD':
+        return 0
+    return send_file(handler.wfile, handler.connection, f, offset, length, transfer)
+
+
+def send_range_not_satisfiable(handler, size):
+    handler.send_response(416)
+    handler.send_header('Content-Range', f'bytes */{size}')
+    handler.send_header('Accept-Ranges', 'bytes')
+    handler.send_header('Content-Length', '0')
+    handler.end_headers()
+
+
+def iter_file_range(f, start, stop, chunk_size=FALLBACK_BUFFER_SIZE):
+    """WSGI gövdeleri için [start, stop) aralığını chunk'lar halinde ver"""
+    f.seek(start)
+    remaining = stop - start
+    while remaining > 0:
+        chunk = f.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def iter_ranges(path, ranges, body=None):
+    """Tek aralık veya ByteRanges düzeni için gövde üreteci"""
+    with open(path, 'rb') as f:
+        if body is None:
+            start, stop = ranges[0]
+            yield from iter_file_range(f, start, stop)
+            return
+        for head, start, stop in body.parts:
+            yield head
+            yield from iter_file_range(f, start, stop)
+        yield body.trailer
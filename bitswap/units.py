@@ -0,0 +1,27 @@
+"""
+Komut satırı değerleri için küçük ayrıştırıcılar
+
+Boyutlar ve hızlar '4MiB', '500KB' veya düz byte sayısı olarak
+yazılır; bench, memcheck ve shaping aynı ayrıştırıcıyı kullanır.
+"""
+
+UNITS = {'B': 1, 'KB': 1000, 'MB': 1000 ** 2, 'GB': 1000 ** 3,
+         'KIB': 1024, 'MIB': 1024 ** 2, 'GIB': 1024 ** 3}
+
+
+def parse_size(text):
+    """'4MiB', '500KB', '123' -> byte"""
+    text = text.strip().upper()
+    for unit in sorted(UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * UNITS[unit])
+    return int(text)
+
+
+def parse_weights(text, parse_key=str):
+    """'a=1,b=2' veya 'a:1,b:2' -> [(anahtar, ağırlık), ...]"""
+    weights = []
+    for item in text.split(','):
+        key, _, weight = item.replace(':', '=').partition('=')
+        weights.append((parse_key(key.strip()), float(weight or 1)))
+    return weights
@@ -5,50 +5,84 @@ Python HTTP Server Implementation
 """
 
 import os
+import sys
 import json
-import hashlib
-import sqlite3
 import mimetypes
+import argparse
 import urllib.parse
 from datetime import datetime
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import SimpleHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
-import cgi
 
-class BitSwapHandler(SimpleHTTPRequestHandler):
-    def __init__(self, *args, **kwargs):
-        self.upload_dir = "uploads"
-        self.db_path = "database.sqlite"
-        os.makedirs(self.upload_dir, exist_ok=True)
-        self.init_database()
-        super().__init__(*args, **kwargs)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bitswap.serving import (PooledHTTPServer, add_server_arguments, DEFAULT_WORKERS,
+                             DEFAULT_QUEUE_SIZE, DEFAULT_REQUEST_TIMEOUT)
+from bitswap.multipart import MultipartReader, parse_boundary
+from bitswap.schema import migrate
+from bitswap.db import Database, FIND_BY_HASH, STATS
+from bitswap.blobs import BlobStore, add_file
+from bitswap.manifest import ensure_manifest
+from bitswap.sessions import (UploadSessions, negotiate, check_upload, verify_upload,
+                              MAX_NEGOTIATION_BODY)
+from bitswap.resumable import (DEFAULT_MAX_UPLOAD_SIZE, ResumableUploads, UploadTooLarge,
+                               add_upload_arguments, create_upload, finalize_upload, parse_offset,
+                               parse_upload_path, MAX_CREATE_BODY)
+from bitswap.pieces import IMMUTABLE_CACHE_CONTROL, PieceIndex, parse_piece_path
+from bitswap.changes import CatalogVersion, LongPollFeed, change_json, parse_since
+from bitswap.counters import (DownloadCounter, add_counter_arguments, DEFAULT_FLUSH_INTERVAL,
+                              DEFAULT_FLUSH_THRESHOLD)
+from bitswap.catalog import list_files
+from bitswap.tracker import (Tracker, add_tracker_arguments, parse_announce, parse_scrape,
+                             DEFAULT_INTERVAL, DEFAULT_PEER_TTL, DEFAULT_CHECKPOINT_INTERVAL)
+from bitswap.ranges import (RangeNotSatisfiable, etag_matches, make_etag, requested_ranges,
+                            counts_as_download)
+from bitswap.transfer import send_file_response, send_piece_response, send_range_not_satisfiable
+from bitswap.assets import StaticAsset, load_directory, send_asset, HTML_CACHE_CONTROL
+from bitswap.metrics import InstrumentedHandler
+from bitswap.profiling import (ProfiledHandler, RequestProfiler, add_profile_arguments,
+                               DEFAULT_PROFILE_DIR, PROFILE_PATH)
+from bitswap.prefork import PreforkHandler, Supervisor, add_prefork_arguments
+from bitswap.shaping import BANDWIDTH_PATH, ShapedHandler, Shaper, add_shaping_arguments, rates_from_args
+
+WEB_UI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web-ui')
+
+class BitSwapHandler(PreforkHandler, ProfiledHandler, ShapedHandler, InstrumentedHandler,
+                     SimpleHTTPRequestHandler):
+    # Shared across requests: pooled WAL connections
+    db = Database("database.sqlite")
+    # Catalog version: ETags for /api/files and the /api/changes feed
+    catalog = CatalogVersion(db)
+    changes = LongPollFeed(catalog)
+    # Download counts are accumulated in memory and written in batches
+    downloads = DownloadCounter(db, on_flush=catalog.refresh)
+    # Hash-first upload sessions (see bitswap.sessions)
+    sessions = UploadSessions()
+    
+    upload_dir = "uploads"
+    # Files are stored as uploads/ab/cd/<hash> (see bitswap.blobs)
+    store = BlobStore(upload_dir)
+    # info_hash -> piece layout (LRU), see bitswap.pieces
+    pieces = PieceIndex(db, store)
+    # Resumable chunked uploads (see bitswap.resumable)
+    uploads = ResumableUploads(store, max_size=DEFAULT_MAX_UPLOAD_SIZE)
+    # In-memory swarms, checkpointed to the peers table (see bitswap.tracker)
+    tracker = Tracker(db)
+    # Admin-token gated profiling sessions (see bitswap.profiling)
+    profiler = RequestProfiler()
     
-    def init_database(self):
-        """Initialize SQLite database"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_hash TEXT UNIQUE NOT NULL,
-                original_name TEXT NOT NULL,
-                file_path TEXT NOT NULL,
-                file_size INTEGER NOT NULL,
-                mime_type TEXT,
-                upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-                download_count INTEGER DEFAULT 0,
-                uploader_ip TEXT
-            )
-        ''')
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS peers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_hash TEXT,
-                peer_ip TEXT,
-                last_seen DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        conn.close()
+    @classmethod
+    def init_database(cls):
+        """Create or upgrade the schema once at startup"""
+        os.makedirs(cls.upload_dir, exist_ok=True)
+        migrate(cls.db)
+    
+    @classmethod
+    def init_assets(cls):
+        """Build and compress the main page and web-ui/ files once"""
+        assets = load_directory(WEB_UI_DIR, '/ui/')
+        assets['/'] = StaticAsset(cls.main_page_html().encode('utf-8'), 'text/html; charset=utf-8',
+                                  HTML_CACHE_CONTROL)
+        cls.assets = assets
     
     def do_GET(self):
         """Handle GET requests"""
@@ -59,8 +93,28 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
             self.serve_main_page()
         elif path == '/api/files':
             self.handle_api_files(parsed_path)
+        elif path == '/metrics':
+            self.send_metrics()
+        elif path == PROFILE_PATH:
+            self.handle_profile()
+        elif path == BANDWIDTH_PATH:
+            self.handle_bandwidth()
+        elif path == '/api/changes':
+            self.handle_changes(parsed_path)
         elif path.startswith('/api/download'):
             self.handle_download(parsed_path)
+        elif path.startswith('/api/piece/'):
+            self.handle_piece(path)
+        elif path == '/api/announce':
+            self.handle_announce(parsed_path)
+        elif path == '/api/scrape':
+            self.handle_scrape(parsed_path)
+        elif path.startswith('/api/metadata/'):
+            self.handle_metadata(path.split('/')[-1])
+        elif path.startswith('/api/uploads/'):
+            self.handle_resumable('GET', parsed_path)
+        elif path.startswith('/ui/'):
+            self.serve_asset(path)
         elif path.startswith('/uploads/'):
             self.serve_upload_file()
         else:
@@ -71,13 +125,52 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
         parsed_path = urlparse(self.path)
         
         if parsed_path.path == '/api/upload':
-            self.handle_upload()
+            self.handle_upload(parsed_path)
+        elif parsed_path.path == '/api/upload/negotiate':
+            self.handle_negotiate()
+        elif parsed_path.path == PROFILE_PATH:
+            self.handle_profile()
+        elif parsed_path.path == BANDWIDTH_PATH:
+            self.handle_bandwidth()
+        elif parsed_path.path == '/api/uploads' or parsed_path.path.startswith('/api/uploads/'):
+            self.handle_resumable('POST', parsed_path)
+        else:
+            self.send_error(404)
+    
+    def do_PUT(self):
+        """Handle PUT requests: chunks of a resumable upload"""
+        parsed_path = urlparse(self.path)
+        if parsed_path.path.startswith('/api/uploads/'):
+            self.handle_resumable('PUT', parsed_path)
+        else:
+            self.send_error(404)
+    
+    def do_DELETE(self):
+        """Handle DELETE requests: cancel a resumable upload"""
+        parsed_path = urlparse(self.path)
+        if parsed_path.path.startswith('/api/uploads/'):
+            self.handle_resumable('DELETE', parsed_path)
+        elif parsed_path.path == PROFILE_PATH:
+            self.handle_profile()
         else:
             self.send_error(404)
     
     def serve_main_page(self):
-        """Serve the main HTML page"""
-        html = '''<!DOCTYPE html>
+        """Serve the main HTML page, precompressed at startup"""
+        send_asset(self, self.assets['/'])
+    
+    def serve_asset(self, path):
+        """Serve a web-ui/ file"""
+        asset = self.assets.get(path)
+        if asset is None:
+            self.send_error(404, "Not found")
+            return
+        send_asset(self, asset)
+    
+    @staticmethod
+    def main_page_html():
+        """The main HTML page"""
+        return '''<!DOCTYPE html>
 <html lang="tr">
 <head>
     <meta charset="UTF-8">
@@ -277,12 +370,28 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
         document.addEventListener('DOMContentLoaded', function() {
             loadStats();
             loadFiles();
-            setInterval(() => {
-                loadStats();
-                loadFiles();
-            }, 5000);
+            watchChanges();
         });
         
+        // Reload when the catalog changes (long poll: the request waits while nothing changes)
+        let catalogVersion = null;
+        function watchChanges() {
+            fetch('/api/changes' + (catalogVersion === null ? '' : '?since=' + catalogVersion))
+                .then(response => {
+                    if (!response.ok) throw new Error(response.status);
+                    return response.json();
+                })
+                .then(data => {
+                    if (catalogVersion !== null && data.version !== catalogVersion) {
+                        loadStats();
+                        loadFiles();
+                    }
+                    catalogVersion = data.version;
+                    watchChanges();
+                })
+                .catch(() => setTimeout(watchChanges, 5000));
+        }
+        
         function triggerFileUpload() {
             document.getElementById('fileInput').click();
         }
@@ -302,6 +411,30 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
             event.currentTarget.classList.add('drag-over');
         }
         
+        const BROWSER_HASH_LIMIT = 512 * 1024 * 1024;
+        
+        // Hash in the browser first: content the server already has is never sent.
+        // Without crypto.subtle (insecure context) or for very large files, upload directly
+        function negotiateUpload(file) {
+            const direct = {existing: false, upload_url: '/api/upload'};
+            if (!window.crypto || !crypto.subtle || file.size > BROWSER_HASH_LIMIT) {
+                return Promise.resolve(direct);
+            }
+            return file.arrayBuffer()
+                .then(buffer => crypto.subtle.digest('SHA-256', buffer))
+                .then(digest => {
+                    const hash = Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+                    return fetch('/api/upload/negotiate', {
+                        method: 'POST',
+                        headers: {'Content-Type': 'application/json'},
+                        body: JSON.stringify({hash: hash, size: file.size, name: file.name})
+                    });
+                })
+                .then(r => r.json())
+                .then(result => result.success ? result : direct)
+                .catch(() => direct);
+        }
+        
         function uploadFiles(files) {
             if (files.length === 0) return;
             
@@ -311,7 +444,18 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
             
             progressDiv.classList.remove('hidden');
             
-            files.forEach((file, index) => {
+            files.forEach((file, index) => negotiateUpload(file).then(target => {
+                // Already stored: nothing to send, just share the link
+                if (target.existing) {
+                    showNotification(`✅ ${file.name} zaten sunucuda, tekrar yüklenmedi`);
+                    navigator.clipboard.writeText(target.share_url).catch(() => {});
+                    if (index === files.length - 1) {
+                        progressDiv.classList.add('hidden');
+                        document.getElementById('fileInput').value = '';
+                    }
+                    return;
+                }
+                
                 const formData = new FormData();
                 formData.append('file', file);
                 
@@ -347,9 +491,9 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
                     }
                 });
                 
-                xhr.open('POST', '/api/upload');
+                xhr.open('POST', target.upload_url);
                 xhr.send(formData);
-            });
+            }));
         }
         
         function loadStats() {
@@ -435,23 +579,23 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
     </script>
 </body>
 </html>'''
-        
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.end_headers()
-        self.wfile.write(html.encode('utf-8'))
     
     def handle_api_files(self, parsed_path):
         """Handle files API requests"""
         query = parse_qs(parsed_path.query)
         action = query.get('action', ['list'])[0]
         
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        # Nothing changed since the client's copy: 304 without touching SQLite
+        version = self.catalog.value
+        if self.catalog.matches(self.headers.get('If-None-Match'), version):
+            self.send_response(304)
+            self.send_header('ETag', self.catalog.etag(version))
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
         
         if action == 'stats':
-            cursor = conn.execute('SELECT COUNT(*) as total_files, SUM(file_size) as total_size, SUM(download_count) as total_downloads FROM files')
-            row = cursor.fetchone()
+            row = self.db.query_one(STATS)
             stats = {
                 'total_files': row['total_files'] or 0,
                 'total_size': row['total_size'] or 0,
@@ -459,101 +603,120 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
             }
             response = {'success': True, 'stats': stats}
         else:
-            cursor = conn.execute('SELECT * FROM files ORDER BY upload_time DESC LIMIT 50')
-            files = []
-            for row in cursor.fetchall():
-                files.append({
-                    'hash': row['file_hash'],
-                    'name': row['original_name'],
-                    'size': row['file_size'],
-                    'download_count': row['download_count'],
-                    'upload_time': row['upload_time']
-                })
-            response = {'success': True, 'files': files}
-        
-        conn.close()
+            # Keyset pagination: ?sort=&limit=&cursor=&min_size=&max_size=&mime=
+            try:
+                files, next_cursor = list_files(self.db, {k: v[0] for k, v in query.items()})
+                response = {'success': True, 'files': files, 'next_cursor': next_cursor}
+            except ValueError as e:
+                response = {'success': False, 'message': str(e)}
         
-        self.send_response(200)
+        self.send_response(200 if response['success'] else 400)
         self.send_header('Content-type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        if response['success']:
+            self.send_header('ETag', self.catalog.etag(version))
+            self.send_header('Cache-Control', 'no-cache')
         self.end_headers()
         self.wfile.write(json.dumps(response).encode('utf-8'))
     
-    def handle_upload(self):
+    def handle_changes(self, parsed_path):
+        """Catalog change feed: waits until the version differs from ?since="""
+        since = parse_since(parse_qs(parsed_path.query).get('since', [None])[0])
+        # A waiting request does not hold a worker; LongPollFeed writes the response
+        if self.changes.park(self, since):
+            return
+        version = self.catalog.value
+        body = json.dumps(change_json(version, since is not None and version != since)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def handle_negotiate(self):
+        """Hash-first upload: content the server already has is never sent"""
+        try:
+            content_length = int(self.headers.get('Content-Length') or 0)
+            if content_length > MAX_NEGOTIATION_BODY:
+                raise ValueError("Request too large")
+            result = negotiate(self.store, self.sessions, self.rfile.read(content_length))
+            if result['existing']:
+                response = {
+                    'success': True,
+                    'message': 'File already exists',
+                    **result,
+                    'share_url': f"http://{self.headers['Host']}/api/download?hash={result['hash']}"
+                }
+            else:
+                response = {
+                    'success': True,
+                    'message': 'Upload needed',
+                    **result,
+                    'upload_url': f"http://{self.headers['Host']}/api/upload?session={result['session']}"
+                }
+        except ValueError as e:
+            response = {'success': False, 'message': str(e)}
+        
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200 if response['success'] else 400)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def handle_upload(self, parsed_path):
         """Handle file upload"""
+        upload = None
         try:
-            content_type = self.headers['Content-Type']
+            # Negotiated session: checked before any of the body is read
+            session = check_upload(self.sessions, parse_qs(parsed_path.query).get('session', [None])[0])
+            
+            content_type = self.headers['Content-Type'] or ''
             if not content_type.startswith('multipart/form-data'):
                 raise ValueError("Invalid content type")
             
-            # Parse multipart form data
-            form = cgi.FieldStorage(
-                fp=self.rfile,
-                headers=self.headers,
-                environ={'REQUEST_METHOD': 'POST'}
-            )
+            # Stream the multipart body; the file field is spooled straight
+            # into the upload directory while it is hashed
+            content_length = int(self.headers.get('Content-Length') or 0)
+            boundary = parse_boundary(content_type)
+            file_field = False
+            for part in MultipartReader(self.upload_reader(), boundary, content_length):
+                if part.name == 'file' and not file_field:
+                    file_field = True
+                    if part.filename:
+                        original_name = part.filename
+                        upload = self.store.spool()
+                        upload.write_from(part.iter_chunks())
+                        upload.close()
             
-            if 'file' not in form:
+            if not file_field:
                 raise ValueError("No file uploaded")
-            
-            file_item = form['file']
-            if not file_item.filename:
+            if not upload:
                 raise ValueError("No file selected")
             
-            # Read file content
-            file_content = file_item.file.read()
-            original_name = file_item.filename
-            file_size = len(file_content)
+            file_size = upload.size
+            file_hash = upload.hexdigest()
+            verify_upload(session, file_hash, file_size)
+            if session:
+                self.sessions.finish(session.id)
             
-            # Generate hash
-            file_hash = hashlib.sha256(file_content).hexdigest()
-            
-            # Check if file exists
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.execute('SELECT * FROM files WHERE file_hash = ?', (file_hash,))
-            existing = cursor.fetchone()
-            
-            if existing:
-                conn.close()
-                response = {
-                    'success': True,
-                    'message': 'File already exists',
-                    'hash': file_hash,
-                    'existing': True,
-                    'share_url': f"http://{self.headers['Host']}/api/download?hash={file_hash}"
-                }
-            else:
-                # Save file
-                filename = f"{file_hash}_{original_name}"
-                file_path = os.path.join(self.upload_dir, filename)
-                
-                with open(file_path, 'wb') as f:
-                    f.write(file_content)
-                
-                # Get MIME type
-                mime_type = mimetypes.guess_type(original_name)[0] or 'application/octet-stream'
-                
-                # Save to database
-                client_ip = self.client_address[0]
-                conn.execute('''
-                    INSERT INTO files (file_hash, original_name, file_path, file_size, mime_type, uploader_ip)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (file_hash, original_name, file_path, file_size, mime_type, client_ip))
-                conn.commit()
-                conn.close()
-                
-                response = {
-                    'success': True,
-                    'message': 'File uploaded successfully',
-                    'hash': file_hash,
-                    'original_name': original_name,
-                    'size': file_size,
-                    'magnet_url': f"magnet:?xt=urn:sha256:{file_hash}&dn={urllib.parse.quote(original_name)}&xl={file_size}",
-                    'share_url': f"http://{self.headers['Host']}/api/download?hash={file_hash}"
-                }
+            # Content-addressed store: the existence check is a stat, not a query
+            mime_type = mimetypes.guess_type(original_name)[0] or 'application/octet-stream'
+            client_ip = self.client_address[0]
+            created = (not self.store.exists(file_hash)
+                       and add_file(self.db, self.store, upload, original_name, mime_type, client_ip))
+            if not created:
+                upload.discard()
+            response = self.upload_response(file_hash, original_name, file_size, created)
         
         except Exception as e:
             response = {'success': False, 'message': str(e)}
+        finally:
+            if upload:
+                upload.discard()
         
         self.send_response(200 if response['success'] else 400)
         self.send_header('Content-type', 'application/json')
@@ -561,6 +724,177 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(json.dumps(response).encode('utf-8'))
     
+    def upload_response(self, file_hash, original_name, file_size, created):
+        """Upload response (multipart or chunked); new files get a .bwt manifest"""
+        if not created:
+            return {
+                'success': True,
+                'message': 'File already exists',
+                'hash': file_hash,
+                'existing': True,
+                'share_url': f"http://{self.headers['Host']}/api/download?hash={file_hash}"
+            }
+        # Stored as uploads/ab/cd/<hash>; the name lives only in the database
+        # .bwt manifest: piece hashes are computed on all cores
+        manifest = ensure_manifest(self.db, self.store, file_hash, self.store.path(file_hash), original_name)
+        self.catalog.refresh()
+        return {
+            'success': True,
+            'message': 'File uploaded successfully',
+            'hash': file_hash,
+            'original_name': original_name,
+            'size': file_size,
+            'info_hash': manifest['info_hash'],
+            'metadata_url': f"http://{self.headers['Host']}/api/metadata/{file_hash}",
+            'magnet_url': (f"magnet:?xt=urn:sha256:{file_hash}&dn={urllib.parse.quote(original_name)}"
+                           f"&xl={file_size}&tr={urllib.parse.quote(self.announce_url(), safe='')}"),
+            'share_url': f"http://{self.headers['Host']}/api/download?hash={file_hash}"
+        }
+    
+    def handle_resumable(self, method, parsed_path):
+        """Resumable uploads: /api/uploads[/<id>[/finalize]] (see bitswap.resumable)"""
+        path = parsed_path.path
+        target = (None, False) if path == '/api/uploads' else parse_upload_path(path)
+        if target is None:
+            self.send_error(404)
+            return
+        session_id, finalize = target
+        status = 200
+        not_found = {'success': False, 'message': 'Upload session not found'}
+        try:
+            content_length = int(self.headers.get('Content-Length') or 0)
+            if session_id is None and method == 'POST':
+                if content_length > MAX_CREATE_BODY:
+                    raise ValueError("Request too large")
+                result = create_upload(self.store, self.uploads, self.rfile.read(content_length))
+                if result['existing']:
+                    response = {'success': True, 'message': 'File already exists', **result,
+                                'share_url': f"http://{self.headers['Host']}/api/download?hash={result['hash']}"}
+                else:
+                    status = 201
+                    response = {'success': True, **result,
+                                'upload_url': f"http://{self.headers['Host']}/api/uploads/{result['session']}"}
+            elif session_id is None or (finalize and method != 'POST'):
+                status, response = 405, {'success': False, 'message': 'Method not allowed'}
+            elif finalize:
+                # The hash was computed as chunks arrived: the file is not read again
+                finished = finalize_upload(self.db, self.store, self.uploads, session_id,
+                                           self.client_address[0])
+                if finished is None:
+                    status, response = 404, not_found
+                else:
+                    upload, file_hash, created = finished
+                    response = self.upload_response(file_hash, upload.name, upload.size, created)
+            elif method == 'DELETE':
+                if self.uploads.cancel(session_id):
+                    response = {'success': True, 'message': 'Upload cancelled'}
+                else:
+                    status, response = 404, not_found
+            else:
+                upload = self.uploads.get(session_id)
+                if upload is None:
+                    status, response = 404, not_found
+                else:
+                    if method == 'PUT':
+                        offset = parse_offset(parse_qs(parsed_path.query).get('offset', [None])[0])
+                        if content_length > upload.chunk_size:
+                            raise ValueError("Invalid chunk size")
+                        upload.write_chunk(offset, self.upload_reader().read(content_length))
+                    response = {'success': True, **upload.status()}
+        except UploadTooLarge as e:
+            status, response = 413, {'success': False, 'message': str(e)}
+        except ValueError as e:
+            status, response = 400, {'success': False, 'message': str(e)}
+        
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def handle_piece(self, path):
+        """Serve one piece: /api/piece/<info_hash>/<index>, zero-copy on plain sockets"""
+        target = parse_piece_path(path)
+        layout = target and self.pieces.get(target[0])
+        if not layout or not 0 <= target[1] < layout.count:
+            self.send_error(404, "Piece not found")
+            return
+        
+        # A piece never changes: strong ETag (its hash) and immutable caching
+        offset, length, piece_hash = layout.piece(target[1])
+        etag = make_etag(piece_hash)
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', IMMUTABLE_CACHE_CONTROL)
+            self.end_headers()
+            return
+        
+        try:
+            f = open(layout.path, 'rb')
+        except FileNotFoundError:
+            self.send_error(404, "Piece not found")
+            return
+        with f:
+            send_piece_response(self, f, offset, length, etag, IMMUTABLE_CACHE_CONTROL,
+                                [('Access-Control-Allow-Origin', '*')],
+                                self.download_transfer(layout.file_hash))
+    
+    def handle_metadata(self, file_hash):
+        """Serve the .bwt metadata, generating it on first use for older uploads"""
+        file_record = self.db.query_one(FIND_BY_HASH, (file_hash,))
+        if not file_record or not os.path.exists(file_record['file_path']):
+            self.send_error(404, "File not found")
+            return
+        
+        manifest = ensure_manifest(self.db, self.store, file_hash,
+                                   file_record['file_path'], file_record['original_name'])
+        # web_seed depends on the requested host and is not part of info_hash
+        manifest['web_seed'] = [f"http://{self.headers['Host']}/api/download?hash={file_hash}"]
+        manifest['trackers'] = [self.announce_url()]
+        body = json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8')
+        
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def announce_url(self):
+        return f"http://{self.headers['Host']}/api/announce"
+    
+    def handle_announce(self, parsed_path):
+        """Tracker announce: ?info_hash=&port=&peer_id=&left=&event=&numwant="""
+        try:
+            args = parse_announce(parse_qs(parsed_path.query), self.client_address[0])
+            response = {'success': True, **self.tracker.announce(**args)}
+        except ValueError as e:
+            response = {'success': False, 'message': str(e)}
+        self.send_tracker_response(response)
+    
+    def handle_scrape(self, parsed_path):
+        """Tracker scrape: swarm counts for one or more ?info_hash="""
+        try:
+            files = self.tracker.scrape(parse_scrape(parse_qs(parsed_path.query)))
+            response = {'success': True, 'files': files}
+        except ValueError as e:
+            response = {'success': False, 'message': str(e)}
+        self.send_tracker_response(response)
+    
+    def send_tracker_response(self, response):
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200 if response['success'] else 400)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
     def handle_download(self, parsed_path):
         """Handle file download"""
         query = parse_qs(parsed_path.query)
@@ -570,65 +904,121 @@ class BitSwapHandler(SimpleHTTPRequestHandler):
             self.send_error(400, "Missing hash parameter")
             return
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.execute('SELECT * FROM files WHERE file_hash = ?', (file_hash,))
-        file_record = cursor.fetchone()
+        file_record = self.db.query_one(FIND_BY_HASH, (file_hash,))
         
         if not file_record:
-            conn.close()
             self.send_error(404, "File not found")
             return
         
-        file_path = file_record[3]  # file_path column
-        original_name = file_record[2]  # original_name column
-        file_size = file_record[4]  # file_size column
-        mime_type = file_record[5]  # mime_type column
+        file_path = file_record['file_path']
+        original_name = file_record['original_name']
+        file_size = file_record['file_size']
+        # Looked up by name: migrated databases append mime_type as the last column
+        mime_type = file_record['mime_type']
         
         if not os.path.exists(file_path):
-            conn.close()
             self.send_error(404, "File not found on disk")
             return
         
-        # Update download count
-        conn.execute('UPDATE files SET download_count = download_count + 1 WHERE file_hash = ?', (file_hash,))
-        conn.commit()
-        conn.close()
+        # Honor Range / If-Range against the hash-derived ETag
+        etag = make_etag(file_hash)
+        try:
+            ranges = requested_ranges(self.headers, file_size, etag)
+        except RangeNotSatisfiable:
+            send_range_not_satisfiable(self, file_size)
+            return
         
-        # Send file
-        self.send_response(200)
-        self.send_header('Content-Type', mime_type or 'application/octet-stream')
-        self.send_header('Content-Disposition', f'attachment; filename="{original_name}"')
-        self.send_header('Content-Length', str(file_size))
-        self.end_headers()
+        # Update download count (resumed and secondary ranges are not new downloads)
+        if counts_as_download(ranges):
+            self.downloads.increment(file_hash)
         
+        # Send file, zero-copy when the connection is a plain socket
         with open(file_path, 'rb') as f:
-            while True:
-                chunk = f.read(8192)
-                if not chunk:
-                    break
-                self.wfile.write(chunk)
+            send_file_response(self, f, file_size, mime_type or 'application/octet-stream', etag, ranges,
+                               [('Content-Disposition', f'attachment; filename="{original_name}"')],
+                               self.download_transfer(file_hash))
+
+def run_server(port=8080, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+               request_timeout=DEFAULT_REQUEST_TIMEOUT, flush_interval=DEFAULT_FLUSH_INTERVAL,
+               flush_threshold=DEFAULT_FLUSH_THRESHOLD, tracker_interval=DEFAULT_INTERVAL,
+               peer_ttl=DEFAULT_PEER_TTL, checkpoint_interval=DEFAULT_CHECKPOINT_INTERVAL,
+               admin_token=None, profile_dir=DEFAULT_PROFILE_DIR, processes=1, reuse_port=False,
+               rates=None, max_upload_size=DEFAULT_MAX_UPLOAD_SIZE):
+    """Run the BitSwapTorrent server on a bounded worker pool (one pool per process if processes > 1)"""
+    BitSwapHandler.init_database()
+    BitSwapHandler.init_assets()
+    # Bandwidth limits; pre-forked processes share the buckets (see bitswap.shaping)
+    BitSwapHandler.shaper = Shaper(rates, admin_token, shared=processes > 1)
 
-def run_server(port=8080):
-    """Run the BitSwapTorrent server"""
-    server_address = ('', port)
-    httpd = HTTPServer(server_address, BitSwapHandler)
-    print(f"""
+    def serve(process=None):
+        """Start the services and handle requests until Ctrl+C (SIGTERM when pre-forked)"""
+        if process is not None:
+            # Sessions stay in this process; their requests are handed off here (see bitswap.prefork)
+            BitSwapHandler.prefork = process
+            BitSwapHandler.sessions.id_prefix = BitSwapHandler.uploads.id_prefix = process.id_prefix
+        BitSwapHandler.catalog.start()
+        BitSwapHandler.changes.start()
+        BitSwapHandler.uploads.max_size = max_upload_size or None
+        BitSwapHandler.uploads.start()
+        BitSwapHandler.downloads = DownloadCounter(BitSwapHandler.db, flush_interval, flush_threshold,
+                                                   BitSwapHandler.catalog.refresh).start()
+        BitSwapHandler.tracker = Tracker(BitSwapHandler.db, tracker_interval, peer_ttl,
+                                         checkpoint_interval)
+        # Announces and scrapes are handed off to the primary process
+        if process is None or process.primary:
+            BitSwapHandler.tracker.start()
+        BitSwapHandler.profiler = RequestProfiler(admin_token, profile_dir)
+        httpd = PooledHTTPServer(('', port), BitSwapHandler, workers=workers, queue_size=queue_size,
+                                 request_timeout=request_timeout,
+                                 listener=process.listener if process is not None else None)
+        if process is not None:
+            process.start(httpd)
+        else:
+            print(banner)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            if process is None:
+                print("\n🛑 Server durduruldu!")
+        finally:
+            if process is not None:
+                process.stop()
+            httpd.server_close()
+            BitSwapHandler.downloads.stop()
+            BitSwapHandler.tracker.stop()
+            BitSwapHandler.changes.stop()
+            BitSwapHandler.uploads.stop()
+            BitSwapHandler.catalog.stop()
+
+    banner = f"""
 🚀 BitSwapTorrent Server Başlatıldı!
 
 📍 Adres: http://localhost:{port}
 📁 Upload klasörü: uploads/
 💾 Database: database.sqlite
+🧵 Workers: {workers} (queue: {queue_size}) × {processes} process(es)
 
 ✅ Artık dosya yükleyip paylaşabilirsin!
 🔗 Tarayıcıda http://localhost:{port} adresini aç
 
 Durdurmak için Ctrl+C
-""")
-    try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\n🛑 Server durduruldu!")
-        httpd.server_close()
+"""
+    if processes <= 1:
+        serve()
+        return
+    # Before forking: no open SQLite connections and no threads
+    BitSwapHandler.db.close()
+    supervisor = Supervisor(processes, ('', port), reuse_port)
+    print(banner)
+    supervisor.run(serve)
+    print("\n🛑 Server durduruldu!")
 
 if __name__ == '__main__':
-    run_server()
+    parser = add_server_arguments(argparse.ArgumentParser(description=__doc__), 8080)
+    parser = add_profile_arguments(add_tracker_arguments(add_counter_arguments(parser)))
+    args = add_upload_arguments(add_shaping_arguments(add_prefork_arguments(parser))).parse_args()
+    run_server(args.port, args.workers, args.queue_size, args.request_timeout,
+               args.counter_flush_interval, args.counter_flush_threshold, args.tracker_interval,
+               args.tracker_peer_ttl, args.tracker_checkpoint_interval, args.admin_token,
+               args.profile_dir, args.processes, args.reuse_port, rates_from_args(args),
+               args.max_upload_size)
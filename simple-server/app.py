@@ -5,11 +5,10 @@ Flask tabanlı - Kolay kurulum
 """
 
 try:
-    from flask import Flask, render_template_string, request, jsonify, send_file, redirect
+    from flask import Flask, Response, g, render_template_string, request, jsonify, send_file, redirect
+    from werkzeug.wsgi import ClosingIterator
     import os
-    import hashlib
     import json
-    import sqlite3
     from datetime import datetime
     import mimetypes
     
@@ -19,159 +18,423 @@ except ImportError:
     print("🔧 Kurulum için: pip install flask")
     exit(1)
 
+import argparse
+import atexit
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bitswap.multipart import MultipartReader, MultipartError, parse_boundary
+from bitswap.schema import migrate
+from bitswap.db import Database, FIND_BY_HASH, STATS
+from bitswap.blobs import BlobStore, add_file
+from bitswap.manifest import ensure_manifest
+from bitswap.sessions import (UploadSessions, negotiate, check_upload, verify_upload,
+                              MAX_NEGOTIATION_BODY)
+from bitswap.resumable import (ResumableUploads, UploadTooLarge, create_upload, finalize_upload,
+                               parse_offset, MAX_CREATE_BODY)
+from bitswap.pieces import IMMUTABLE_CACHE_CONTROL, PieceIndex
+from bitswap.counters import DownloadCounter
+from bitswap.changes import CatalogVersion, change_json, parse_since, DEFAULT_POLL_TIMEOUT
+from bitswap.catalog import list_files
+from bitswap.ranges import (ByteRanges, RangeNotSatisfiable, content_range, etag_matches, make_etag,
+                            requested_ranges, counts_as_download)
+from bitswap.transfer import iter_ranges
+from bitswap.assets import StaticAsset, asset_response, load_directory, HTML_CACHE_CONTROL
+from bitswap.metrics import CONTENT_TYPE, REGISTRY, RequestTimer
+from bitswap.profiling import ADMIN_HEADER
+from bitswap.shaping import (BANDWIDTH_PATH, MAX_BANDWIDTH_BODY, Shaper, add_shaping_arguments,
+                             parse_rates, rates_from_args, throttled_body, throttled_reader)
+
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024 * 1024  # 1GB limit
 
 # Upload directory
 UPLOAD_DIR = 'uploads'
 DB_FILE = 'bitswap.db'
+WEB_UI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web-ui')
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Dosyalar uploads/ab/cd/<hash> düzeninde (bkz. bitswap.blobs)
+store = BlobStore(UPLOAD_DIR)
+
+# Havuzlanmış, WAL modunda bağlantılar (istek başına connect/close yok)
+db = Database(DB_FILE)
+# Katalog sürümü: /api/files ETag'leri ve /api/changes beslemesi
+catalog = CatalogVersion(db)
+# İndirme sayaçları bellekte birikir, toplu yazılır (bkz. bitswap.counters)
+downloads = DownloadCounter(db, on_flush=catalog.refresh)
+# info_hash -> parça düzeni (LRU), bkz. bitswap.pieces
+pieces = PieceIndex(db, store)
+# Hash-first upload oturumları (bkz. bitswap.sessions)
+sessions = UploadSessions()
+# Devam ettirilebilir parçalı upload'lar; toplam boyut da MAX_CONTENT_LENGTH ile sınırlı
+uploads = ResumableUploads(store, max_size=app.config['MAX_CONTENT_LENGTH'])
+# Bant genişliği sınırları: --*-rate bayrakları ve /api/admin/bandwidth (bkz. bitswap.shaping)
+shaper = Shaper()
 
 def init_db():
-    """Initialize database"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS files (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_hash TEXT UNIQUE NOT NULL,
-            original_name TEXT NOT NULL,
-            file_path TEXT NOT NULL,
-            file_size INTEGER NOT NULL,
-            upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-            download_count INTEGER DEFAULT 0,
-            uploader_ip TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Şemayı oluştur / güncelle (başlangıçta bir kez)"""
+    migrate(db)
+    catalog.start()
+    downloads.start()
+    uploads.start()
+    # Kapanışta bekleyen sayaçları yaz, açık upload dosyalarını sil
+    atexit.register(downloads.stop)
+    atexit.register(uploads.stop)
+
+# Ana sayfa ve web-ui/ başlangıçta bir kez render edilip sıkıştırılır (bkz. bitswap.assets)
+assets = {}
+
+def init_assets():
+    """Statik yanıtları hazırla (başlangıçta bir kez)"""
+    assets.update(load_directory(WEB_UI_DIR, '/ui/'))
+    with app.app_context():
+        html = render_template_string(HTML_TEMPLATE)
+    assets['/'] = StaticAsset(html.encode('utf-8'), 'text/html; charset=utf-8', HTML_CACHE_CONTROL)
+
+def send_asset(path):
+    asset = assets.get(path)
+    if asset is None:
+        return "Sayfa bulunamadı", 404
+    status, headers, body = asset_response(asset, request.headers)
+    return Response(body, status=status, headers=headers)
+
+@app.before_request
+def start_request_timer():
+    """İstek metriklerini başlat (bkz. bitswap.metrics)"""
+    g.request_timer = RequestTimer(request.method, request.path, request.content_length or 0)
+
+@app.after_request
+def finish_request_timer(response):
+    """Süre, gövde gönderilip yanıt kapandığında biter (akış yanıtları dahil)"""
+    timer = g.pop('request_timer', None)
+    if timer is not None:
+        status = response.status_code
+        sent = 0 if request.method == 'HEAD' else response.content_length or 0
+        finish = lambda: timer.finish(status, sent)
+        response.call_on_close(finish)
+        if response.direct_passthrough:
+            # send_file/iter_ranges gövdesi response.close'u atlar; bitişi gövdeden yakala
+            response.response = ClosingIterator(response.response, finish)
+    return response
+
+@app.teardown_request
+def drop_request_timer(error=None):
+    # after_request çalışmadıysa (yakalanmamış hata) istek yine de sayılır
+    timer = g.pop('request_timer', None)
+    if timer is not None:
+        timer.finish(500)
+
+def upload_stream():
+    """request.stream veya upload sınırı varsa sınırlı sarmalayıcısı"""
+    return throttled_reader(request.stream, shaper.upload(request.remote_addr))
+
+def download_body(body, file_hash):
+    """Gövde üretecini indirme sınırlarına bağla (sınır yoksa aynen döner)"""
+    return throttled_body(body, shaper.download(request.remote_addr, file_hash))
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metin formatında metrikler"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE, headers={'Cache-Control': 'no-store'})
 
 @app.route('/')
 def index():
     """Ana sayfa"""
-    return render_template_string(HTML_TEMPLATE)
+    return send_asset('/')
+
+@app.route('/ui/')
+@app.route('/ui/<name>')
+def web_ui(name=''):
+    """web-ui/ dosyaları"""
+    return send_asset('/ui/' + name)
+
+@app.route('/api/upload/negotiate', methods=['POST'])
+def negotiate_upload():
+    """Hash-first upload: içerik zaten varsa dosya hiç gönderilmez"""
+    try:
+        if (request.content_length or 0) > MAX_NEGOTIATION_BODY:
+            raise ValueError("İstek çok büyük")
+        result = negotiate(store, sessions, request.get_data())
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if result['existing']:
+        return jsonify({
+            'success': True,
+            'message': 'Dosya zaten mevcut',
+            **result,
+            'share_url': f"{request.host_url}download/{result['hash']}"
+        })
+    return jsonify({
+        'success': True,
+        'message': 'Yükleme gerekli',
+        **result,
+        'upload_url': f"{request.host_url}api/upload?session={result['session']}"
+    })
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
-    """Dosya yükleme"""
+    """Dosya yükleme (akış halinde, bellek chunk boyutuyla sınırlı)"""
+    upload = None
     try:
-        if 'file' not in request.files:
+        # Pazarlıkla açılmış oturum: gövde okunmadan önce doğrulanır
+        session = check_upload(sessions, request.args.get('session'))
+        
+        # request.files kullanılmıyor: gövde doğrudan request.stream'den
+        # okunur, dosya alanı uploads/ içinde geçici dosyaya yazılırken hash'lenir
+        try:
+            boundary = parse_boundary(request.headers.get('Content-Type', ''))
+        except MultipartError:
             return jsonify({'success': False, 'message': 'Dosya seçilmedi'})
         
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'success': False, 'message': 'Dosya seçilmedi'})
+        original_name = None
+        for part in MultipartReader(upload_stream(), boundary, request.content_length or 0):
+            if part.name == 'file' and part.filename and upload is None:
+                original_name = part.filename
+                upload = store.spool()
+                upload.write_from(part.iter_chunks())
+                upload.close()
         
-        # Dosya içeriğini oku
-        file_content = file.read()
-        original_name = file.filename
-        file_size = len(file_content)
-        
-        # Hash hesapla
-        file_hash = hashlib.sha256(file_content).hexdigest()
-        
-        # Database'de var mı kontrol et
-        conn = get_db()
-        existing = conn.execute('SELECT * FROM files WHERE file_hash = ?', (file_hash,)).fetchone()
-        
-        if existing:
-            conn.close()
-            return jsonify({
-                'success': True,
-                'message': 'Dosya zaten mevcut',
-                'hash': file_hash,
-                'share_url': f"{request.host_url}download/{file_hash}"
-            })
-        
-        # Dosyayı kaydet
-        filename = f"{file_hash}_{original_name}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
+        if upload is None:
+            return jsonify({'success': False, 'message': 'Dosya seçilmedi'})
         
-        with open(file_path, 'wb') as f:
-            f.write(file_content)
+        file_size = upload.size
+        file_hash = upload.hexdigest()
+        verify_upload(session, file_hash, file_size)
+        if session:
+            sessions.finish(session.id)
         
-        # Database'e ekle
+        # İçerik adresli depo: varlık kontrolü veritabanına gitmeden tek stat
         uploader_ip = request.remote_addr
-        conn.execute('''
-            INSERT INTO files (file_hash, original_name, file_path, file_size, uploader_ip)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (file_hash, original_name, file_path, file_size, uploader_ip))
-        conn.commit()
-        conn.close()
+        mime_type = mimetypes.guess_type(original_name)[0] or 'application/octet-stream'
+        created = (not store.exists(file_hash)
+                   and add_file(db, store, upload, original_name, mime_type, uploader_ip))
+        if not created:
+            # Aynı içerik zaten kayıtlı: geçici kopyayı sil
+            upload.discard()
+        return jsonify(upload_response(file_hash, original_name, file_size, created))
         
-        return jsonify({
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+    finally:
+        if upload:
+            upload.discard()
+
+def upload_response(file_hash, original_name, file_size, created):
+    """Upload yanıtı (multipart veya parçalı); yeni dosya için .bwt üretilir"""
+    if not created:
+        return {
             'success': True,
-            'message': 'Dosya başarıyla yüklendi',
+            'message': 'Dosya zaten mevcut',
             'hash': file_hash,
-            'original_name': original_name,
-            'size': file_size,
             'share_url': f"{request.host_url}download/{file_hash}"
-        })
-        
-    except Exception as e:
-        return jsonify({'success': False, 'message': str(e)})
+        }
+    # Dosya uploads/ab/cd/<hash> altına taşındı, adı sadece veritabanında
+    # .bwt manifest'i: parça hash'leri tüm çekirdeklerde paralel
+    manifest = ensure_manifest(db, store, file_hash, store.path(file_hash), original_name)
+    catalog.refresh()
+    return {
+        'success': True,
+        'message': 'Dosya başarıyla yüklendi',
+        'hash': file_hash,
+        'original_name': original_name,
+        'size': file_size,
+        'info_hash': manifest['info_hash'],
+        'metadata_url': f"{request.host_url}api/metadata/{file_hash}",
+        'share_url': f"{request.host_url}download/{file_hash}"
+    }
+
+NO_STORE = {'Cache-Control': 'no-store'}
+UPLOAD_NOT_FOUND = {'success': False, 'message': 'Upload oturumu bulunamadı'}
+
+@app.route('/api/uploads', methods=['POST'])
+def create_resumable_upload():
+    """Parçalı upload oturumu aç (bkz. bitswap.resumable)"""
+    try:
+        if (request.content_length or 0) > MAX_CREATE_BODY:
+            raise ValueError("İstek çok büyük")
+        result = create_upload(store, uploads, request.get_data())
+    except UploadTooLarge as e:
+        return jsonify({'success': False, 'message': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if result['existing']:
+        return jsonify({'success': True, 'message': 'Dosya zaten mevcut', **result,
+                        'share_url': f"{request.host_url}download/{result['hash']}"})
+    return jsonify({'success': True, **result,
+                    'upload_url': f"{request.host_url}api/uploads/{result['session']}"}), 201, NO_STORE
+
+@app.route('/api/uploads/<session_id>', methods=['GET', 'PUT', 'DELETE'])
+def resumable_upload(session_id):
+    """Alınan aralıklar (GET), parça yazma (PUT ?offset=), iptal (DELETE)"""
+    try:
+        if request.method == 'DELETE':
+            if not uploads.cancel(session_id):
+                return jsonify(UPLOAD_NOT_FOUND), 404
+            return jsonify({'success': True, 'message': 'Upload iptal edildi'})
+        upload = uploads.get(session_id)
+        if upload is None:
+            return jsonify(UPLOAD_NOT_FOUND), 404
+        if request.method == 'PUT':
+            offset = parse_offset(request.args.get('offset'))
+            if (request.content_length or 0) > upload.chunk_size:
+                raise ValueError("Parça boyutu hatalı")
+            upload.write_chunk(offset, upload_stream().read(request.content_length or 0))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, **upload.status()}), 200, NO_STORE
+
+@app.route('/api/uploads/<session_id>/finalize', methods=['POST'])
+def finalize_resumable_upload(session_id):
+    """Oturumu tamamla; hash parçalar gelirken hesaplandı, dosya yeniden okunmaz"""
+    try:
+        finished = finalize_upload(db, store, uploads, session_id, request.remote_addr)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    if finished is None:
+        return jsonify(UPLOAD_NOT_FOUND), 404
+    upload, file_hash, created = finished
+    return jsonify(upload_response(file_hash, upload.name, upload.size, created))
 
 @app.route('/api/files')
 def get_files():
     """Dosya listesi ve istatistikler"""
     action = request.args.get('action', 'list')
     
-    conn = get_db()
+    # Katalog değişmediyse sorgu ve JSON üretimi yok: 304
+    version = catalog.value
+    cache_headers = {'ETag': catalog.etag(version), 'Cache-Control': 'no-cache'}
+    if catalog.matches(request.headers.get('If-None-Match'), version):
+        return '', 304, cache_headers
     
     if action == 'stats':
-        row = conn.execute('SELECT COUNT(*) as total_files, SUM(file_size) as total_size, SUM(download_count) as total_downloads FROM files').fetchone()
+        row = db.query_one(STATS)
         stats = {
             'total_files': row['total_files'] or 0,
             'total_size': row['total_size'] or 0,
             'total_downloads': row['total_downloads'] or 0
         }
-        conn.close()
-        return jsonify({'success': True, 'stats': stats})
+        return jsonify({'success': True, 'stats': stats}), 200, cache_headers
     
     else:
-        files = []
-        rows = conn.execute('SELECT * FROM files ORDER BY upload_time DESC LIMIT 50').fetchall()
-        for row in rows:
-            files.append({
-                'hash': row['file_hash'],
-                'name': row['original_name'],
-                'size': row['file_size'],
-                'download_count': row['download_count'],
-                'upload_time': row['upload_time']
-            })
-        
-        conn.close()
-        return jsonify({'success': True, 'files': files})
+        # Keyset sayfalama: ?sort=&limit=&cursor=&min_size=&max_size=&mime=
+        try:
+            files, next_cursor = list_files(db, request.args)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        
+        return jsonify({'success': True, 'files': files, 'next_cursor': next_cursor}), 200, cache_headers
+
+@app.route('/api/changes')
+def get_changes():
+    """Katalog değişiklik beslemesi: ?since=<sürüm> değişene kadar bekler"""
+    since = parse_since(request.args.get('since'))
+    # Werkzeug her bağlantıya bir thread ayırır; bekleyen istek o thread'de uyur
+    if since is None:
+        version = catalog.value
+    else:
+        version = catalog.wait(since, DEFAULT_POLL_TIMEOUT)
+    return jsonify(change_json(version, since is not None and version != since)), 200, {'Cache-Control': 'no-store'}
+
+@app.route('/api/metadata/<file_hash>')
+def get_metadata(file_hash):
+    """.bwt metadata (eski yüklemeler için ilk istekte üretilir)"""
+    file_record = db.query_one(FIND_BY_HASH, (file_hash,))
+    if not file_record or not os.path.exists(file_record['file_path']):
+        return jsonify({'success': False, 'message': 'Dosya bulunamadı'}), 404
+    
+    manifest = ensure_manifest(db, store, file_hash, file_record['file_path'], file_record['original_name'])
+    # web_seed isteğin geldiği adrese göre; info_hash'e dahil değil
+    manifest['web_seed'] = [f"{request.host_url}download/{file_hash}"]
+    body = json.dumps(manifest, indent=2, ensure_ascii=False)
+    return Response(body, content_type='application/json; charset=utf-8')
+
+@app.route('/api/piece/<info_hash>/<int:index>')
+def get_piece(info_hash, index):
+    """Tek parça: içerik hash'iyle sabit, güçlü ETag + immutable önbellek"""
+    layout = pieces.get(info_hash)
+    if not layout or not 0 <= index < layout.count:
+        return "Parça bulunamadı", 404
+    
+    offset, length, piece_hash = layout.piece(index)
+    headers = {'ETag': make_etag(piece_hash), 'Cache-Control': IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(request.headers.get('If-None-Match'), headers['ETag']):
+        return '', 304, headers
+    if not os.path.exists(layout.path):
+        return "Dosya disk üzerinde bulunamadı", 404
+    
+    headers['Content-Length'] = str(length)
+    headers['Access-Control-Allow-Origin'] = '*'
+    body = download_body(iter_ranges(layout.path, [(offset, offset + length)]), layout.file_hash)
+    return Response(body, headers=headers,
+                    content_type='application/octet-stream', direct_passthrough=True)
 
 @app.route('/download/<file_hash>')
 def download_file(file_hash):
-    """Dosya indirme"""
-    conn = get_db()
-    file_record = conn.execute('SELECT * FROM files WHERE file_hash = ?', (file_hash,)).fetchone()
+    """Dosya indirme (Range / If-Range destekli)"""
+    file_record = db.query_one(FIND_BY_HASH, (file_hash,))
     
     if not file_record:
-        conn.close()
         return "Dosya bulunamadı", 404
     
-    file_path = file_record['file_path']
+    # send_file göreli yolları uygulama klasörüne göre çözer; upload'lar cwd'de
+    file_path = os.path.abspath(file_record['file_path'])
     original_name = file_record['original_name']
+    file_size = file_record['file_size']
     
     if not os.path.exists(file_path):
-        conn.close()
         return "Dosya disk üzerinde bulunamadı", 404
     
-    # İndirme sayacını artır
-    conn.execute('UPDATE files SET download_count = download_count + 1 WHERE file_hash = ?', (file_hash,))
-    conn.commit()
-    conn.close()
+    etag = make_etag(file_hash)
+    try:
+        ranges = requested_ranges(request.headers, file_size, etag)
+    except RangeNotSatisfiable:
+        return '', 416, {'Content-Range': f'bytes */{file_size}', 'Accept-Ranges': 'bytes'}
+    
+    # İndirme sayacını artır (devam eden / ara parça istekleri sayılmaz)
+    if counts_as_download(ranges):
+        downloads.increment(file_hash)
+    
+    if not ranges:
+        response = send_file(file_path, as_attachment=True, download_name=original_name, etag=file_hash)
+        response.headers['Accept-Ranges'] = 'bytes'
+        response.response = download_body(response.response, file_hash)
+        return response
+    
+    mime_type = file_record['mime_type'] or 'application/octet-stream'
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Content-Disposition': f'attachment; filename="{original_name}"',
+    }
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        body = None
+        headers['Content-Range'] = content_range(start, stop, file_size)
+        headers['Content-Length'] = str(stop - start)
+    else:
+        body = ByteRanges(ranges, file_size, mime_type)
+        mime_type = body.content_type
+        headers['Content-Length'] = str(body.content_length)
     
-    return send_file(file_path, as_attachment=True, download_name=original_name)
+    chunks = download_body(iter_ranges(file_path, ranges, body), file_hash)
+    return Response(chunks, status=206, headers=headers,
+                    content_type=mime_type, direct_passthrough=True)
+
+@app.route(BANDWIDTH_PATH, methods=['GET', 'POST'])
+def bandwidth():
+    """Bant genişliği sınırları: GET oku, POST değiştir (yönetici token'ı gerekir)"""
+    if not shaper.admin_token:
+        return "Sayfa bulunamadı", 404
+    if not shaper.authorized(request.headers.get(ADMIN_HEADER)):
+        return "Yetkisiz", 403
+    try:
+        if request.method == 'POST':
+            if (request.content_length or 0) > MAX_BANDWIDTH_BODY:
+                raise ValueError("İstek çok büyük")
+            shaper.set_rates(parse_rates(request.get_data()))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    return jsonify({'success': True, 'rates': shaper.rates()}), 200, NO_STORE
 
 # HTML Template
 HTML_TEMPLATE = '''
@@ -399,9 +662,28 @@ HTML_TEMPLATE = '''
         document.addEventListener('DOMContentLoaded', function() {
             loadStats();
             loadFiles();
-            setInterval(loadStats, 3000);
+            watchChanges();
         });
         
+        // Katalog değişince yenile (uzun yoklama; değişiklik yoksa istek bekler)
+        let catalogVersion = null;
+        function watchChanges() {
+            fetch('/api/changes' + (catalogVersion === null ? '' : '?since=' + catalogVersion))
+                .then(response => {
+                    if (!response.ok) throw new Error(response.status);
+                    return response.json();
+                })
+                .then(data => {
+                    if (catalogVersion !== null && data.version !== catalogVersion) {
+                        loadStats();
+                        loadFiles();
+                    }
+                    catalogVersion = data.version;
+                    watchChanges();
+                })
+                .catch(() => setTimeout(watchChanges, 5000));
+        }
+        
         function selectFile() {
             document.getElementById('fileInput').click();
         }
@@ -417,6 +699,30 @@ HTML_TEMPLATE = '''
             e.target.classList.add('drag-over');
         }
         
+        const BROWSER_HASH_LIMIT = 512 * 1024 * 1024;
+        
+        // Önce tarayıcıda hash'le: sunucuda zaten olan içerik hiç gönderilmez.
+        // crypto.subtle yoksa (güvenli olmayan bağlam) veya dosya çok büyükse doğrudan yüklenir
+        function negotiateUpload(file) {
+            const direct = {existing: false, upload_url: '/api/upload'};
+            if (!window.crypto || !crypto.subtle || file.size > BROWSER_HASH_LIMIT) {
+                return Promise.resolve(direct);
+            }
+            return file.arrayBuffer()
+                .then(buffer => crypto.subtle.digest('SHA-256', buffer))
+                .then(digest => {
+                    const hash = Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+                    return fetch('/api/upload/negotiate', {
+                        method: 'POST',
+                        headers: {'Content-Type': 'application/json'},
+                        body: JSON.stringify({hash: hash, size: file.size, name: file.name})
+                    });
+                })
+                .then(r => r.json())
+                .then(result => result.success ? result : direct)
+                .catch(() => direct);
+        }
+        
         function uploadFiles(files) {
             if (files.length === 0) return;
             
@@ -426,7 +732,17 @@ HTML_TEMPLATE = '''
             
             progress.classList.remove('hidden');
             
-            Array.from(files).forEach((file, index) => {
+            Array.from(files).forEach((file, index) => negotiateUpload(file).then(target => {
+                // Sunucuda zaten var: gönderilecek bir şey yok, sadece link paylaşılır
+                if (target.existing) {
+                    showNotification('✅ ' + file.name + ' zaten sunucuda, tekrar yüklenmedi');
+                    navigator.clipboard.writeText(target.share_url).catch(() => {});
+                    if (index === files.length - 1) {
+                        progress.classList.add('hidden');
+                    }
+                    return;
+                }
+                
                 const formData = new FormData();
                 formData.append('file', file);
                 
@@ -461,9 +777,9 @@ HTML_TEMPLATE = '''
                     }
                 };
                 
-                xhr.open('POST', '/api/upload');
+                xhr.open('POST', target.upload_url);
                 xhr.send(formData);
-            });
+            }));
         }
         
         function loadStats() {
@@ -538,21 +854,29 @@ HTML_TEMPLATE = '''
 '''
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='BitSwapTorrent Flask sunucusu')
+    parser.add_argument('--port', type=int, default=5000, help='dinlenecek port')
+    parser.add_argument('--admin-token', default=os.environ.get('BITSWAP_ADMIN_TOKEN'),
+                        help='/api/admin/bandwidth için X-Admin-Token (yoksa uç nokta kapalı)')
+    args = add_shaping_arguments(parser).parse_args()
+    shaper.set_rates(rates_from_args(args))
+    shaper.admin_token = args.admin_token
     init_db()
-    print("""
+    init_assets()
+    print(f"""
 🎉 BitSwapTorrent Flask Server Başlatılıyor!
 
-📍 URL: http://localhost:5000
+📍 URL: http://localhost:{args.port}
 📁 Uploads: uploads/ klasörü
 💾 Database: bitswap.db
 
 ✅ Gerçek dosya paylaşımı başladı!
-🔗 Tarayıcıda http://localhost:5000 adresini açın
+🔗 Tarayıcıda http://localhost:{args.port} adresini açın
 
 Durdurmak için Ctrl+C
 """)
     
     try:
-        app.run(host='0.0.0.0', port=5000, debug=False)
+        app.run(host='0.0.0.0', port=args.port, debug=False)
     except KeyboardInterrupt:
         print("\n🛑 Server durduruldu!")
@@ -7,41 +7,76 @@ Sadece Python standard library kullanır - KURULUM GEREKTIRMEZ!
 import os
 import sys
 import json
-import hashlib
-import sqlite3
 import mimetypes
+import argparse
 import urllib.parse
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime
-import tempfile
-import shutil
 
-class BitSwapHandler(BaseHTTPRequestHandler):
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bitswap.serving import (PooledHTTPServer, add_server_arguments, DEFAULT_WORKERS,
+                             DEFAULT_QUEUE_SIZE, DEFAULT_REQUEST_TIMEOUT)
+from bitswap.multipart import MultipartReader, parse_boundary
+from bitswap.schema import migrate
+from bitswap.db import Database, FIND_BY_HASH, STATS
+from bitswap.blobs import BlobStore, add_file
+from bitswap.manifest import ensure_manifest
+from bitswap.sessions import (UploadSessions, negotiate, check_upload, verify_upload,
+                              MAX_NEGOTIATION_BODY)
+from bitswap.resumable import (DEFAULT_MAX_UPLOAD_SIZE, ResumableUploads, UploadTooLarge,
+                               add_upload_arguments, create_upload, finalize_upload, parse_offset,
+                               parse_upload_path, MAX_CREATE_BODY)
+from bitswap.pieces import IMMUTABLE_CACHE_CONTROL, PieceIndex, parse_piece_path
+from bitswap.changes import CatalogVersion, LongPollFeed, change_json, parse_since
+from bitswap.counters import (DownloadCounter, add_counter_arguments, DEFAULT_FLUSH_INTERVAL,
+                              DEFAULT_FLUSH_THRESHOLD)
+from bitswap.catalog import list_files
+from bitswap.ranges import (RangeNotSatisfiable, etag_matches, make_etag, requested_ranges,
+                            counts_as_download)
+from bitswap.transfer import send_file_response, send_piece_response, send_range_not_satisfiable
+from bitswap.assets import StaticAsset, load_directory, send_asset, HTML_CACHE_CONTROL
+from bitswap.metrics import InstrumentedHandler
+from bitswap.profiling import (ProfiledHandler, RequestProfiler, add_profile_arguments,
+                               DEFAULT_PROFILE_DIR, PROFILE_PATH)
+from bitswap.prefork import PreforkHandler, Supervisor, add_prefork_arguments
+from bitswap.shaping import BANDWIDTH_PATH, ShapedHandler, Shaper, add_shaping_arguments, rates_from_args
+
+WEB_UI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'web-ui')
+
+class BitSwapHandler(PreforkHandler, ProfiledHandler, ShapedHandler, InstrumentedHandler,
+                     BaseHTTPRequestHandler):
+    # İstekler arasında paylaşılan, havuzlanmış WAL bağlantıları
+    db = Database("bitswap.db")
+    # Dosyalar uploads/ab/cd/<hash> düzeninde (bkz. bitswap.blobs)
+    store = BlobStore("uploads")
+    # info_hash -> parça düzeni (LRU), bkz. bitswap.pieces
+    pieces = PieceIndex(db, store)
+    # Katalog sürümü: /api/files ETag'leri ve /api/changes beslemesi
+    catalog = CatalogVersion(db)
+    changes = LongPollFeed(catalog)
+    # İndirme sayaçları bellekte birikir, toplu yazılır (bkz. bitswap.counters)
+    downloads = DownloadCounter(db, on_flush=catalog.refresh)
+    # Hash-first upload oturumları (bkz. bitswap.sessions)
+    sessions = UploadSessions()
+    # Devam ettirilebilir parçalı upload'lar (bkz. bitswap.resumable)
+    uploads = ResumableUploads(store, max_size=DEFAULT_MAX_UPLOAD_SIZE)
+    # Yönetici token'ıyla açılan profil oturumları (bkz. bitswap.profiling)
+    profiler = RequestProfiler()
     
-    def __init__(self, *args, **kwargs):
-        # Klasörleri oluştur
+    @classmethod
+    def init_database(cls):
+        """Klasörleri ve şemayı sunucu başlarken bir kez hazırla"""
         os.makedirs("uploads", exist_ok=True)
-        self.init_database()
-        super().__init__(*args, **kwargs)
+        migrate(cls.db)
     
-    def init_database(self):
-        """SQLite database başlat"""
-        conn = sqlite3.connect("bitswap.db")
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS files (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                file_hash TEXT UNIQUE NOT NULL,
-                original_name TEXT NOT NULL,
-                file_path TEXT NOT NULL,
-                file_size INTEGER NOT NULL,
-                upload_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-                download_count INTEGER DEFAULT 0,
-                uploader_ip TEXT
-            )
-        ''')
-        conn.commit()
-        conn.close()
+    @classmethod
+    def init_assets(cls):
+        """Ana sayfa ve web-ui/ dosyalarını bir kez sıkıştırıp belleğe al"""
+        assets = load_directory(WEB_UI_DIR, '/ui/')
+        assets['/'] = StaticAsset(cls.main_page_html().encode('utf-8'), 'text/html; charset=utf-8',
+                                  HTML_CACHE_CONTROL)
+        cls.assets = assets
     
     def log_message(self, format, *args):
         """Log mesajlarını sustur"""
@@ -56,9 +91,25 @@ class BitSwapHandler(BaseHTTPRequestHandler):
             self.serve_main_page()
         elif path == '/api/files':
             self.handle_api_files(parsed)
+        elif path == '/metrics':
+            self.send_metrics()
+        elif path == PROFILE_PATH:
+            self.handle_profile()
+        elif path == BANDWIDTH_PATH:
+            self.handle_bandwidth()
+        elif path == '/api/changes':
+            self.handle_changes(parsed)
         elif path.startswith('/download/'):
             file_hash = path.split('/')[-1]
             self.handle_download(file_hash)
+        elif path.startswith('/api/piece/'):
+            self.handle_piece(path)
+        elif path.startswith('/api/metadata/'):
+            self.handle_metadata(path.split('/')[-1])
+        elif path.startswith('/api/uploads/'):
+            self.handle_resumable('GET', parsed)
+        elif path.startswith('/ui/'):
+            self.serve_asset(path)
         else:
             self.send_error(404, "Sayfa bulunamadı")
     
@@ -67,13 +118,53 @@ class BitSwapHandler(BaseHTTPRequestHandler):
         parsed = urlparse(self.path)
         
         if parsed.path == '/api/upload':
-            self.handle_upload()
+            self.handle_upload(parsed)
+        elif parsed.path == '/api/upload/negotiate':
+            self.handle_negotiate()
+        elif parsed.path == PROFILE_PATH:
+            self.handle_profile()
+        elif parsed.path == BANDWIDTH_PATH:
+            self.handle_bandwidth()
+        elif parsed.path == '/api/uploads' or parsed.path.startswith('/api/uploads/'):
+            self.handle_resumable('POST', parsed)
         else:
             self.send_error(404, "Endpoint bulunamadı")
     
+    def do_PUT(self):
+        """PUT istekleri: parçalı upload'a parça yazma"""
+        parsed = urlparse(self.path)
+        if parsed.path.startswith('/api/uploads/'):
+            self.handle_resumable('PUT', parsed)
+        else:
+            self.send_error(404)
+    
+    def do_DELETE(self):
+        """DELETE istekleri: parçalı upload'ı iptal etme"""
+        parsed = urlparse(self.path)
+        if parsed.path.startswith('/api/uploads/'):
+            self.handle_resumable('DELETE', parsed)
+        elif parsed.path == PROFILE_PATH:
+            self.handle_profile()
+        else:
+            self.send_error(404)
+    
     def serve_main_page(self):
+        """Ana sayfa (başlangıçta sıkıştırılmış halinden)"""
+        send_asset(self, self.assets['/'])
+    
+    def serve_asset(self, path):
+        """web-ui/ dosyaları"""
+        asset = self.assets.get(path)
+        if asset is None:
+            # send_error mesajı durum satırına latin-1 yazılır
+            self.send_error(404)
+            return
+        send_asset(self, asset)
+    
+    @staticmethod
+    def main_page_html():
         """Ana sayfa HTML"""
-        html = '''<!DOCTYPE html>
+        return '''<!DOCTYPE html>
 <html lang="tr">
 <head>
     <meta charset="UTF-8">
@@ -284,12 +375,28 @@ class BitSwapHandler(BaseHTTPRequestHandler):
         document.addEventListener('DOMContentLoaded', function() {
             loadStats();
             loadFiles();
-            setInterval(() => {
-                loadStats();
-                loadFiles();
-            }, 5000);
+            watchChanges();
         });
         
+        // Katalog değişince yenile (uzun yoklama; değişiklik yoksa istek bekler)
+        let catalogVersion = null;
+        function watchChanges() {
+            fetch('/api/changes' + (catalogVersion === null ? '' : '?since=' + catalogVersion))
+                .then(response => {
+                    if (!response.ok) throw new Error(response.status);
+                    return response.json();
+                })
+                .then(data => {
+                    if (catalogVersion !== null && data.version !== catalogVersion) {
+                        loadStats();
+                        loadFiles();
+                    }
+                    catalogVersion = data.version;
+                    watchChanges();
+                })
+                .catch(() => setTimeout(watchChanges, 5000));
+        }
+        
         function selectFile() {
             document.getElementById('fileInput').click();
         }
@@ -305,6 +412,30 @@ class BitSwapHandler(BaseHTTPRequestHandler):
             e.target.classList.add('drag-over');
         }
         
+        const BROWSER_HASH_LIMIT = 512 * 1024 * 1024;
+        
+        // Önce tarayıcıda hash'le: sunucuda zaten olan içerik hiç gönderilmez.
+        // crypto.subtle yoksa (güvenli olmayan bağlam) veya dosya çok büyükse doğrudan yüklenir
+        function negotiateUpload(file) {
+            const direct = {existing: false, upload_url: '/api/upload'};
+            if (!window.crypto || !crypto.subtle || file.size > BROWSER_HASH_LIMIT) {
+                return Promise.resolve(direct);
+            }
+            return file.arrayBuffer()
+                .then(buffer => crypto.subtle.digest('SHA-256', buffer))
+                .then(digest => {
+                    const hash = Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+                    return fetch('/api/upload/negotiate', {
+                        method: 'POST',
+                        headers: {'Content-Type': 'application/json'},
+                        body: JSON.stringify({hash: hash, size: file.size, name: file.name})
+                    });
+                })
+                .then(r => r.json())
+                .then(result => result.success ? result : direct)
+                .catch(() => direct);
+        }
+        
         function uploadFiles(files) {
             if (files.length === 0) return;
             
@@ -314,7 +445,18 @@ class BitSwapHandler(BaseHTTPRequestHandler):
             
             progress.style.display = 'block';
             
-            Array.from(files).forEach((file, index) => {
+            Array.from(files).forEach((file, index) => negotiateUpload(file).then(target => {
+                // Sunucuda zaten var: gönderilecek bir şey yok, sadece link paylaşılır
+                if (target.existing) {
+                    showNotification('✅ ' + file.name + ' zaten sunucuda, tekrar yüklenmedi');
+                    navigator.clipboard.writeText(target.share_url).catch(() => {});
+                    if (index === files.length - 1) {
+                        progress.style.display = 'none';
+                        text.textContent = '';
+                    }
+                    return;
+                }
+                
                 const formData = new FormData();
                 formData.append('file', file);
                 
@@ -352,9 +494,9 @@ class BitSwapHandler(BaseHTTPRequestHandler):
                     }
                 };
                 
-                xhr.open('POST', '/api/upload');
+                xhr.open('POST', target.upload_url);
                 xhr.send(formData);
-            });
+            }));
         }
         
         function loadStats() {
@@ -429,24 +571,24 @@ class BitSwapHandler(BaseHTTPRequestHandler):
     </script>
 </body>
 </html>'''
-        
-        self.send_response(200)
-        self.send_header('Content-Type', 'text/html; charset=utf-8')
-        self.send_header('Cache-Control', 'no-cache')
-        self.end_headers()
-        self.wfile.write(html.encode('utf-8'))
     
     def handle_api_files(self, parsed):
         """API dosya istekleri"""
         query = parse_qs(parsed.query)
         action = query.get('action', ['list'])[0]
         
-        conn = sqlite3.connect('bitswap.db')
-        conn.row_factory = sqlite3.Row
+        # Katalog değişmediyse sorgu ve JSON üretimi yok: 304
+        version = self.catalog.value
+        if self.catalog.matches(self.headers.get('If-None-Match'), version):
+            self.send_response(304)
+            self.send_header('ETag', self.catalog.etag(version))
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
         
         try:
             if action == 'stats':
-                row = conn.execute('SELECT COUNT(*) as total_files, SUM(file_size) as total_size, SUM(download_count) as total_downloads FROM files').fetchone()
+                row = self.db.query_one(STATS)
                 stats = {
                     'total_files': row['total_files'] or 0,
                     'total_size': row['total_size'] or 0,
@@ -454,113 +596,119 @@ class BitSwapHandler(BaseHTTPRequestHandler):
                 }
                 response = {'success': True, 'stats': stats}
             else:
-                files = []
-                rows = conn.execute('SELECT * FROM files ORDER BY upload_time DESC LIMIT 50').fetchall()
-                for row in rows:
-                    files.append({
-                        'hash': row['file_hash'],
-                        'name': row['original_name'],
-                        'size': row['file_size'],
-                        'download_count': row['download_count'],
-                        'upload_time': row['upload_time']
-                    })
-                response = {'success': True, 'files': files}
+                # Keyset sayfalama: ?sort=&limit=&cursor=&min_size=&max_size=&mime=
+                files, next_cursor = list_files(self.db, {k: v[0] for k, v in query.items()})
+                response = {'success': True, 'files': files, 'next_cursor': next_cursor}
+            status = 200
+        except ValueError as e:
+            response = {'success': False, 'error': str(e)}
+            status = 400
         except Exception as e:
             response = {'success': False, 'error': str(e)}
-        finally:
-            conn.close()
+            status = 200
         
-        self.send_response(200)
+        self.send_response(status)
         self.send_header('Content-Type', 'application/json; charset=utf-8')
         self.send_header('Access-Control-Allow-Origin', '*')
+        if response['success']:
+            self.send_header('ETag', self.catalog.etag(version))
+            self.send_header('Cache-Control', 'no-cache')
         self.end_headers()
         self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
     
-    def handle_upload(self):
-        """Dosya yükleme işlemi"""
+    def handle_changes(self, parsed):
+        """Katalog değişiklik beslemesi: ?since=<sürüm> değişene kadar bekler"""
+        since = parse_since(parse_qs(parsed.query).get('since', [None])[0])
+        # Bekleyen istek worker thread tutmaz; yanıtı LongPollFeed yazar
+        if self.changes.park(self, since):
+            return
+        version = self.catalog.value
+        body = json.dumps(change_json(version, since is not None and version != since)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def handle_negotiate(self):
+        """Hash-first upload: içerik zaten varsa dosya hiç gönderilmez"""
         try:
-            # Content-Length al
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            
-            # Multipart parsing (basit)
-            boundary = None
-            content_type = self.headers.get('Content-Type', '')
-            if 'boundary=' in content_type:
-                boundary = content_type.split('boundary=')[1].encode()
-            
-            if not boundary:
-                raise ValueError("Boundary bulunamadı")
-            
-            # Dosya verilerini ayıkla
-            parts = post_data.split(b'--' + boundary)
-            file_data = None
-            filename = None
-            
-            for part in parts:
-                if b'Content-Disposition: form-data' in part and b'filename=' in part:
-                    # Filename bul
-                    lines = part.split(b'\r\n')
-                    for line in lines:
-                        if b'filename=' in line:
-                            filename = line.decode().split('filename="')[1].split('"')[0]
-                            break
-                    
-                    # Dosya verilerini bul
-                    if b'\r\n\r\n' in part:
-                        file_data = part.split(b'\r\n\r\n', 1)[1]
-                        # Son \r\n'i kaldır
-                        if file_data.endswith(b'\r\n'):
-                            file_data = file_data[:-2]
-                    break
-            
-            if not file_data or not filename:
-                raise ValueError("Dosya bulunamadı")
-            
-            # Hash hesapla
-            file_hash = hashlib.sha256(file_data).hexdigest()
-            file_size = len(file_data)
-            
-            # Database kontrolü
-            conn = sqlite3.connect('bitswap.db')
-            existing = conn.execute('SELECT * FROM files WHERE file_hash = ?', (file_hash,)).fetchone()
-            
-            if existing:
-                conn.close()
+            content_length = int(self.headers.get('Content-Length') or 0)
+            if content_length > MAX_NEGOTIATION_BODY:
+                raise ValueError("İstek çok büyük")
+            result = negotiate(self.store, self.sessions, self.rfile.read(content_length))
+            if result['existing']:
                 response = {
                     'success': True,
                     'message': 'Dosya zaten mevcut',
-                    'hash': file_hash,
-                    'share_url': f"http://{self.headers['Host']}/download/{file_hash}"
+                    **result,
+                    'share_url': f"http://{self.headers['Host']}/download/{result['hash']}"
                 }
             else:
-                # Dosyayı kaydet
-                safe_filename = "".join(c for c in filename if c.isalnum() or c in '._-')
-                file_path = f"uploads/{file_hash}_{safe_filename}"
-                
-                with open(file_path, 'wb') as f:
-                    f.write(file_data)
-                
-                # Database'e ekle
-                uploader_ip = self.client_address[0]
-                conn.execute('''
-                    INSERT INTO files (file_hash, original_name, file_path, file_size, uploader_ip)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (file_hash, filename, file_path, file_size, uploader_ip))
-                conn.commit()
-                conn.close()
-                
                 response = {
                     'success': True,
-                    'message': 'Dosya başarıyla yüklendi',
-                    'hash': file_hash,
-                    'original_name': filename,
-                    'size': file_size,
-                    'share_url': f"http://{self.headers['Host']}/download/{file_hash}"
+                    'message': 'Yükleme gerekli',
+                    **result,
+                    'upload_url': f"http://{self.headers['Host']}/api/upload?session={result['session']}"
                 }
+        except ValueError as e:
+            response = {'success': False, 'message': str(e)}
+        
+        body = json.dumps(response).encode('utf-8')
+        self.send_response(200 if response['success'] else 400)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def handle_upload(self, parsed):
+        """Dosya yükleme işlemi (akış halinde, sabit bellek)"""
+        upload = None
+        try:
+            # Pazarlıkla açılmış oturum: gövde okunmadan önce doğrulanır
+            session = check_upload(self.sessions, parse_qs(parsed.query).get('session', [None])[0])
+            
+            # Content-Length al
+            content_length = int(self.headers.get('Content-Length') or 0)
+            boundary = parse_boundary(self.headers.get('Content-Type', ''))
+            
+            # Multipart gövdeyi akış halinde ayrıştır; ilk dosya alanı
+            # doğrudan uploads/ içinde geçici dosyaya yazılır
+            filename = None
+            for part in MultipartReader(self.upload_reader(), boundary, content_length):
+                if part.filename and upload is None:
+                    filename = part.filename
+                    upload = self.store.spool()
+                    upload.write_from(part.iter_chunks())
+                    upload.close()
+            
+            if not upload or not upload.size or not filename:
+                raise ValueError("Dosya bulunamadı")
+            
+            # Hash veri gelirken hesaplandı
+            file_hash = upload.hexdigest()
+            file_size = upload.size
+            verify_upload(session, file_hash, file_size)
+            if session:
+                self.sessions.finish(session.id)
+            
+            # İçerik adresli depo: varlık kontrolü veritabanına gitmeden tek stat
+            uploader_ip = self.client_address[0]
+            mime_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            created = (not self.store.exists(file_hash)
+                       and add_file(self.db, self.store, upload, filename, mime_type, uploader_ip))
+            if not created:
+                upload.discard()
+            response = self.upload_response(file_hash, filename, file_size, created)
         
         except Exception as e:
             response = {'success': False, 'message': str(e)}
+        finally:
+            if upload:
+                upload.discard()
         
         self.send_response(200 if response['success'] else 400)
         self.send_header('Content-Type', 'application/json; charset=utf-8')
@@ -568,56 +716,231 @@ class BitSwapHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
     
+    def upload_response(self, file_hash, filename, file_size, created):
+        """Upload yanıtı (multipart veya parçalı); yeni dosya için .bwt üretilir"""
+        if not created:
+            return {
+                'success': True,
+                'message': 'Dosya zaten mevcut',
+                'hash': file_hash,
+                'share_url': f"http://{self.headers['Host']}/download/{file_hash}"
+            }
+        # Dosya uploads/ab/cd/<hash> altına taşındı, adı sadece veritabanında
+        # .bwt manifest'i: parça hash'leri tüm çekirdeklerde paralel
+        manifest = ensure_manifest(self.db, self.store, file_hash, self.store.path(file_hash), filename)
+        self.catalog.refresh()
+        return {
+            'success': True,
+            'message': 'Dosya başarıyla yüklendi',
+            'hash': file_hash,
+            'original_name': filename,
+            'size': file_size,
+            'info_hash': manifest['info_hash'],
+            'metadata_url': f"http://{self.headers['Host']}/api/metadata/{file_hash}",
+            'share_url': f"http://{self.headers['Host']}/download/{file_hash}"
+        }
+    
+    def handle_resumable(self, method, parsed):
+        """Parçalı upload oturumları: /api/uploads[/<id>[/finalize]] (bkz. bitswap.resumable)"""
+        target = (None, False) if parsed.path == '/api/uploads' else parse_upload_path(parsed.path)
+        if target is None:
+            self.send_error(404)
+            return
+        session_id, finalize = target
+        status = 200
+        not_found = {'success': False, 'message': 'Upload oturumu bulunamadı'}
+        try:
+            content_length = int(self.headers.get('Content-Length') or 0)
+            if session_id is None and method == 'POST':
+                if content_length > MAX_CREATE_BODY:
+                    raise ValueError("İstek çok büyük")
+                result = create_upload(self.store, self.uploads, self.rfile.read(content_length))
+                if result['existing']:
+                    response = {'success': True, 'message': 'Dosya zaten mevcut', **result,
+                                'share_url': f"http://{self.headers['Host']}/download/{result['hash']}"}
+                else:
+                    status = 201
+                    response = {'success': True, **result,
+                                'upload_url': f"http://{self.headers['Host']}/api/uploads/{result['session']}"}
+            elif session_id is None or (finalize and method != 'POST'):
+                status, response = 405, {'success': False, 'message': 'Desteklenmeyen metot'}
+            elif finalize:
+                # Hash parçalar gelirken hesaplandı: dosya yeniden okunmaz
+                finished = finalize_upload(self.db, self.store, self.uploads, session_id,
+                                           self.client_address[0])
+                if finished is None:
+                    status, response = 404, not_found
+                else:
+                    upload, file_hash, created = finished
+                    response = self.upload_response(file_hash, upload.name, upload.size, created)
+            elif method == 'DELETE':
+                if self.uploads.cancel(session_id):
+                    response = {'success': True, 'message': 'Upload iptal edildi'}
+                else:
+                    status, response = 404, not_found
+            else:
+                upload = self.uploads.get(session_id)
+                if upload is None:
+                    status, response = 404, not_found
+                else:
+                    if method == 'PUT':
+                        offset = parse_offset(parse_qs(parsed.query).get('offset', [None])[0])
+                        if content_length > upload.chunk_size:
+                            raise ValueError("Parça boyutu hatalı")
+                        upload.write_chunk(offset, self.upload_reader().read(content_length))
+                    response = {'success': True, **upload.status()}
+        except UploadTooLarge as e:
+            status, response = 413, {'success': False, 'message': str(e)}
+        except ValueError as e:
+            status, response = 400, {'success': False, 'message': str(e)}
+        
+        body = json.dumps(response, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Cache-Control', 'no-store')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def handle_piece(self, path):
+        """Tek parça: /api/piece/<info_hash>/<index> (düz sokette sendfile ile)"""
+        target = parse_piece_path(path)
+        layout = target and self.pieces.get(target[0])
+        if not layout or not 0 <= target[1] < layout.count:
+            self.send_error(404)
+            return
+        
+        # Parça içeriği hash'iyle sabit: güçlü ETag + immutable önbellek
+        offset, length, piece_hash = layout.piece(target[1])
+        etag = make_etag(piece_hash)
+        if etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', IMMUTABLE_CACHE_CONTROL)
+            self.end_headers()
+            return
+        
+        try:
+            f = open(layout.path, 'rb')
+        except FileNotFoundError:
+            self.send_error(404)
+            return
+        with f:
+            send_piece_response(self, f, offset, length, etag, IMMUTABLE_CACHE_CONTROL,
+                                [('Access-Control-Allow-Origin', '*')],
+                                self.download_transfer(layout.file_hash))
+    
+    def handle_metadata(self, file_hash):
+        """.bwt metadata (eski yüklemeler için ilk istekte üretilir)"""
+        file_record = self.db.query_one(FIND_BY_HASH, (file_hash,))
+        if not file_record or not os.path.exists(file_record['file_path']):
+            self.send_error(404)
+            return
+        
+        manifest = ensure_manifest(self.db, self.store, file_hash,
+                                   file_record['file_path'], file_record['original_name'])
+        # web_seed isteğin geldiği adrese göre; info_hash'e dahil değil
+        manifest['web_seed'] = [f"http://{self.headers['Host']}/download/{file_hash}"]
+        body = json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8')
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
     def handle_download(self, file_hash):
         """Dosya indirme"""
-        conn = sqlite3.connect('bitswap.db')
-        file_record = conn.execute('SELECT * FROM files WHERE file_hash = ?', (file_hash,)).fetchone()
+        file_record = self.db.query_one(FIND_BY_HASH, (file_hash,))
         
         if not file_record:
-            conn.close()
             self.send_error(404, "Dosya bulunamadı")
             return
         
-        file_path = file_record[3]  # file_path
-        original_name = file_record[2]  # original_name
-        file_size = file_record[4]  # file_size
+        file_path = file_record['file_path']
+        original_name = file_record['original_name']
+        file_size = file_record['file_size']
         
         if not os.path.exists(file_path):
-            conn.close()
             self.send_error(404, "Dosya disk üzerinde bulunamadı")
             return
         
-        # İndirme sayacını artır
-        conn.execute('UPDATE files SET download_count = download_count + 1 WHERE file_hash = ?', (file_hash,))
-        conn.commit()
-        conn.close()
+        # Range / If-Range: ETag dosya hash'inden türetilir
+        etag = make_etag(file_hash)
+        try:
+            ranges = requested_ranges(self.headers, file_size, etag)
+        except RangeNotSatisfiable:
+            send_range_not_satisfiable(self, file_size)
+            return
         
-        # MIME type tahmin et
-        mime_type, _ = mimetypes.guess_type(original_name)
-        if not mime_type:
-            mime_type = 'application/octet-stream'
+        # İndirme sayacını artır (devam eden / ara parça istekleri sayılmaz)
+        if counts_as_download(ranges):
+            self.downloads.increment(file_hash)
         
-        # Dosyayı gönder
-        self.send_response(200)
-        self.send_header('Content-Type', mime_type)
-        self.send_header('Content-Disposition', f'attachment; filename="{original_name}"')
-        self.send_header('Content-Length', str(file_size))
-        self.end_headers()
+        # MIME type upload sırasında kaydedildi
+        mime_type = file_record['mime_type'] or 'application/octet-stream'
         
+        # Dosyayı gönder (düz sokette sendfile ile kopyasız)
         with open(file_path, 'rb') as f:
-            shutil.copyfileobj(f, self.wfile)
+            send_file_response(self, f, file_size, mime_type, etag, ranges,
+                               [('Content-Disposition', f'attachment; filename="{original_name}"')],
+                               self.download_transfer(file_hash))
 
-def run_server(port=8000):
-    """Server'ı çalıştır"""
-    server_address = ('', port)
-    httpd = HTTPServer(server_address, BitSwapHandler)
+def run_server(port=8000, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+               request_timeout=DEFAULT_REQUEST_TIMEOUT, flush_interval=DEFAULT_FLUSH_INTERVAL,
+               flush_threshold=DEFAULT_FLUSH_THRESHOLD, admin_token=None,
+               profile_dir=DEFAULT_PROFILE_DIR, processes=1, reuse_port=False, rates=None,
+               max_upload_size=DEFAULT_MAX_UPLOAD_SIZE):
+    """Server'ı sınırlı worker havuzu ile çalıştır (processes > 1: süreç başına bir havuz)"""
+    BitSwapHandler.init_database()
+    BitSwapHandler.init_assets()
+    # Bant genişliği sınırları; çok süreçlide kovalar fork'tan önce paylaşılır (bkz. bitswap.shaping)
+    BitSwapHandler.shaper = Shaper(rates, admin_token, shared=processes > 1)
     
-    print(f"""
+    def serve(process=None):
+        """Servisleri başlat, Ctrl+C'ye (çok süreçlide SIGTERM'e) kadar istek işle"""
+        if process is not None:
+            # Oturumlar bu süreçte kalır, istekleri buraya devredilir (bkz. bitswap.prefork)
+            BitSwapHandler.prefork = process
+            BitSwapHandler.sessions.id_prefix = BitSwapHandler.uploads.id_prefix = process.id_prefix
+        BitSwapHandler.catalog.start()
+        BitSwapHandler.changes.start()
+        BitSwapHandler.uploads.max_size = max_upload_size or None
+        BitSwapHandler.uploads.start()
+        BitSwapHandler.downloads = DownloadCounter(BitSwapHandler.db, flush_interval, flush_threshold,
+                                                   BitSwapHandler.catalog.refresh).start()
+        BitSwapHandler.profiler = RequestProfiler(admin_token, profile_dir)
+        httpd = PooledHTTPServer(('', port), BitSwapHandler, workers=workers, queue_size=queue_size,
+                                 request_timeout=request_timeout,
+                                 listener=process.listener if process is not None else None)
+        if process is not None:
+            process.start(httpd)
+        else:
+            print(banner)
+        
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            if process is None:
+                print("\n🛑 Server durduruldu!")
+        finally:
+            if process is not None:
+                process.stop()
+            httpd.server_close()
+            BitSwapHandler.downloads.stop()
+            BitSwapHandler.changes.stop()
+            BitSwapHandler.uploads.stop()
+            BitSwapHandler.catalog.stop()
+    
+    banner = f"""
 🎉 BitSwapTorrent Server BAŞLADI! 
 
 📍 Adres: http://localhost:{port}
 📁 Uploads: uploads/ klasörü  
 💾 Database: bitswap.db
+🧵 Worker: {workers} (kuyruk: {queue_size}) × {processes} süreç
 
 ✅ SIFIR KURULUM - Sadece Python!
 🔗 Tarayıcında http://localhost:{port} aç
@@ -625,13 +948,23 @@ def run_server(port=8000):
 🛑 Durdurmak için Ctrl+C
 
 🚀 GERÇEK DOSYA PAYLAŞIMI BAŞLADI!
-""")
+"""
     
-    try:
-        httpd.serve_forever()
-    except KeyboardInterrupt:
-        print("\n🛑 Server durduruldu!")
-        httpd.server_close()
+    if processes <= 1:
+        serve()
+        return
+    # Fork'tan önce: açık SQLite bağlantısı ve thread kalmamalı
+    BitSwapHandler.db.close()
+    supervisor = Supervisor(processes, ('', port), reuse_port)
+    print(banner)
+    supervisor.run(serve)
+    print("\n🛑 Server durduruldu!")
 
 if __name__ == '__main__':
-    run_server()
+    parser = add_server_arguments(argparse.ArgumentParser(description=__doc__), 8000)
+    parser = add_prefork_arguments(add_profile_arguments(add_counter_arguments(parser)))
+    args = add_upload_arguments(add_shaping_arguments(parser)).parse_args()
+    run_server(args.port, args.workers, args.queue_size, args.request_timeout,
+               args.counter_flush_interval, args.counter_flush_threshold, args.admin_token,
+               args.profile_dir, args.processes, args.reuse_port, rates_from_args(args),
+               args.max_upload_size)